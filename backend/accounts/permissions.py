@@ -1,7 +1,10 @@
 # accounts/permissions.py
 
 from rest_framework.permissions import BasePermission
-from django.contrib.auth.models import Group
+from .roles import get_user_access
+
+# Role checks go through accounts.roles.get_user_access, which loads a user's
+# groups and permissions once per request (and caches them per process).
 
 class IsSuperAdmin(BasePermission):
     """
@@ -14,16 +17,8 @@ class IsSuperAdmin(BasePermission):
             return False
             
         # The user must belong to the 'SuperAdmin' group.
-        # Check if the group exists to prevent errors, though it should exist 
-        # after running the initial seeder script.
-        try:
-            super_admin_group = Group.objects.get(name='SuperAdmin')
-        except Group.DoesNotExist:
-            # If the group doesn't exist, nobody can be a SuperAdmin.
-            return False 
-
-        # Return True if the user is a member of the SuperAdmin group
-        return super_admin_group in request.user.groups.all()
+        # If the group doesn't exist, nobody can be a SuperAdmin.
+        return get_user_access(request.user).is_super_admin
     
 class HasAppModuleAccess(BasePermission):
     """
@@ -42,13 +37,9 @@ class HasAppModuleAccess(BasePermission):
             return False
             
         # 2. Check for SuperAdmin Status (Full Access)
-        try:
-            # Reusing the SuperAdmin check logic
-            super_admin_group = Group.objects.get(name='SuperAdmin')
-            if super_admin_group in user.groups.all():
-                return True  # SuperAdmin has full access 
-        except Group.DoesNotExist:
-            pass 
+        access = get_user_access(user)
+        if access.is_super_admin:
+            return True  # SuperAdmin has full access 
 
         # 3. Regular User Permission Check (Limited Access) 
         
@@ -70,7 +61,7 @@ class HasAppModuleAccess(BasePermission):
         required_permission = f'{app_label}.view_{model_name}'
         
         # Check if the regular user has the assigned permission
-        return user.has_perm(required_permission)
+        return access.has_perm(required_permission)
 
 class IsAssignedDriverOrDispatcher(BasePermission):
     """
@@ -85,16 +76,9 @@ class IsAssignedDriverOrDispatcher(BasePermission):
             return False
             
         # Check for SuperAdmin (full access)
-        try:
-            super_admin_group = Group.objects.get(name='SuperAdmin')
-            if super_admin_group in user.groups.all():
-                return True
-        except Group.DoesNotExist:
-            pass 
-        
         # NOTE: If you create a 'Dispatcher' Group later, check for it here.
         # For now, we assume only SuperAdmin has dispatching privileges.
-        return False
+        return get_user_access(user).is_super_admin
         
     def has_permission(self, request, view):
         # Allow SuperAdmins/Dispatchers to see the list and create objects
@@ -120,7 +104,8 @@ class IsAssignedDriverOrDispatcher(BasePermission):
         if request.method in ('GET', 'HEAD', 'OPTIONS'):
             # This logic assumes the Trip model (obj) has an 'assigned_driver' 
             # attribute that links to the User/Employee instance.
-            return hasattr(obj, 'assigned_driver') and obj.assigned_driver == user
+            # Comparing ids avoids fetching the driver row for every check.
+            return hasattr(obj, 'assigned_driver_id') and obj.assigned_driver_id == user.pk
 
         # Deny all other requests (PUT, DELETE) for non-assigned users
         return False
@@ -1,6 +1,10 @@
 # accounts/roles.py
 
-from django.contrib.auth.models import Group
+import time
+
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
+from django.db.models import Q
 
 ROLES = {
     'SuperAdmin': 'Full access, user management.',
@@ -21,4 +25,99 @@ def create_initial_groups():
         else:
             print(f"   ℹ️ Role '{role_name}' already exists.")
 
-    print("Initial roles setup complete.")
\ No newline at end of file
+    print("Initial roles setup complete.")
+
+# --- Role Resolution (shared by every permission class) ---
+
+SUPER_ADMIN_GROUP = 'SuperAdmin'
+
+# How long a resolved access profile may be reused by this process (seconds).
+# Signals in accounts/signals.py invalidate it as soon as group or permission
+# rows change, so the timeout only bounds staleness across worker processes.
+ACCESS_CACHE_TIMEOUT = 60
+ACCESS_CACHE_VERSION_KEY = 'accounts:access:version'
+
+
+class UserAccess:
+    """
+    The groups and model permissions of a single user, loaded once.
+
+    Permission classes read from this object instead of querying
+    Group/Permission rows themselves.
+    """
+
+    def __init__(self, group_names, permissions, is_active=True, is_superuser=False):
+        self.group_names = frozenset(group_names)
+        self.permissions = frozenset(permissions)
+        self.is_active = is_active
+        self.is_superuser = is_superuser
+
+    @property
+    def is_super_admin(self):
+        return SUPER_ADMIN_GROUP in self.group_names
+
+    def has_perm(self, perm):
+        # Mirrors ModelBackend.has_perm: inactive users have no permissions,
+        # Django superusers have all of them.
+        if not self.is_active:
+            return False
+        return self.is_superuser or perm in self.permissions
+
+
+def _access_cache_key(user_id):
+    # A fresh timestamp never collides with versions used by older entries
+    version = cache.get_or_set(ACCESS_CACHE_VERSION_KEY, time.time_ns, None)
+    return f'accounts:access:{version}:{user_id}'
+
+
+def _load_user_access(user):
+    """Loads groups and permissions for a user in two queries."""
+    group_names = list(user.groups.values_list('name', flat=True))
+
+    # Direct user permissions and permissions inherited through groups
+    permissions = Permission.objects.filter(
+        Q(system_user_permissions=user) | Q(group__system_user_groups=user)
+    ).values_list('content_type__app_label', 'codename').distinct()
+
+    return UserAccess(
+        group_names,
+        [f'{app_label}.{codename}' for app_label, codename in permissions],
+        is_active=user.is_active,
+        is_superuser=user.is_superuser,
+    )
+
+
+def get_user_access(user):
+    """
+    Returns the UserAccess for an authenticated user.
+
+    The result is memoized on the user instance, so every permission class
+    evaluated during one request shares it, and kept in the process cache
+    (keyed by user id) for later requests.
+    """
+    access = getattr(user, '_fms_access', None)
+    if access is not None:
+        return access
+
+    key = _access_cache_key(user.pk)
+    access = cache.get(key)
+    if access is None:
+        access = _load_user_access(user)
+        cache.set(key, access, ACCESS_CACHE_TIMEOUT)
+
+    user._fms_access = access
+    return access
+
+
+def invalidate_user_access(user_id):
+    """Drops the cached access profile of a single user."""
+    cache.delete(_access_cache_key(user_id))
+
+
+def invalidate_all_access():
+    """Invalidates every cached access profile (group or permission rows changed)."""
+    try:
+        cache.incr(ACCESS_CACHE_VERSION_KEY)
+    except ValueError:
+        # The version key was evicted; start a new version series.
+        cache.set(ACCESS_CACHE_VERSION_KEY, time.time_ns(), None)
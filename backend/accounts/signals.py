@@ -0,0 +1,46 @@
+# accounts/signals.py
+
+from django.contrib.auth.models import Group, Permission
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from core.caching import invalidate_resource
+from .models import FMSUser
+from .roles import invalidate_all_access, invalidate_user_access
+
+
+@receiver(m2m_changed, sender=FMSUser.groups.through)
+@receiver(m2m_changed, sender=FMSUser.user_permissions.through)
+def user_membership_changed(sender, instance, action, reverse, **kwargs):
+    """A user's groups or direct permissions were edited."""
+    if not action.startswith('post_'):
+        return
+
+    if reverse:
+        # Edited from the Group/Permission side: several users may be affected
+        invalidate_all_access()
+    else:
+        invalidate_user_access(instance.pk)
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def group_permissions_changed(sender, action, **kwargs):
+    if action.startswith('post_'):
+        invalidate_all_access()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+@receiver(post_save, sender=Permission)
+@receiver(post_delete, sender=Permission)
+def access_rows_changed(sender, **kwargs):
+    invalidate_all_access()
+
+
+@receiver(post_save, sender=FMSUser)
+@receiver(post_delete, sender=FMSUser)
+def user_changed(sender, instance, **kwargs):
+    # is_active / is_superuser feed into the cached access profile
+    invalidate_user_access(instance.pk)
+    # Drivers are users; the role may have changed either way
+    invalidate_resource('drivers')
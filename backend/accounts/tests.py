@@ -1,3 +1,97 @@
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
 from django.test import TestCase
 
-# Create your tests here.
+from accounts.models import FMSUser
+from accounts.permissions import HasAppModuleAccess, IsSuperAdmin
+from accounts.roles import get_user_access
+from trucks.models import Truck
+
+
+class Request:
+    def __init__(self, user):
+        self.user = user
+
+
+class View:
+    queryset = Truck.objects.all()
+
+
+class UserAccessTests(TestCase):
+    """Role checks load a user's groups and permissions once, and follow every change."""
+
+    def setUp(self):
+        cache.clear()
+        self.group = Group.objects.create(name='Dispatch')
+        self.view_truck = Permission.objects.get(codename='view_truck')
+        self.group.permissions.add(self.view_truck)
+        self.user = FMSUser.objects.create(email='roles@fms.test')
+        self.user.groups.add(self.group)
+
+    def access(self):
+        # A fresh instance, as each request authenticates its own
+        return get_user_access(FMSUser.objects.get(pk=self.user.pk))
+
+    def test_access_is_loaded_once_per_user(self):
+        user = FMSUser.objects.get(pk=self.user.pk)
+        request, view = Request(user), View()
+
+        # Groups and permissions: two queries, shared by every check in a request
+        with self.assertNumQueries(2):
+            self.assertTrue(HasAppModuleAccess().has_permission(request, view))
+            self.assertFalse(IsSuperAdmin().has_permission(request, view))
+            self.assertTrue(get_user_access(user).has_perm('trucks.view_truck'))
+
+        # Later requests are served from the cache
+        user = FMSUser.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertTrue(HasAppModuleAccess().has_permission(Request(user), view))
+
+    def test_membership_changes_invalidate(self):
+        self.assertFalse(self.access().is_super_admin)
+        admins = Group.objects.create(name='SuperAdmin')
+
+        # From the user side...
+        self.user.groups.add(admins)
+        self.assertTrue(self.access().is_super_admin)
+        self.user.groups.remove(admins)
+        self.assertFalse(self.access().is_super_admin)
+
+        # ...and from the group side
+        admins.system_user_groups.add(self.user)
+        self.assertTrue(self.access().is_super_admin)
+
+        # Direct user permissions
+        self.user.user_permissions.add(Permission.objects.get(codename='change_truck'))
+        self.assertTrue(self.access().has_perm('trucks.change_truck'))
+
+    def test_group_and_permission_changes_invalidate(self):
+        self.assertTrue(self.access().has_perm('trucks.view_truck'))
+
+        self.group.permissions.remove(self.view_truck)
+        self.assertFalse(self.access().has_perm('trucks.view_truck'))
+
+        self.group.permissions.add(self.view_truck)
+        self.assertTrue(self.access().has_perm('trucks.view_truck'))
+
+        self.group.name = 'SuperAdmin'
+        self.group.save()
+        self.assertTrue(self.access().is_super_admin)
+
+        self.view_truck.delete()
+        self.assertFalse(self.access().has_perm('trucks.view_truck'))
+
+        self.group.delete()
+        self.assertFalse(self.access().is_super_admin)
+
+    def test_user_saves_invalidate(self):
+        self.assertTrue(self.access().has_perm('trucks.view_truck'))
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertFalse(self.access().has_perm('trucks.view_truck'))
+
+        self.user.is_active = True
+        self.user.is_superuser = True
+        self.user.save()
+        self.assertTrue(self.access().has_perm('trucks.delete_truck'))
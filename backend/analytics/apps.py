@@ -2,4 +2,8 @@ from django.apps import AppConfig
 
 class AnalyticsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'analytics'
\ No newline at end of file
+    name = 'analytics'
+
+    def ready(self):
+        # Keeps the dashboard rollups in step with Trip writes
+        from . import signals  # noqa: F401
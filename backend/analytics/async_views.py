@@ -0,0 +1,32 @@
+# backend/analytics/async_views.py
+
+import asyncio
+
+from core.async_api import async_api_view, json_response
+from trucks.models import Truck
+from .models import TripStatusCount
+from .views import dashboard_daily_stats, dashboard_data
+
+
+async def _status_counts():
+    return {status: count async for status, count in TripStatusCount.objects.values_list('status', 'count')}
+
+
+async def _daily_stats():
+    return [stat async for stat in dashboard_daily_stats()]
+
+
+@async_api_view()
+async def dashboard(request):
+    """
+    GET /api/async/analytics/dashboard/ (same body as /api/analytics/dashboard/).
+
+    The three KPI reads are independent, so they are awaited together with
+    asyncio.gather rather than one after the other.
+    """
+    status_counts, daily_stats, maintenance_trucks_count = await asyncio.gather(
+        _status_counts(),
+        _daily_stats(),
+        Truck.objects.filter(status='Maintenance').acount(),
+    )
+    return json_response(dashboard_data(status_counts, daily_stats, maintenance_trucks_count))
@@ -0,0 +1,16 @@
+# analytics/management/commands/rebuild_dashboard_kpis.py
+
+from django.core.management.base import BaseCommand
+from analytics.models import DailyTripStat, HourlyTripStat, TripStatusCount
+from analytics.rollups import rebuild_trip_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the dashboard KPI rollups (daily/hourly stats and status counters) from the trips table.'
+
+    def handle(self, *args, **options):
+        rebuild_trip_rollups()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {DailyTripStat.objects.count()} daily rows, {HourlyTripStat.objects.count()} hourly rows and '
+            f'{TripStatusCount.objects.count()} status counters.'
+        ))
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyTripStat',
+            fields=[
+                ('day', models.DateField(primary_key=True, serialize=False)),
+                ('trips_completed', models.IntegerField(default=0)),
+                ('trips_total', models.IntegerField(default=0)),
+                ('fuel_cost', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'verbose_name': 'Daily Trip Stat',
+                'verbose_name_plural': 'Daily Trip Stats',
+                'db_table': 'daily_trip_stats',
+            },
+        ),
+        migrations.CreateModel(
+            name='TripStatusCount',
+            fields=[
+                ('status', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Trip Status Count',
+                'verbose_name_plural': 'Trip Status Counts',
+                'db_table': 'trip_status_counts',
+            },
+        ),
+    ]
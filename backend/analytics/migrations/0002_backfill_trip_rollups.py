@@ -0,0 +1,18 @@
+from django.db import migrations
+
+
+def backfill_rollups(apps, schema_editor):
+    from analytics.rollups import rebuild_trip_rollups
+    rebuild_trip_rollups(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0001_initial'),
+        ('trips', '0004_trip_actual_end_time'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:14
+
+from django.db import migrations, models
+
+
+def backfill_rollups(apps, schema_editor):
+    from analytics.rollups import rebuild_trip_rollups
+    rebuild_trip_rollups(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0002_backfill_trip_rollups'),
+        ('trips', '0010_trip_events'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HourlyTripStat',
+            fields=[
+                ('hour', models.DateTimeField(primary_key=True, serialize=False)),
+                ('trips_completed', models.IntegerField(default=0)),
+                ('fuel_cost', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('distance_km', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('tonnage', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'verbose_name': 'Hourly Trip Stat',
+                'verbose_name_plural': 'Hourly Trip Stats',
+                'db_table': 'hourly_trip_stats',
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,62 @@
+# analytics/models.py
+
+from django.db import models
+
+# Precomputed dashboard KPIs. Rows are maintained incrementally by
+# analytics.rollups whenever a Trip is created, changed or deleted, so the
+# dashboard never has to scan the trips table.
+
+class DailyTripStat(models.Model):
+    # One row per calendar day (UTC)
+    day = models.DateField(primary_key=True)
+
+    # Completed trips whose actual_end_time falls on this day
+    trips_completed = models.IntegerField(default=0)
+
+    # Trips whose latest of scheduled/actual start falls on this day
+    trips_total = models.IntegerField(default=0)
+
+    # Sum of estimated_fuel_cost for trips that ended on this day
+    fuel_cost = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        db_table = 'daily_trip_stats'
+        verbose_name = 'Daily Trip Stat'
+        verbose_name_plural = 'Daily Trip Stats'
+
+    def __str__(self):
+        return f"{self.day}: {self.trips_completed} completed"
+
+
+class HourlyTripStat(models.Model):
+    # Completed trips bucketed by the hour of actual_end_time. The series
+    # endpoint sums these rows into hour/day/week/month buckets.
+    hour = models.DateTimeField(primary_key=True)
+
+    trips_completed = models.IntegerField(default=0)
+    fuel_cost = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    distance_km = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    # Sum of net_weight
+    tonnage = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        db_table = 'hourly_trip_stats'
+        verbose_name = 'Hourly Trip Stat'
+        verbose_name_plural = 'Hourly Trip Stats'
+
+    def __str__(self):
+        return f"{self.hour}: {self.trips_completed} completed"
+
+
+class TripStatusCount(models.Model):
+    # Running number of trips per status
+    status = models.CharField(max_length=50, primary_key=True)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'trip_status_counts'
+        verbose_name = 'Trip Status Count'
+        verbose_name_plural = 'Trip Status Counts'
+
+    def __str__(self):
+        return f"{self.status}: {self.count}"
@@ -0,0 +1,151 @@
+# backend/analytics/rollups.py
+
+from collections import Counter, defaultdict
+from decimal import Decimal
+
+from django.apps import apps as django_apps
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+
+def _day(value):
+    return timezone.localdate(value) if timezone.is_aware(value) else value.date()
+
+
+def _hour(value):
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def trip_contributions(state):
+    """
+    Returns what one trip snapshot (Trip.tracked_state()) adds to the rollups:
+    a Counter of statuses, a {day: Counter(field=delta)} and an
+    {hour: Counter(field=delta)} mapping.
+    """
+    statuses = Counter()
+    days = defaultdict(Counter)
+    hours = defaultdict(Counter)
+    if state is None:
+        return statuses, days, hours
+
+    statuses[state['status']] += 1
+
+    end_time = state['actual_end_time']
+    if end_time:
+        day = _day(end_time)
+        days[day]['fuel_cost'] += state['estimated_fuel_cost'] or Decimal('0')
+        if state['status'] == 'Completed':
+            days[day]['trips_completed'] += 1
+            hour = hours[_hour(end_time)]
+            hour['trips_completed'] += 1
+            hour['fuel_cost'] += state['estimated_fuel_cost'] or Decimal('0')
+            hour['distance_km'] += state['distance_km'] or Decimal('0')
+            hour['tonnage'] += state['net_weight'] or Decimal('0')
+
+    # Matches the old "scheduled OR actually started in the window" filter:
+    # a trip belongs to the day of its latest start timestamp.
+    starts = [t for t in (state['scheduled_start_time'], state['actual_start_time']) if t]
+    if starts:
+        days[_day(max(starts))]['trips_total'] += 1
+
+    return statuses, days, hours
+
+
+def _apply_delta(model, key_field, key, deltas):
+    """Adds deltas to a rollup row with F() expressions, creating it if needed."""
+    deltas = {field: value for field, value in deltas.items() if value}
+    if not deltas:
+        return
+
+    updates = {field: F(field) + value for field, value in deltas.items()}
+    if model.objects.filter(**{key_field: key}).update(**updates):
+        return
+
+    try:
+        with transaction.atomic():
+            model.objects.create(**{key_field: key}, **deltas)
+    except IntegrityError:
+        # Another request created the row first
+        model.objects.filter(**{key_field: key}).update(**updates)
+
+
+def apply_trip_changes(changes):
+    """
+    Updates the rollups for an iterable of (old_state, new_state) pairs.
+    Either side may be None for created or deleted trips.
+    """
+    from .models import DailyTripStat, HourlyTripStat, TripStatusCount
+
+    status_deltas = Counter()
+    day_deltas = defaultdict(Counter)
+    hour_deltas = defaultdict(Counter)
+
+    for old_state, new_state in changes:
+        new_statuses, new_days, new_hours = trip_contributions(new_state)
+        old_statuses, old_days, old_hours = trip_contributions(old_state)
+
+        status_deltas.update(new_statuses)
+        status_deltas.subtract(old_statuses)
+        for day, values in new_days.items():
+            day_deltas[day].update(values)
+        for day, values in old_days.items():
+            day_deltas[day].subtract(values)
+        for hour, values in new_hours.items():
+            hour_deltas[hour].update(values)
+        for hour, values in old_hours.items():
+            hour_deltas[hour].subtract(values)
+
+    with transaction.atomic():
+        for status, delta in status_deltas.items():
+            _apply_delta(TripStatusCount, 'status', status, {'count': delta})
+        for day, values in day_deltas.items():
+            _apply_delta(DailyTripStat, 'day', day, values)
+        for hour, values in hour_deltas.items():
+            _apply_delta(HourlyTripStat, 'hour', hour, values)
+
+
+def rebuild_trip_rollups(apps=django_apps):
+    """
+    Recomputes all rollups from the trips table. Used by the
+    rebuild_dashboard_kpis command and the initial data migration.
+    """
+    Trip = apps.get_model('trips', 'Trip')
+    DailyTripStat = apps.get_model('analytics', 'DailyTripStat')
+    TripStatusCount = apps.get_model('analytics', 'TripStatusCount')
+    try:
+        HourlyTripStat = apps.get_model('analytics', 'HourlyTripStat')
+    except LookupError:
+        # Migration states before analytics 0003
+        HourlyTripStat = None
+
+    statuses = Counter()
+    days = defaultdict(Counter)
+    hours = defaultdict(Counter)
+    fields = (
+        'status', 'scheduled_start_time', 'actual_start_time',
+        'actual_end_time', 'estimated_fuel_cost', 'distance_km', 'net_weight',
+    )
+    for state in Trip.objects.values(*fields).iterator(chunk_size=2000):
+        trip_statuses, trip_days, trip_hours = trip_contributions(state)
+        statuses.update(trip_statuses)
+        for day, values in trip_days.items():
+            days[day].update(values)
+        for hour, values in trip_hours.items():
+            hours[hour].update(values)
+
+    with transaction.atomic():
+        TripStatusCount.objects.all().delete()
+        DailyTripStat.objects.all().delete()
+        TripStatusCount.objects.bulk_create([
+            TripStatusCount(status=status, count=count)
+            for status, count in statuses.items()
+        ])
+        DailyTripStat.objects.bulk_create([
+            DailyTripStat(day=day, **values) for day, values in days.items()
+        ], batch_size=1000)
+        if HourlyTripStat is not None:
+            HourlyTripStat.objects.all().delete()
+            HourlyTripStat.objects.bulk_create([
+                HourlyTripStat(hour=hour, **values) for hour, values in hours.items()
+            ], batch_size=1000)
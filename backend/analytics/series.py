@@ -0,0 +1,108 @@
+# backend/analytics/series.py
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Count, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from trips.models import Trip
+from .models import HourlyTripStat
+
+# metric -> (HourlyTripStat column, live aggregate over completed trips)
+METRICS = {
+    'trips_completed': ('trips_completed', lambda: Count('pk')),
+    'fuel_cost': ('fuel_cost', lambda: Sum('estimated_fuel_cost')),
+    'distance_km': ('distance_km', lambda: Sum('distance_km')),
+    'tonnage': ('tonnage', lambda: Sum('net_weight')),
+}
+
+BUCKETS = ('hour', 'day', 'week', 'month')
+
+# Shortest length of each bucket, for bounding a request's size up front
+MIN_BUCKET_SECONDS = {'hour': 3600, 'day': 86400, 'week': 7 * 86400, 'month': 28 * 86400}
+
+# Largest number of buckets one request may ask for (a year of hours)
+MAX_BUCKETS = 24 * 366
+
+
+# --- 1. Bucket arithmetic (matches the database's Trunc) ---
+
+def bucket_start(value, bucket):
+    """Start of the bucket containing value, in the current time zone."""
+    value = timezone.localtime(value).replace(minute=0, second=0, microsecond=0)
+    if bucket == 'hour':
+        return value
+    value = value.replace(hour=0)
+    if bucket == 'week':
+        return value - timedelta(days=value.weekday())
+    if bucket == 'month':
+        return value.replace(day=1)
+    return value
+
+
+def next_bucket(value, bucket):
+    if bucket == 'hour':
+        return value + timedelta(hours=1)
+    if bucket == 'day':
+        return value + timedelta(days=1)
+    if bucket == 'week':
+        return value + timedelta(weeks=1)
+    # Month: day 1 of the following month
+    return (value.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def bucket_starts(start, end, bucket):
+    """Starts of the buckets covering [start, end)."""
+    starts, current = [], bucket_start(start, bucket)
+    while current < end:
+        starts.append(current)
+        current = next_bucket(current, bucket)
+    return starts
+
+
+# --- 2. Series ---
+
+def trip_series(metric, bucket, start, end, now=None):
+    """
+    [{'bucket': start, 'value': ...}] for every bucket covering [start, end),
+    empty buckets included.
+
+    Closed buckets are summed from the HourlyTripStat rollup (maintained
+    incrementally on every trip write) with DB-side truncation; only the
+    bucket containing `now` is aggregated live from the trips table. Two
+    queries at most, whatever the range.
+    """
+    column, live_aggregate = METRICS[metric]
+    now = now or timezone.now()
+    starts = bucket_starts(start, end, bucket)
+    if not starts:
+        return []
+    range_end = next_bucket(starts[-1], bucket)
+    open_start = bucket_start(now, bucket)
+
+    values = dict.fromkeys(starts, 0)
+    closed_end = min(range_end, open_start)
+    if starts[0] < closed_end:
+        rows = (
+            HourlyTripStat.objects.filter(hour__gte=starts[0], hour__lt=closed_end)
+            .annotate(bucket=Trunc('hour', bucket))
+            .values('bucket')
+            .annotate(value=Sum(column))
+            .values_list('bucket', 'value')
+        )
+        for key, value in rows:
+            if key in values:
+                values[key] = value
+
+    if starts[0] <= open_start < range_end:
+        live = Trip.objects.filter(
+            status='Completed', actual_end_time__gte=open_start, actual_end_time__lt=next_bucket(open_start, bucket),
+        ).aggregate(value=live_aggregate())
+        values[open_start] = live['value'] or 0
+
+    return [
+        {'bucket': key, 'value': value if metric == 'trips_completed' else Decimal(str(value)).quantize(Decimal('0.01'))}
+        for key, value in values.items()
+    ]
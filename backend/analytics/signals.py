@@ -0,0 +1,24 @@
+# backend/analytics/signals.py
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from trips.models import Trip
+from trips.signals import trips_bulk_changed
+from .rollups import apply_trip_changes
+
+
+@receiver(post_save, sender=Trip)
+def trip_saved(sender, instance, created, **kwargs):
+    old_state = None if created else instance.previous_state()
+    apply_trip_changes([(old_state, instance.tracked_state())])
+
+
+@receiver(post_delete, sender=Trip)
+def trip_deleted(sender, instance, **kwargs):
+    apply_trip_changes([(instance.previous_state() or instance.tracked_state(), None)])
+
+
+@receiver(trips_bulk_changed, sender=Trip)
+def trips_bulk_changed_handler(sender, changes, **kwargs):
+    apply_trip_changes(changes)
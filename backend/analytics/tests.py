@@ -1,3 +1,126 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import Group
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import FMSUser
+from analytics.models import DailyTripStat, HourlyTripStat, TripStatusCount
+from analytics.rollups import rebuild_trip_rollups
+from trips.models import Trip
+from trips.views import TripViewSet
+
+
+class TripSeriesTests(TestCase):
+    """Closed buckets come from the hourly rollup, the open one from the trips table."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.today = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+
+    def complete_trip(self, end_time, distance='100.00', weight='5.00'):
+        return Trip.objects.create(
+            start_location='A', end_location='B', status='Completed', actual_end_time=end_time,
+            distance_km=Decimal(distance), net_weight=Decimal(weight), estimated_fuel_cost=Decimal('10.00'),
+        )
+
+    def series(self, **params):
+        response = self.client.get('/api/analytics/series/', params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return [(row['bucket'], row['value']) for row in response.data['series']]
+
+    def test_daily_series_fills_empty_buckets(self):
+        yesterday = self.today - timedelta(days=1)
+        self.complete_trip(yesterday + timedelta(hours=3))
+        self.complete_trip(yesterday + timedelta(hours=5), distance='50.00')
+        self.complete_trip(timezone.now())
+
+        start = self.today - timedelta(days=2)
+        with self.assertNumQueries(2):
+            rows = self.series(metric='distance_km', start=start.isoformat(), end=timezone.now().isoformat())
+        self.assertEqual([value for _, value in rows], [Decimal('0.00'), Decimal('150.00'), Decimal('100.00')])
+        self.assertEqual(rows[0][0], start)
+
+        self.assertEqual(HourlyTripStat.objects.get(hour=yesterday + timedelta(hours=3)).tonnage, Decimal('5.00'))
+
+    def test_closed_buckets_read_the_rollup(self):
+        last_month = self.today.replace(day=1) - timedelta(days=1)
+        trip = self.complete_trip(last_month)
+        # Bypass the signals: the rollup is stale until rebuilt
+        Trip.objects.filter(pk=trip.pk).update(net_weight=Decimal('9.00'))
+        params = {'metric': 'tonnage', 'bucket': 'month', 'start': last_month.isoformat()}
+        self.assertEqual(self.series(**params)[0][1], Decimal('5.00'))
+        rebuild_trip_rollups()
+        self.assertEqual(self.series(**params)[0][1], Decimal('9.00'))
+
+    def test_rejects_bad_parameters(self):
+        for params in ({'metric': 'speed'}, {'bucket': 'minute'}, {'bucket': 'hour', 'start': '2000-01-01T00:00:00Z'}):
+            self.assertEqual(self.client.get('/api/analytics/series/', params).status_code, 400)
+
+
+class DashboardAsyncViewTests(TestCase):
+
+    def test_async_dashboard_matches_the_sync_view(self):
+        Trip.objects.create(start_location='A', end_location='B', status='In Transit')
+        Trip.objects.create(
+            start_location='A', end_location='B', status='Completed', actual_end_time=timezone.now(),
+            estimated_fuel_cost=Decimal('12.50'),
+        )
+        expected = self.client.get('/api/analytics/dashboard/').json()
+        response = self.client.get('/api/async/analytics/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), expected)
+        self.assertEqual(expected['active_trips'], 1)
+
+
+class TripRollupTests(TestCase):
+    """Status counts and daily stats follow every trip write incrementally."""
+
+    def setUp(self):
+        self.client = APIClient()
+        admin = FMSUser.objects.create(email='rollups@fms.test')
+        admin.groups.add(Group.objects.create(name='SuperAdmin'))
+        self.client.force_authenticate(admin)
+        self.trip = Trip.objects.create(
+            start_location='A', end_location='B', estimated_fuel_cost=Decimal('40.00'),
+            scheduled_start_time=timezone.now(),
+        )
+
+    def counts(self):
+        return {status: count for status, count in TripStatusCount.objects.values_list('status', 'count') if count}
+
+    def set_status(self, status):
+        response = self.client.patch(f'/api/trips/{self.trip.pk}/status/', {'status': status}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_status_changes_and_deletes_update_the_rollups(self):
+        self.assertEqual(self.counts(), {'Scheduled': 1})
+        self.set_status('In Transit')
+        self.assertEqual(self.counts(), {'In Transit': 1})
+        self.set_status('Completed')
+        self.assertEqual(self.counts(), {'Completed': 1})
+
+        day = DailyTripStat.objects.get(day=timezone.localdate())
+        self.assertEqual((day.trips_completed, day.trips_total, day.fuel_cost), (1, 1, Decimal('40.00')))
+
+        self.trip.refresh_from_db()
+        self.trip.delete()
+        self.assertEqual(self.counts(), {})
+        day.refresh_from_db()
+        self.assertEqual((day.trips_completed, day.trips_total, day.fuel_cost), (0, 0, Decimal('0.00')))
+
+    def test_set_status_computes_deltas_from_the_locked_row(self):
+        # A request that loaded the trip before another one changed it
+        stale = Trip.objects.get(pk=self.trip.pk)
+        self.set_status('In Transit')
+        with mock.patch.object(TripViewSet, 'get_object', return_value=stale):
+            self.set_status('Completed')
+        self.assertEqual(self.counts(), {'Completed': 1})
 
-# Create your tests here.
+        # Matches a full recompute
+        expected = self.counts()
+        rebuild_trip_rollups()
+        self.assertEqual(self.counts(), expected)
@@ -1,8 +1,9 @@
 # backend/analytics/urls.py
 
 from django.urls import path
-from .views import DashboardAnalyticsView
+from .views import DashboardAnalyticsView, TripSeriesView
 
 urlpatterns = [
     path('dashboard/', DashboardAnalyticsView.as_view(), name='analytics-dashboard'),
+    path('series/', TripSeriesView.as_view(), name='analytics-series'),
 ]
\ No newline at end of file
@@ -1,72 +1,111 @@
 # backend/analytics/views.py
 
+from rest_framework.exceptions import ParseError
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from trips.models import Trip
+from trips.scheduling import parse_time_bounds
 from trucks.models import Truck
-from django.db.models import Sum, Count, Q
 from django.utils import timezone
 from datetime import timedelta
+from decimal import Decimal
+from .models import DailyTripStat, TripStatusCount
+from .series import BUCKETS, MAX_BUCKETS, METRICS, MIN_BUCKET_SECONDS, trip_series
 
 class DashboardAnalyticsView(APIView):
     """
     Returns required KPIs and time-series data for the dashboard.
     GET /api/analytics/dashboard/
+
+    KPIs come from the DailyTripStat/TripStatusCount rollups instead of
+    aggregating the trips table on every hit. Run
+    `manage.py rebuild_dashboard_kpis` if they ever need to be recomputed.
     """
     
     def get(self, request, *args, **kwargs):
-        # Define the time range for current metrics (e.g., last 30 days)
-        thirty_days_ago = timezone.now() - timedelta(days=30)
-        
-        # --- 1. Calculate Core KPIs ---
-        
-        # Total Fuel Cost (Requires a 'fuel_cost' field on Trip model)
-        # Assuming you implemented a 'fuel_cost' field on the Trip model
-        fuel_cost_result = Trip.objects.filter(
-            actual_end_time__gte=thirty_days_ago
-        ).aggregate(
-            total_fuel_cost=Sum('estimated_fuel_cost')
-        )
-        total_fuel_cost = fuel_cost_result['total_fuel_cost'] or 0.00
-        
+        # --- 1. Read Core KPIs from the precomputed rollups ---
+        # Both tables are maintained incrementally on every Trip write
+        # (see analytics/rollups.py), so these are small indexed reads.
+
         # Active, Scheduled, and Completed Trip Counts
-        active_trips_count = Trip.objects.filter(status='In Transit').count()
-        scheduled_trips_count = Trip.objects.filter(status='Scheduled').count()
-        
-        # Trucks Under Maintenance (Requires a 'status' field on the Truck model)
-        # Assuming your Truck model has a 'status' field where 'Maintenance' is a value
+        status_counts = dict(TripStatusCount.objects.values_list('status', 'count'))
+
+        # Per-day rows for the window (primary key range scan)
+        daily_stats = list(dashboard_daily_stats())
+
+        # Trucks Under Maintenance (served by idx_trucks_status_capacity)
         maintenance_trucks_count = Truck.objects.filter(status='Maintenance').count()
-        
-        # --- 2. Generate Trip Time-Series Data (Trips Completed per Day) ---
-        
-        # We look at completed trips for the last 30 days
-        completed_trips_data = Trip.objects.filter(
-            status='Completed', 
-            actual_end_time__gte=thirty_days_ago
-        ).extra({'day': "date(actual_end_time)"}).values('day').annotate(count=Count('trip_id')).order_by('day')
-        
-        # Format for frontend consumption (e.g., a list of dictionaries)
-        trip_time_series = [
-            {'date': item['day'], 'trips_completed': item['count']}
-            for item in completed_trips_data
-        ]
-
-        # --- 3. Compile and Return Response ---
-        
-        dashboard_data = {
-            # Required KPIs from the project summary
-            "total_fuel_cost": round(total_fuel_cost, 2),
-            "active_trips": active_trips_count,
-            "scheduled_trips": scheduled_trips_count,
-            "maintenance_trucks": maintenance_trucks_count,
-            
-            # Time-series data
-            "trip_time_series": trip_time_series,
-            
-            # Other useful context (optional)
-            "total_trips_last_30_days": Trip.objects.filter(
-                Q(scheduled_start_time__gte=thirty_days_ago) | Q(actual_start_time__gte=thirty_days_ago)
-            ).count()
-        }
-
-        return Response(dashboard_data)
\ No newline at end of file
+
+        return Response(dashboard_data(status_counts, daily_stats, maintenance_trucks_count))
+
+
+def dashboard_daily_stats():
+    # Define the time range for current metrics (e.g., last 30 days)
+    thirty_days_ago = timezone.localdate() - timedelta(days=30)
+    return DailyTripStat.objects.filter(day__gte=thirty_days_ago).order_by('day')
+
+
+def dashboard_data(status_counts, daily_stats, maintenance_trucks_count):
+    """Dashboard body from the three KPI reads (shared with analytics/async_views.py)."""
+    active_trips_count = status_counts.get('In Transit', 0)
+    scheduled_trips_count = status_counts.get('Scheduled', 0)
+
+    # Total Fuel Cost of trips that ended in the window
+    total_fuel_cost = sum((stat.fuel_cost for stat in daily_stats), Decimal('0.00'))
+
+    # --- 2. Trip Time-Series Data (Trips Completed per Day) ---
+
+    # Format for frontend consumption (e.g., a list of dictionaries)
+    trip_time_series = [
+        {'date': stat.day, 'trips_completed': stat.trips_completed}
+        for stat in daily_stats if stat.trips_completed
+    ]
+
+    # --- 3. Compile the Response ---
+
+    return {
+        # Required KPIs from the project summary
+        "total_fuel_cost": round(total_fuel_cost, 2),
+        "active_trips": active_trips_count,
+        "scheduled_trips": scheduled_trips_count,
+        "maintenance_trucks": maintenance_trucks_count,
+
+        # Time-series data
+        "trip_time_series": trip_time_series,
+
+        # Other useful context (optional)
+        "total_trips_last_30_days": sum(stat.trips_total for stat in daily_stats),
+    }
+
+
+class TripSeriesView(APIView):
+    """
+    Time-bucketed trip metrics over an arbitrary range.
+    GET /api/analytics/series/?metric=fuel_cost&bucket=week&start=<iso>&end=<iso>
+
+    metric: trips_completed (default), fuel_cost, distance_km or tonnage,
+    all over completed trips by actual_end_time. bucket: hour, day
+    (default), week or month. The range defaults to the last 30 days and is
+    widened to whole buckets.
+    """
+
+    def get(self, request, *args, **kwargs):
+        metric = request.query_params.get('metric', 'trips_completed')
+        bucket = request.query_params.get('bucket', 'day')
+        if metric not in METRICS:
+            raise ParseError(f'metric must be one of: {", ".join(METRICS)}.')
+        if bucket not in BUCKETS:
+            raise ParseError(f'bucket must be one of: {", ".join(BUCKETS)}.')
+
+        bounds = parse_time_bounds(request.query_params, 'start', 'end')
+        end = bounds.get('end') or timezone.now()
+        start = bounds.get('start') or end - timedelta(days=30)
+        if start >= end:
+            raise ParseError('start must be before end.')
+        if (end - start).total_seconds() / MIN_BUCKET_SECONDS[bucket] > MAX_BUCKETS:
+            raise ParseError(f'Too many buckets; at most {MAX_BUCKETS} per request.')
+
+        return Response({
+            'metric': metric,
+            'bucket': bucket,
+            'series': trip_series(metric, bucket, start, end),
+        })
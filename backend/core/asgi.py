@@ -3,16 +3,42 @@
 import os
 from channels.routing import ProtocolTypeRouter, URLRouter
 from django.core.asgi import get_asgi_application
-from trips.routing import websocket_urlpatterns # <-- New Import
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
 # Fetch Django's ASGI application
 django_asgi_app = get_asgi_application()
 
+# Imports models, so only after get_asgi_application() has set Django up
+# (ASGI servers import this module before anything else)
+from trips.routing import websocket_urlpatterns  # noqa: E402
+
+
+
+async def lifespan(scope, receive, send):
+    """
+    ASGI lifespan events (sent by uvicorn workers, see gunicorn.conf.py).
+    On shutdown, pings and trip events still buffered by this worker's
+    ingestor are written before the process exits.
+    """
+    from trips.ingestion import get_ingestor
+
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await get_ingestor().shutdown()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
 application = ProtocolTypeRouter({
     "http": django_asgi_app,
 
+    # Worker startup/shutdown (production server only)
+    "lifespan": lifespan,
+
     # WebSocket protocol handling
     "websocket": URLRouter(
         websocket_urlpatterns # Uses the routing we just created
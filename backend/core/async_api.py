@@ -0,0 +1,103 @@
+# backend/core/async_api.py
+#
+# Plumbing for the async read endpoints under /api/async/ (see
+# trips/async_views.py and analytics/async_views.py). DRF views are
+# synchronous: under ASGI each request to them holds a thread from start to
+# finish. These are plain Django `async def` views that authenticate, query
+# (with the async ORM) and render without leaving the event loop except for
+# the queries themselves.
+
+import functools
+
+from django.contrib.auth.models import AnonymousUser
+from django.http import Http404, HttpResponse
+from django.views.decorators.http import require_http_methods
+from rest_framework.exceptions import APIException, AuthenticationFailed, NotFound
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+# --- 1. Authentication ---
+
+class AsyncJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication (the REST_FRAMEWORK default) with an async user lookup."""
+
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        # Signature and expiry checks are CPU only
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        """Same checks as JWTAuthentication.get_user, with the query awaited."""
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as exc:
+            raise InvalidToken('Token contained no recognizable user identification') from exc
+
+        try:
+            user = await self.user_model.objects.aget(**{api_settings.USER_ID_FIELD: user_id})
+        except self.user_model.DoesNotExist as exc:
+            raise AuthenticationFailed('User not found', code='user_not_found') from exc
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+        if api_settings.CHECK_REVOKE_TOKEN and (
+            validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password)
+        ):
+            raise AuthenticationFailed("The user's password has been changed.", code='password_changed')
+        return user
+
+
+# --- 2. Responses ---
+
+def json_response(data, status=200, headers=None):
+    """Renders like a DRF JSON Response (same encoder, so decimals and dates match)."""
+    return HttpResponse(JSONRenderer().render(data), status=status, headers=headers, content_type='application/json')
+
+
+def drf_request(request):
+    """
+    Wraps an authenticated Django request for the sync building blocks
+    reused by the async views (ViewSet queryset/serializer selection,
+    paginators). Nothing on it triggers authentication again.
+    """
+    wrapped = Request(request, authenticators=())
+    wrapped.user = request.user
+    wrapped.auth = request.auth
+    return wrapped
+
+
+def async_api_view(methods=('GET',)):
+    """
+    Turns `async def view(request, ...)` into an API endpoint: JWT
+    authentication (request.user / request.auth), and DRF-style error
+    bodies ({'detail': ...}) for APIException and Http404.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            authenticator = AsyncJWTAuthentication()
+            try:
+                request.user, request.auth = await authenticator.aauthenticate(request) or (AnonymousUser(), None)
+                return await view(request, *args, **kwargs)
+            except (APIException, Http404) as exc:
+                if isinstance(exc, Http404):
+                    exc = NotFound(*exc.args)
+                headers = {}
+                if exc.status_code == 401:
+                    headers['WWW-Authenticate'] = authenticator.authenticate_header(request)
+                detail = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+                return json_response(detail, exc.status_code, headers)
+
+        return require_http_methods(list(methods))(wrapper)
+    return decorator
@@ -0,0 +1,132 @@
+# backend/core/caching.py
+
+import hashlib
+import json
+import time
+from functools import partial
+
+from django.core.cache import caches
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+from accounts.roles import get_user_access
+
+# Shared by every worker, so one write invalidates all of them.
+# Point it at Redis in deployments (RESPONSE_CACHE_URL in core/settings.py).
+CACHE_ALIAS = 'responses'
+RESPONSE_TIMEOUT = 3600
+
+
+def response_cache():
+    return caches[CACHE_ALIAS]
+
+
+# --- 1. Versioned resources ---
+
+def _version_key(resource):
+    return f'responses:version:{resource}'
+
+
+def resource_version(resource):
+    # A fresh timestamp never collides with versions used by older entries
+    return response_cache().get_or_set(_version_key(resource), time.time_ns, None)
+
+
+def bump_resource_version(resource):
+    cache = response_cache()
+    try:
+        cache.incr(_version_key(resource))
+    except ValueError:
+        # The version key was evicted; start a new version series.
+        cache.set(_version_key(resource), time.time_ns(), None)
+
+
+def invalidate_resource(resource):
+    """
+    Makes every cached response of a resource stale once the current
+    transaction commits (called from save/delete signals). Bumping earlier
+    would let a reader cache pre-commit rows under the new version.
+    """
+    transaction.on_commit(partial(bump_resource_version, resource), robust=True)
+
+
+def make_etag(data):
+    body = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True).encode()
+    return '"%s"' % hashlib.md5(body, usedforsecurity=False).hexdigest()
+
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    # Weak comparison, as for GET requests
+    candidates = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+    return etag in candidates
+
+
+# --- 2. ViewSet mixin ---
+
+class CachedResponseMixin:
+    """
+    Caches list/retrieve responses of read-mostly ViewSets.
+
+    Keys carry the resource version, the caller's permission scope, the
+    action, the object id and the query string. Saves and deletes bump the
+    version when they commit (see the apps' signals.py), so stale entries
+    are never read and simply expire. Cached responses carry an ETag; a matching
+    If-None-Match gets a 304 without touching the database or serializers.
+
+    Permissions are still checked on every request (before the handler
+    runs). Only use this on views without object-level permissions, since
+    cached retrieves skip get_object().
+    """
+    cache_resource = None
+    cached_actions = ('list', 'retrieve')
+
+    def cache_scope(self):
+        """Callers in the same scope are served the same cached responses."""
+        user = self.request.user
+        if not user.is_authenticated:
+            return 'anonymous'
+        return 'superadmin' if get_user_access(user).is_super_admin else 'user'
+
+    def response_cache_key(self):
+        query = '&'.join(sorted(
+            f'{name}={value}' for name, values in self.request.query_params.lists() for value in values
+        ))
+        lookup = self.kwargs.get(self.lookup_url_kwarg or self.lookup_field, '')
+        accepted = getattr(self.request, 'accepted_media_type', '')
+        digest = hashlib.md5(f'{lookup}|{query}|{accepted}'.encode(), usedforsecurity=False).hexdigest()
+        version = resource_version(self.cache_resource)
+        return f'responses:{self.cache_resource}:{version}:{self.cache_scope()}:{self.action}:{digest}'
+
+    def cached_response(self, handler, *args, **kwargs):
+        key = self.response_cache_key()
+        cache = response_cache()
+        cached = cache.get(key)
+        if cached is None:
+            response = handler(*args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            cached = {'etag': make_etag(response.data), 'data': response.data}
+            cache.set(key, cached, RESPONSE_TIMEOUT)
+
+        if etag_matches(self.request.headers.get('If-None-Match'), cached['etag']):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(cached['data'])
+        response['ETag'] = cached['etag']
+        return response
+
+    def list(self, request, *args, **kwargs):
+        if 'list' not in self.cached_actions:
+            return super().list(request, *args, **kwargs)
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        if 'retrieve' not in self.cached_actions:
+            return super().retrieve(request, *args, **kwargs)
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
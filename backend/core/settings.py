@@ -97,6 +97,14 @@ DATABASES = {
         default='sqlite:///db.sqlite3'
     )
 }
+# Connections close after each request by default. Under ASGI each request
+# may run its sync code on a different thread, so persistent connections
+# pile up (one per thread) instead of being reused. Opt in with
+# DB_CONN_MAX_AGE (seconds) only where a pooler such as PgBouncer holds the
+# real server connections. Health checks drop connections the server or
+# pooler has closed.
+DATABASES['default']['CONN_MAX_AGE'] = env.int('DB_CONN_MAX_AGE', default=0)
+DATABASES['default']['CONN_HEALTH_CHECKS'] = True
 
 
 # Password validation
@@ -167,6 +175,8 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
+    # Bulk endpoints report errors as {item index: errors}
+    'LIST_SERIALIZER_ERRORS_AS_DICT': True,
     # We will add permission settings later
 }
 
@@ -196,4 +206,76 @@ CHANNEL_LAYERS = {
             "hosts": [('fms_redis', 6379)], 
         },
     },
-}
\ No newline at end of file
+}
+# --- Caches ---
+CACHES = {
+    # Per-process cache (role resolution, etc.)
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Shared by HTTP and WebSocket workers: last known truck positions.
+    # Point it at Redis in deployments, e.g. REALTIME_CACHE_URL=redis://redis:6379/1
+    'realtime': env.cache_url('REALTIME_CACHE_URL', default='locmemcache://realtime'),
+    # Cached master-data API responses (core/caching.py). Invalidation bumps
+    # a version key here, so share it between workers (e.g. Redis) in
+    # deployments: RESPONSE_CACHE_URL=redis://redis:6379/2
+    'responses': env.cache_url('RESPONSE_CACHE_URL', default='locmemcache://responses'),
+}
+
+# --- Live Location Ingestion (trips/ingestion.py) ---
+# Driver pings are coalesced per trip and flushed once per window:
+# one broadcast per trip and one bulk insert of positions.
+TRIP_LOCATION_INGESTION = {
+    'WINDOW_SECONDS': env.float('TRIP_PING_WINDOW_SECONDS', default=1.0),
+    # Drop pings that moved less than this since the last accepted one...
+    'MIN_DISTANCE_METERS': env.float('TRIP_PING_MIN_DISTANCE_METERS', default=25),
+    # ...unless this long has passed (keeps a heartbeat for parked trucks)
+    'MIN_INTERVAL_SECONDS': env.float('TRIP_PING_MIN_INTERVAL_SECONDS', default=15),
+    'BATCH_SIZE': 500,
+}
+
+# --- Truck/Driver Assignment Optimizer (trips/optimizer.py) ---
+TRIP_OPTIMIZER = {
+    # Default wall-clock budget per optimize request
+    'TIME_BUDGET_SECONDS': env.float('TRIP_OPTIMIZER_TIME_BUDGET_SECONDS', default=5.0),
+    # Solve independent time windows in a process pool when > 1
+    'WORKERS': env.int('TRIP_OPTIMIZER_WORKERS', default=0),
+}
+
+# --- Distances and ETAs (trips/eta.py) ---
+TRIP_ROUTING = {
+    # Road distance ~= great-circle distance * ROAD_FACTOR
+    'ROAD_FACTOR': env.float('TRIP_ROAD_FACTOR', default=1.3),
+    'AVERAGE_SPEED_KMH': env.float('TRIP_AVERAGE_SPEED_KMH', default=50),
+}
+
+# --- Fuel Estimates (trips/fuel.py) ---
+# Defaults apply until refresh_fuel_estimates has fitted profiles from
+# recorded fuel purchases.
+TRIP_FUEL = {
+    'DEFAULT_BASE_LITERS_PER_KM': env.float('TRIP_FUEL_BASE_LITERS_PER_KM', default=0.3),
+    'DEFAULT_LITERS_PER_KM_PER_TON': env.float('TRIP_FUEL_LITERS_PER_KM_PER_TON', default=0.02),
+    'DEFAULT_PRICE_PER_LITER': env.float('TRIP_FUEL_PRICE_PER_LITER', default=60),
+    # Trucks with fewer completed, fueled trips use the fleet-wide profile
+    'MIN_SAMPLES': 5,
+    'PRICE_WINDOW_DAYS': 30,
+}
+
+# --- Trip Event Metrics (trips/events.py) ---
+TRIP_EVENTS = {
+    # A trip finishing up to this long after scheduled_end_time is on time
+    'ON_TIME_GRACE_MINUTES': env.int('TRIP_ON_TIME_GRACE_MINUTES', default=15),
+}
+
+# --- Real-time Push Outbox (trips/outbox.py) ---
+# Status changes queue their pushes in trip_outbox; the dispatch_trip_outbox
+# command publishes them to the channel layer.
+TRIP_OUTBOX = {
+    'BATCH_SIZE': 500,
+    # Sleep between scans of an empty outbox (upper bound on added latency)
+    'POLL_SECONDS': env.float('TRIP_OUTBOX_POLL_SECONDS', default=0.25),
+    'PUBLISH_TIMEOUT_SECONDS': 5,
+    # Failed batches are retried after 1, 2, 4, ... seconds, capped here
+    'RETRY_BASE_SECONDS': 1,
+    'MAX_BACKOFF_SECONDS': 60,
+}
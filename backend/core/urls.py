@@ -9,6 +9,11 @@ from rest_framework.routers import DefaultRouter
 from employees.views import DriverViewSet
 from trips.views import TripViewSet
 from trucks.views import TruckViewSet # 👈 New Import
+from locations.views import LocationViewSet
+from core.views import healthz
+from trips import async_views as trip_async_views
+from analytics import async_views as analytics_async_views
+from customers.views import CustomerViewSet
 
 
 
@@ -17,11 +22,16 @@ router.register(r'trips', TripViewSet, basename='trip')
 # ADD THIS LINE:
 router.register(r'drivers', DriverViewSet, basename='driver')
 router.register(r'trucks', TruckViewSet, basename='truck')
+router.register(r'locations', LocationViewSet, basename='location')
+router.register(r'customers', CustomerViewSet, basename='customer')
 
 urlpatterns = [
     # Default Django Admin Interface
     path('admin/', admin.site.urls),
 
+    # Liveness/readiness probe for the production server pools and proxy
+    path('healthz/', healthz, name='healthz'),
+
     # --- API Routes ---
 
     path('api/', include(router.urls)),
@@ -47,6 +57,13 @@ urlpatterns = [
 
     # Analytics Routes
     path('api/analytics/', include('analytics.urls')),
+
+    # Async (ASGI-native) versions of the hottest reads, same responses as the
+    # sync endpoints they mirror
+    path('api/async/trips/', trip_async_views.trip_list, name='async-trip-list'),
+    path('api/async/trips/active/', trip_async_views.active_trips, name='async-trip-active'),
+    path('api/async/trips/<str:pk>/', trip_async_views.trip_detail, name='async-trip-detail'),
+    path('api/async/analytics/dashboard/', analytics_async_views.dashboard, name='async-analytics-dashboard'),
 ]
 
 if settings.DEBUG:
@@ -0,0 +1,18 @@
+# backend/core/views.py
+
+from django.db import DatabaseError, connection
+from django.http import JsonResponse
+
+
+def healthz(request):
+    """
+    Health check for docker-compose and the proxy: 200 when this worker can
+    reach the database (reusing its persistent connection), else 503.
+    No authentication, no sessions.
+    """
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    except DatabaseError:
+        return JsonResponse({'status': 'unavailable'}, status=503)
+    return JsonResponse({'status': 'ok'})
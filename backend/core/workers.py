@@ -0,0 +1,37 @@
+# backend/core/workers.py
+#
+# Uvicorn worker classes for gunicorn.conf.py (production only; uvicorn is
+# not needed for runserver or the tests).
+
+from uvicorn.workers import UvicornWorker
+
+
+class _GracefulWorker(UvicornWorker):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Stop waiting on open connections a little before gunicorn's
+        # graceful_timeout kills the worker, so the lifespan shutdown (which
+        # flushes buffered pings) still gets to run
+        self.config.timeout_graceful_shutdown = max(self.cfg.graceful_timeout - 5, 1)
+
+
+class HTTPWorker(_GracefulWorker):
+    """REST API pool: WebSocket upgrades are refused, they belong to the ws pool."""
+    CONFIG_KWARGS = {
+        'loop': 'auto',
+        'http': 'auto',
+        'ws': 'none',
+        'lifespan': 'on',
+    }
+
+
+class WebSocketWorker(_GracefulWorker):
+    """Channels pool: pings detect dead sockets (e.g. trucks losing signal)."""
+    CONFIG_KWARGS = {
+        'loop': 'auto',
+        'http': 'auto',
+        'ws': 'auto',
+        'ws_ping_interval': 20.0,
+        'ws_ping_timeout': 20.0,
+        'lifespan': 'on',
+    }
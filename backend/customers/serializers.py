@@ -0,0 +1,16 @@
+# customers/serializers.py
+
+from rest_framework import serializers
+from .models import Customer
+
+class CustomerSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Customer
+        fields = (
+            'customer_id',
+            'name',
+            'contact_name',
+            'contact_phone',
+            'created_at',
+        )
+        read_only_fields = ('customer_id', 'created_at')
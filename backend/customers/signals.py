@@ -0,0 +1,13 @@
+# customers/signals.py
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.caching import invalidate_resource
+from .models import Customer
+
+
+@receiver(post_save, sender=Customer)
+@receiver(post_delete, sender=Customer)
+def customer_changed(sender, **kwargs):
+    invalidate_resource('customers')
@@ -1,3 +1,43 @@
+from django.contrib.auth.models import Group
+from django.core.cache import caches
+from django.db import transaction
 from django.test import TestCase
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from accounts.models import FMSUser
+from customers.models import Customer
+
+
+class CustomerApiTests(TestCase):
+    """Customers are served by a cached ViewSet that invalidates on writes."""
+
+    def setUp(self):
+        caches['responses'].clear()
+        admin = FMSUser.objects.create(email='customers@fms.test')
+        admin.groups.add(Group.objects.create(name='SuperAdmin'))
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+
+    def test_create_then_list_sees_the_new_customer(self):
+        Customer.objects.create(name='Acme')
+        self.assertEqual([row['name'] for row in self.client.get('/api/customers/').data], ['Acme'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/master/customers/', {'name': 'Beta Foods'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([row['name'] for row in self.client.get('/api/customers/').data], ['Acme', 'Beta Foods'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Customer.objects.filter(name='Acme').first().delete()
+        self.assertEqual(len(self.client.get('/api/customers/').data), 1)
+
+    def test_rolled_back_write_keeps_the_cached_responses(self):
+        etag = self.client.get('/api/customers/')['ETag']
+        with self.captureOnCommitCallbacks() as callbacks:
+            with transaction.atomic():
+                Customer.objects.create(name='Acme')
+                # A read before the commit must not be cached as the new version
+                self.client.get('/api/customers/')
+                transaction.set_rollback(True)
+        self.assertEqual(callbacks, [])
+        self.assertEqual(self.client.get('/api/customers/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
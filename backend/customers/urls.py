@@ -1,4 +1,13 @@
-from django.urls import path
+# customers/urls.py
 
+from rest_framework.routers import DefaultRouter
+from .views import CustomerViewSet
 
-urlpatterns = []
\ No newline at end of file
+router = DefaultRouter()
+# This registers the CustomerViewSet and creates routes like:
+# /api/master/customers/
+# /api/master/customers/{pk}/
+router.register(r'', CustomerViewSet, basename='customer')
+
+# The router provides the complete urlpatterns
+urlpatterns = router.urls
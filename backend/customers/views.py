@@ -1,3 +1,22 @@
-from django.shortcuts import render
+# customers/views.py
 
-# Create your views here.
+from rest_framework import viewsets
+from rest_framework.permissions import IsAuthenticated
+from accounts.permissions import HasAppModuleAccess
+from core.caching import CachedResponseMixin
+from .models import Customer
+from .serializers import CustomerSerializer
+
+class CustomerViewSet(CachedResponseMixin, viewsets.ModelViewSet):
+    """
+    API endpoint for Customers.
+    List/detail responses are cached with ETags (core.caching).
+    """
+
+    queryset = Customer.objects.all().order_by('name', 'customer_id')
+    serializer_class = CustomerSerializer
+    permission_classes = [IsAuthenticated, HasAppModuleAccess]
+    cache_resource = 'customers'
+
+    # The custom permission relies on this attribute.
+    model = Customer
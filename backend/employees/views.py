@@ -4,9 +4,12 @@ from rest_framework import viewsets, permissions
 from accounts.models import FMSUser 
 from .serializers import DriverSerializer
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from core.caching import CachedResponseMixin
 
-class DriverViewSet(viewsets.ModelViewSet):
+class DriverViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     serializer_class = DriverSerializer
+    # Responses are cached with ETags; any FMSUser save invalidates them
+    cache_resource = 'drivers'
     permission_classes = [IsAuthenticated, IsAdminUser]
 
     def get_queryset(self):
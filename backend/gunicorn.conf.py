@@ -0,0 +1,46 @@
+# backend/gunicorn.conf.py
+#
+# Production ASGI server (the 'production' profile in docker-compose.yml):
+#   gunicorn core.asgi:application -c gunicorn.conf.py
+#
+# The same config runs two separate pools, picked by FMS_SERVER_POOL:
+#   http -- the REST API: many short requests, workers recycled periodically
+#   ws   -- the Channels WebSockets: long-lived sockets, never recycled
+# The proxy in front (deploy/nginx.conf) sends /ws/ to the ws pool and
+# everything else to the http pool.
+
+import multiprocessing
+import os
+
+pool = os.environ.get('FMS_SERVER_POOL', 'http')
+if pool not in ('http', 'ws'):
+    raise ValueError(f"FMS_SERVER_POOL must be 'http' or 'ws', not {pool!r}")
+cpus = multiprocessing.cpu_count()
+
+# --- 1. Workers ---
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+worker_class = 'core.workers.HTTPWorker' if pool == 'http' else 'core.workers.WebSocketWorker'
+# Socket workers mostly wait on the network, so fewer of them hold many
+# connections each
+workers = int(os.environ.get('GUNICORN_WORKERS', cpus * 2 + 1 if pool == 'http' else max(2, cpus)))
+
+# Bound memory growth of HTTP workers; recycling a socket worker would drop
+# every connection it holds, so that pool is never recycled
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 2000 if pool == 'http' else 0))
+max_requests_jitter = max_requests // 10
+
+# --- 2. Timeouts and graceful shutdown ---
+# Worker heartbeat; a worker silent for longer is restarted
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+# On SIGTERM workers stop accepting, finish in-flight requests, close
+# sockets with 1012 (service restart, clients reconnect to a live worker)
+# and flush buffered pings (core.asgi lifespan) within this many seconds
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30 if pool == 'http' else 60))
+keepalive = 5
+
+# --- 3. Proxy and logging ---
+# Trust X-Forwarded-* from the proxy in front
+forwarded_allow_ips = os.environ.get('FORWARDED_ALLOW_IPS', '*')
+proc_name = f'fms-{pool}'
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-' if pool == 'http' else None)
+errorlog = '-'
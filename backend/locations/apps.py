@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class LocationsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'locations'
+
+    def ready(self):
+        # Keeps the in-process spatial index (locations.spatial) current
+        from . import signals  # noqa: F401
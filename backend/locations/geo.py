@@ -0,0 +1,86 @@
+# locations/geo.py
+
+import math
+
+import numpy as np
+from django.core.cache import caches
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Great-circle distance between two points given in decimal degrees."""
+    lat1, lng1, lat2, lng2 = map(math.radians, (float(lat1), float(lng1), float(lat2), float(lng2)))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+# --- Vectorized great-circle distances (NumPy) ---
+
+def haversine_pairs(lat1, lng1, lat2, lng2):
+    """
+    Element-wise great-circle distances (km) for equal-length coordinate
+    sequences: result[i] is the distance from (lat1[i], lng1[i]) to
+    (lat2[i], lng2[i]). Returns a list of floats.
+    """
+    lat1, lng1, lat2, lng2 = (np.radians(np.asarray(values, dtype=float)) for values in (lat1, lng1, lat2, lng2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return (2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))).tolist()
+
+
+class DistanceMatrixCache:
+    """
+    Memoized pairwise distances between coordinates.
+
+    Keys are the coordinates themselves (rounded to ~0.1 m), so moving a
+    Location simply stops matching its old entries. Lookups check the
+    process-local dict first, then the shared cache with one get_many, and
+    only the remaining pairs are computed -- in one vectorized call.
+    """
+    TIMEOUT = 30 * 24 * 3600
+    # Keep the local dict bounded in long-running workers
+    MAX_LOCAL_ENTRIES = 100000
+
+    def __init__(self, alias='default'):
+        self.alias = alias
+        self.local = {}
+
+    @staticmethod
+    def key(origin, destination):
+        return 'geo:dist:%.6f,%.6f:%.6f,%.6f' % (*origin, *destination)
+
+    def distances(self, pairs):
+        """Distances (km) for a list of ((lat, lng), (lat, lng)) pairs, in order."""
+        pairs = [(tuple(map(float, origin)), tuple(map(float, destination))) for origin, destination in pairs]
+        keys = [self.key(*pair) for pair in pairs]
+        found = {key: self.local[key] for key in keys if key in self.local}
+
+        missing = [key for key in set(keys) if key not in found]
+        if missing:
+            shared = caches[self.alias].get_many(missing)
+            found.update(shared)
+            self._remember(shared)
+
+        todo = {key: pair for key, pair in zip(keys, pairs) if key not in found}
+        if todo:
+            computed = haversine_pairs(
+                [origin[0] for origin, _ in todo.values()], [origin[1] for origin, _ in todo.values()],
+                [destination[0] for _, destination in todo.values()], [destination[1] for _, destination in todo.values()],
+            )
+            computed = dict(zip(todo, computed))
+            caches[self.alias].set_many(computed, self.TIMEOUT)
+            found.update(computed)
+            self._remember(computed)
+
+        return [found[key] for key in keys]
+
+    def _remember(self, entries):
+        if len(self.local) + len(entries) > self.MAX_LOCAL_ENTRIES:
+            self.local.clear()
+        self.local.update(entries)
+
+
+distance_cache = DistanceMatrixCache()
@@ -0,0 +1,18 @@
+# locations/serializers.py
+
+from rest_framework import serializers
+from .models import Location
+
+class LocationSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Location
+        fields = (
+            'location_id',
+            'name',
+            'address_line_1',
+            'city',
+            'latitude',
+            'longitude',
+            'is_hub',
+        )
+        read_only_fields = ('location_id',)
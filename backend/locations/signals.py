@@ -0,0 +1,20 @@
+# locations/signals.py
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.caching import invalidate_resource
+from .models import Location
+from .spatial import location_index
+
+
+@receiver(post_save, sender=Location)
+def location_saved(sender, instance, **kwargs):
+    location_index.location_saved(instance)
+    invalidate_resource('locations')
+
+
+@receiver(post_delete, sender=Location)
+def location_deleted(sender, instance, **kwargs):
+    location_index.location_deleted(instance.location_id)
+    invalidate_resource('locations')
@@ -0,0 +1,238 @@
+# locations/spatial.py
+
+import math
+import threading
+import time
+from collections import defaultdict
+
+from django.core.cache import caches
+
+from .geo import haversine_km
+
+KM_PER_DEGREE = 111.195
+
+
+class GridIndex:
+    """
+    In-process spatial index over Location coordinates.
+
+    Locations are bucketed into cells of CELL_DEGREES x CELL_DEGREES, so a
+    lookup only measures the points in the few cells around the query
+    instead of every row. Entries are plain tuples, and add()/remove() keep
+    the index current one row at a time. Writes and lookups hold the index
+    lock, so signal handlers can update it while other threads search.
+
+    Longitude wrap-around at +/-180 is not handled; the fleet does not cross
+    the antimeridian.
+    """
+    CELL_DEGREES = 0.25  # ~28 km at the equator
+
+    def __init__(self, cell_degrees=None):
+        self.cell_degrees = cell_degrees or self.CELL_DEGREES
+        self.cells = defaultdict(dict)  # (row, col) -> {location_id: entry}
+        self.cell_of = {}               # location_id -> (row, col)
+        self.bounds = None              # (min row, max row, min col, max col) of occupied cells
+        self.lock = threading.RLock()
+
+    def cell(self, lat, lng):
+        return math.floor(lat / self.cell_degrees), math.floor(lng / self.cell_degrees)
+
+    def add(self, location_id, lat, lng, **data):
+        """Inserts or moves a location. Extra data (name, is_hub...) is kept with it."""
+        with self.lock:
+            self.remove(location_id)
+            key = self.cell(lat, lng)
+            self.cells[key][location_id] = dict(data, location_id=location_id, latitude=lat, longitude=lng)
+            self.cell_of[location_id] = key
+            if self.bounds is not None:
+                row_min, row_max, col_min, col_max = self.bounds
+                self.bounds = (min(row_min, key[0]), max(row_max, key[0]), min(col_min, key[1]), max(col_max, key[1]))
+
+    def remove(self, location_id):
+        with self.lock:
+            key = self.cell_of.pop(location_id, None)
+            if key is not None:
+                self.cells[key].pop(location_id, None)
+                if not self.cells[key]:
+                    del self.cells[key]
+                    # May have been an edge cell; recomputed on the next lookup
+                    self.bounds = None
+
+    def occupied_bounds(self):
+        """Bounds of the occupied cells, computed once and kept by add()."""
+        if self.bounds is None and self.cells:
+            rows = [key[0] for key in self.cells]
+            cols = [key[1] for key in self.cells]
+            self.bounds = (min(rows), max(rows), min(cols), max(cols))
+        return self.bounds
+
+    def __len__(self):
+        return len(self.cell_of)
+
+    def _candidates(self, keys, hubs_only):
+        for key in keys:
+            for entry in self.cells.get(key, {}).values():
+                if not hubs_only or entry.get('is_hub'):
+                    yield entry
+
+    def _measure(self, lat, lng, entries):
+        return [(haversine_km(lat, lng, entry['latitude'], entry['longitude']), entry) for entry in entries]
+
+    def nearest(self, lat, lng, n=1, hubs_only=False, max_km=None):
+        """
+        Up to n (distance_km, entry) pairs closest to a point, nearest first.
+
+        Cells are scanned in growing square rings around the query cell and
+        the search stops once the n-th best distance is closer than anything
+        an unscanned ring could contain.
+        """
+        with self.lock:
+            if not self.cells or n < 1:
+                return []
+            return self._nearest(lat, lng, n, hubs_only, max_km)
+
+    def _nearest(self, lat, lng, n, hubs_only, max_km):
+        row, col = self.cell(lat, lng)
+        row_min, row_max, col_min, col_max = self.occupied_bounds()
+        last_ring = max(abs(row - row_min), abs(row - row_max), abs(col - col_min), abs(col - col_max))
+
+        found = []
+        for ring in range(last_ring + 1):
+            if ring == 0:
+                keys = [(row, col)]
+            else:
+                keys = [(row + dr, col + dc) for dr in range(-ring, ring + 1) for dc in (-ring, ring)]
+                keys += [(row + dr, col + dc) for dr in (-ring, ring) for dc in range(-ring + 1, ring)]
+            found += self._measure(lat, lng, self._candidates(keys, hubs_only))
+            found.sort(key=lambda pair: pair[0])
+            del found[n:]
+
+            # Closest possible point in the next ring (longitude cells shrink
+            # with latitude, so use the narrowest spacing in reach)
+            reach = min(89.9, abs(lat) + (ring + 1) * self.cell_degrees)
+            spacing = self.cell_degrees * KM_PER_DEGREE * max(math.cos(math.radians(reach)), 0.01)
+            bound = ring * spacing
+            if max_km is not None and bound > max_km:
+                break
+            if len(found) == n and found[-1][0] <= bound:
+                break
+
+        if max_km is not None:
+            found = [pair for pair in found if pair[0] <= max_km]
+        return found
+
+    def within(self, lat, lng, radius_km, hubs_only=False):
+        """All (distance_km, entry) pairs within radius_km of a point, nearest first."""
+        dlat = radius_km / KM_PER_DEGREE
+        widest = min(89.9, abs(lat) + dlat)
+        dlng = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(widest)), 0.01))
+        (row_min, col_min), (row_max, col_max) = self.cell(lat - dlat, lng - dlng), self.cell(lat + dlat, lng + dlng)
+
+        with self.lock:
+            if (row_max - row_min + 1) * (col_max - col_min + 1) > len(self.cells):
+                # Radius covers more cells than are occupied: walk the occupied ones
+                keys = [key for key in self.cells if row_min <= key[0] <= row_max and col_min <= key[1] <= col_max]
+            else:
+                keys = [(r, c) for r in range(row_min, row_max + 1) for c in range(col_min, col_max + 1)]
+            found = [pair for pair in self._measure(lat, lng, self._candidates(keys, hubs_only)) if pair[0] <= radius_km]
+
+        found.sort(key=lambda pair: pair[0])
+        return found
+
+
+def _entry_data(location):
+    return {'name': location.name, 'city': location.city, 'is_hub': location.is_hub}
+
+
+class LocationIndex:
+    """
+    Process-wide GridIndex over the locations table.
+
+    Built with one query on first use. Saves and deletes in this process
+    update it row by row (locations.signals); they also bump a version in
+    the shared 'realtime' cache, and other processes reload when they see a
+    new version -- checked at most every VERSION_CHECK_SECONDS, so lookups
+    at ping rate stay in memory.
+    """
+    VERSION_KEY = 'locations:index:version'
+    VERSION_CHECK_SECONDS = 5
+
+    def __init__(self):
+        self._grid = None
+        self._version = None
+        self._checked_at = 0
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches['realtime']
+
+    def _shared_version(self):
+        return self.cache.get_or_set(self.VERSION_KEY, time.time_ns, None)
+
+    def load(self):
+        from .models import Location
+
+        grid = GridIndex()
+        locations = Location.objects.filter(latitude__isnull=False, longitude__isnull=False).only(
+            'location_id', 'name', 'city', 'is_hub', 'latitude', 'longitude',
+        )
+        for location in locations.iterator(chunk_size=2000):
+            grid.add(location.location_id, float(location.latitude), float(location.longitude), **_entry_data(location))
+        grid.occupied_bounds()
+        return grid
+
+    @property
+    def grid(self):
+        now = time.monotonic()
+        if self._grid is None or now - self._checked_at > self.VERSION_CHECK_SECONDS:
+            with self._lock:
+                if self._grid is None or now - self._checked_at > self.VERSION_CHECK_SECONDS:
+                    version = self._shared_version()
+                    if self._grid is None or version != self._version:
+                        self._grid, self._version = self.load(), version
+                    self._checked_at = now
+        return self._grid
+
+    def _bump_version(self):
+        try:
+            version = self.cache.incr(self.VERSION_KEY)
+        except ValueError:
+            version = time.time_ns()
+            self.cache.set(self.VERSION_KEY, version, None)
+        # This process is already up to date
+        if self._grid is not None:
+            self._version = version
+
+    def location_saved(self, location):
+        grid = self._grid
+        if grid is not None:
+            with grid.lock:
+                if location.latitude is None or location.longitude is None:
+                    grid.remove(location.location_id)
+                else:
+                    grid.add(
+                        location.location_id, float(location.latitude), float(location.longitude),
+                        **_entry_data(location),
+                    )
+        self._bump_version()
+
+    def location_deleted(self, location_id):
+        grid = self._grid
+        if grid is not None:
+            with grid.lock:
+                grid.remove(location_id)
+        self._bump_version()
+
+    def reset(self):
+        """Drops the index; the next lookup reloads it."""
+        self._grid = None
+
+    def nearest(self, lat, lng, n=1, hubs_only=False, max_km=None):
+        return self.grid.nearest(lat, lng, n=n, hubs_only=hubs_only, max_km=max_km)
+
+    def within(self, lat, lng, radius_km, hubs_only=False):
+        return self.grid.within(lat, lng, radius_km, hubs_only=hubs_only)
+
+
+location_index = LocationIndex()
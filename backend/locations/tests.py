@@ -1,3 +1,139 @@
-from django.test import TestCase
+import random
+import threading
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import Group
+from django.core.cache import caches
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from accounts.models import FMSUser
+from locations.geo import DistanceMatrixCache, haversine_km, haversine_pairs
+from locations.models import Location
+from locations.spatial import GridIndex, location_index
+
+
+class GridIndexTests(SimpleTestCase):
+    """Grid lookups return exactly what a full scan would."""
+
+    def setUp(self):
+        rng = random.Random(3)
+        self.points = {
+            i: (rng.uniform(4, 20), rng.uniform(116, 127), rng.random() < 0.2) for i in range(500)
+        }
+        self.grid = GridIndex()
+        for i, (lat, lng, is_hub) in self.points.items():
+            self.grid.add(i, lat, lng, is_hub=is_hub)
+
+    def scan(self, lat, lng, hubs_only=False):
+        return sorted(
+            (haversine_km(lat, lng, p_lat, p_lng), i)
+            for i, (p_lat, p_lng, is_hub) in self.points.items() if is_hub or not hubs_only
+        )
+
+    def test_nearest_and_within_match_a_full_scan(self):
+        for lat, lng in ((14.6, 121.0), (10.3, 123.9), (25.0, 130.0)):
+            expected = [i for _, i in self.scan(lat, lng, hubs_only=True)[:5]]
+            found = [entry['location_id'] for _, entry in self.grid.nearest(lat, lng, n=5, hubs_only=True)]
+            self.assertEqual(found, expected)
+
+            expected = [i for distance, i in self.scan(lat, lng) if distance <= 120]
+            found = [entry['location_id'] for _, entry in self.grid.within(lat, lng, 120)]
+            self.assertEqual(found, expected)
+
+    def test_moves_and_removals_are_incremental(self):
+        self.grid.add(0, 50.0, 50.0, is_hub=True)
+        self.assertEqual(self.grid.nearest(50.01, 50.01)[0][1]['location_id'], 0)
+        self.grid.remove(0)
+        self.assertNotEqual(self.grid.nearest(50.01, 50.01)[0][1]['location_id'], 0)
+        self.assertEqual(len(self.grid), 499)
+
+    def test_bounds_follow_adds_and_removals(self):
+        bounds = self.grid.occupied_bounds()
+        self.grid.add(0, 50.0, 50.0)
+        # Cell (200, 200) is north-west of the others
+        self.assertEqual(self.grid.bounds, (bounds[0], 200, 200, bounds[3]))
+        self.grid.remove(0)
+        self.assertEqual(self.grid.occupied_bounds(), bounds)
+
+    def test_lookups_run_alongside_writes(self):
+        errors = []
+
+        def write():
+            try:
+                for i in range(2000):
+                    self.grid.add(1000 + i % 50, 4 + i % 16, 116 + i % 11)
+                    self.grid.remove(1000 + (i + 25) % 50)
+            except Exception as exc:
+                errors.append(exc)
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        while writer.is_alive():
+            self.grid.nearest(12.0, 121.0, n=5)
+            self.grid.within(12.0, 121.0, 300)
+        writer.join()
+        self.assertEqual(errors, [])
+
+
+class DistanceTests(SimpleTestCase):
+    """Vectorized distances agree with the scalar formula and are computed once."""
+
+    def setUp(self):
+        rng = random.Random(5)
+        self.pairs = [
+            ((rng.uniform(-60, 60), rng.uniform(-170, 170)), (rng.uniform(-60, 60), rng.uniform(-170, 170)))
+            for _ in range(200)
+        ]
+
+    def test_haversine_pairs_matches_haversine_km(self):
+        found = haversine_pairs(*zip(*((a[0], a[1], b[0], b[1]) for a, b in self.pairs)))
+        self.assertIsInstance(found[0], float)
+        for distance, (origin, destination) in zip(found, self.pairs):
+            self.assertAlmostEqual(distance, haversine_km(*origin, *destination), places=6)
+        self.assertEqual(haversine_pairs([], [], [], []), [])
+
+    def test_distance_cache_computes_each_pair_once(self):
+        caches['default'].clear()
+        cache = DistanceMatrixCache()
+        with mock.patch('locations.geo.haversine_pairs', wraps=haversine_pairs) as compute:
+            first = cache.distances(self.pairs)
+            # Repeats and a fresh process (empty local dict) hit the caches
+            cache.local.clear()
+            self.assertEqual(cache.distances(self.pairs + self.pairs[:3]), first + first[:3])
+        self.assertEqual(compute.call_count, 1)
+        self.assertEqual(len(compute.call_args.args[0]), len(self.pairs))
+
+
+class LocationApiTests(TestCase):
+    """Spatial endpoints follow row changes without a reload."""
+
+    def setUp(self):
+        location_index.reset()
+        self.addCleanup(location_index.reset)
+        admin = FMSUser.objects.create(email='admin@fms.test')
+        admin.groups.add(Group.objects.create(name='SuperAdmin'))
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+
+    def test_nearest_hubs_follow_saves_and_deletes(self):
+        manila = Location.objects.create(name='Manila Hub', latitude='14.599500', longitude='120.984200', is_hub=True)
+        Location.objects.create(name='Makati Office', latitude='14.554700', longitude='121.024400')
+
+        response = self.client.get('/api/locations/nearest-hubs/', {'lat': 14.56, 'lng': 121.02, 'n': 3})
+        self.assertEqual([row['name'] for row in response.data], ['Manila Hub'])
+        self.assertIsNotNone(location_index.grid.bounds)
+
+        # Index is loaded now; later changes are applied row by row
+        clark = Location.objects.create(name='Clark Hub', latitude='15.185800', longitude='120.546000', is_hub=True)
+        with self.assertNumQueries(0):
+            location_index.nearest(15.2, 120.5)
+        response = self.client.get('/api/locations/nearest-hubs/', {'lat': 15.2, 'lng': 120.5})
+        self.assertEqual(response.data[0]['location_id'], clark.location_id)
+
+        manila.delete()
+        response = self.client.get('/api/locations/within/', {'lat': 14.56, 'lng': 121.02, 'radius_km': 20})
+        self.assertEqual([row['name'] for row in response.data], ['Makati Office'])
+
+    def test_requires_a_point(self):
+        self.assertEqual(self.client.get('/api/locations/nearest-hubs/').status_code, 400)
@@ -1,4 +1,14 @@
-from django.urls import path
+# locations/urls.py
 
+from rest_framework.routers import DefaultRouter
+from .views import LocationViewSet
 
-urlpatterns = []
\ No newline at end of file
+router = DefaultRouter()
+# This registers the LocationViewSet and creates routes like:
+# /api/master/locations/
+# /api/master/locations/{pk}/
+# /api/master/locations/nearest-hubs/?lat=..&lng=..
+router.register(r'', LocationViewSet, basename='location')
+
+# The router provides the complete urlpatterns
+urlpatterns = router.urls
@@ -1,3 +1,70 @@
-from django.shortcuts import render
+# locations/views.py
 
-# Create your views here.
+from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ParseError
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from accounts.permissions import HasAppModuleAccess
+from core.caching import CachedResponseMixin
+from .models import Location
+from .serializers import LocationSerializer
+from .spatial import location_index
+
+class LocationViewSet(CachedResponseMixin, viewsets.ModelViewSet):
+    """
+    API endpoint for Locations, plus spatial lookups served from the
+    in-process grid index (locations.spatial), never a table scan:
+    - GET nearest-hubs/?lat=..&lng=..&n=5
+    - GET within/?lat=..&lng=..&radius_km=25&hubs_only=true
+    List/detail responses are cached with ETags (core.caching).
+    """
+    cache_resource = 'locations'
+
+    queryset = Location.objects.all().order_by('name')
+    serializer_class = LocationSerializer
+    permission_classes = [IsAuthenticated, HasAppModuleAccess]
+
+    # The custom permission relies on this attribute.
+    model = Location
+
+    # Upper bounds so one request cannot ask for the whole table
+    MAX_RESULTS = 100
+    MAX_RADIUS_KM = 1000
+
+    def get_point(self):
+        try:
+            lat = float(self.request.query_params['lat'])
+            lng = float(self.request.query_params['lng'])
+        except (KeyError, ValueError):
+            raise ParseError('lat and lng are required numbers.')
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            raise ParseError('lat/lng out of range.')
+        return lat, lng
+
+    def get_number(self, name, default, cast, maximum):
+        try:
+            value = cast(self.request.query_params.get(name, default))
+        except ValueError:
+            raise ParseError(f'{name} must be a number.')
+        if not 0 < value <= maximum:
+            raise ParseError(f'{name} must be between 0 and {maximum}.')
+        return value
+
+    @staticmethod
+    def render(found):
+        return [dict(entry, distance_km=round(distance, 3)) for distance, entry in found]
+
+    @action(detail=False, methods=['get'], url_path='nearest-hubs')
+    def nearest_hubs(self, request):
+        lat, lng = self.get_point()
+        n = self.get_number('n', 1, int, self.MAX_RESULTS)
+        return Response(self.render(location_index.nearest(lat, lng, n=n, hubs_only=True)))
+
+    @action(detail=False, methods=['get'], url_path='within')
+    def within(self, request):
+        lat, lng = self.get_point()
+        radius_km = self.get_number('radius_km', 10, float, self.MAX_RADIUS_KM)
+        hubs_only = request.query_params.get('hubs_only', '').lower() in ('1', 'true', 'yes')
+        found = location_index.within(lat, lng, radius_km, hubs_only=hubs_only)
+        return Response(self.render(found[:self.MAX_RESULTS]))
@@ -2,4 +2,8 @@ from django.apps import AppConfig
 
 class TripsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'trips'
\ No newline at end of file
+    name = 'trips'
+
+    def ready(self):
+        # Registers the Trip receivers (conditional GET stamps)
+        from . import signals  # noqa: F401
@@ -0,0 +1,75 @@
+# backend/trips/async_views.py
+#
+# Async versions of the hottest trip reads, served under /api/async/trips/.
+# Responses match TripViewSet's list/retrieve/active: the querysets and
+# serializers are chosen by TripViewSet itself, only the I/O is async.
+
+from django.http import Http404
+
+from core.async_api import async_api_view, drf_request, json_response
+from .conditional import (
+    alist_validators, has_conditions, not_modified, request_variant, set_validators, trip_validators,
+)
+from .models import Trip
+from .views import TripViewSet
+
+
+def trip_view(request, action, **kwargs):
+    """A TripViewSet set up for `action`, as the router would for a sync request."""
+    # TripViewSet's permission checks never query; keep it that way, or
+    # wrap this call in sync_to_async
+    view = TripViewSet(action=action, request=drf_request(request), args=(), kwargs=kwargs, format_kwarg=None)
+    view.check_permissions(view.request)
+    # Same 400 for unknown ?fields= names as the sync views
+    view.get_requested_fields()
+    return view
+
+
+async def _trip_page(request, action):
+    view = trip_view(request, action)
+    validators = await alist_validators(request_variant(view.request))
+    response = not_modified(request, *validators)
+    if response is None:
+        paginator = view.paginator
+        trips = await paginator.apaginate_queryset(view.get_queryset(), view.request, view=view)
+        # Relations are select_related by get_queryset, so this never queries
+        response = json_response(paginator.get_paginated_data(view.get_serializer(trips, many=True).data))
+    return set_validators(response, *validators)
+
+
+@async_api_view()
+async def trip_list(request):
+    """GET /api/async/trips/ (same parameters as /api/trips/)."""
+    return await _trip_page(request, 'list')
+
+
+@async_api_view()
+async def active_trips(request):
+    """GET /api/async/trips/active/ (same parameters as /api/trips/active/)."""
+    return await _trip_page(request, 'active')
+
+
+@async_api_view()
+async def trip_detail(request, pk):
+    """GET /api/async/trips/<pk>/, with the same ETag/Last-Modified shortcut as TripViewSet.retrieve."""
+    view = trip_view(request, 'retrieve', pk=pk)
+    variant = request_variant(view.request)
+    pk = str(pk)
+    if has_conditions(request) and pk.isdigit():
+        stamp = await Trip.objects.filter(pk=pk).values('version', 'updated_at', 'assigned_driver_id').afirst()
+        if stamp is not None:
+            view.check_object_permissions(view.request, Trip(trip_id=int(pk), assigned_driver_id=stamp['assigned_driver_id']))
+            validators = trip_validators(pk, stamp['version'], stamp['updated_at'], variant)
+            response = not_modified(request, *validators)
+            if response is not None:
+                return set_validators(response, *validators)
+
+    try:
+        instance = await view.get_queryset().aget(pk=pk) if pk.isdigit() else None
+    except Trip.DoesNotExist:
+        instance = None
+    if instance is None:
+        raise Http404('No Trip matches the given query.')
+    view.check_object_permissions(view.request, instance)
+    response = json_response(view.get_serializer(instance).data)
+    return set_validators(response, *trip_validators(pk, instance.version, instance.updated_at, variant))
@@ -0,0 +1,96 @@
+# backend/trips/conditional.py
+
+import hashlib
+import time
+
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+# Trip list change counter, bumped after every committed trip write (see
+# trips/signals.py). MAX(updated_at) cannot serve: a transaction that
+# commits after a newer one leaves it unchanged, and so do deletions.
+# Lives in the shared 'realtime' cache so all workers agree on it.
+LIST_STAMP_KEY = 'trips:list:version'
+
+
+def _stamp_cache():
+    return caches['realtime']
+
+
+def list_stamp():
+    return _stamp_cache().get_or_set(LIST_STAMP_KEY, time.time_ns, None)
+
+
+async def alist_stamp():
+    return await _stamp_cache().aget_or_set(LIST_STAMP_KEY, time.time_ns, None)
+
+
+def bump_list_stamp():
+    cache = _stamp_cache()
+    try:
+        cache.incr(LIST_STAMP_KEY)
+    except ValueError:
+        # Evicted: a fresh timestamp never repeats an earlier value
+        cache.set(LIST_STAMP_KEY, time.time_ns(), None)
+
+
+def trips_changed():
+    """
+    Changes the trip list ETag once the current transaction commits, so a
+    reader can never cache pre-commit rows under the new stamp.
+    """
+    transaction.on_commit(bump_list_stamp, robust=True)
+
+
+# --- 1. Validators ---
+
+def request_variant(request):
+    """Query string and media type: the same trip renders differently per ?fields=/view=/cursor."""
+    query = '&'.join(sorted(
+        f'{name}={value}' for name, values in request.query_params.lists() for value in values
+    ))
+    return f'{query}|{getattr(request, "accepted_media_type", "")}'
+
+
+def _etag(*parts):
+    digest = hashlib.md5('|'.join(map(str, parts)).encode(), usedforsecurity=False).hexdigest()
+    return f'"{digest}"'
+
+
+def trip_validators(trip_id, version, updated_at, variant):
+    """(ETag, Last-Modified timestamp) of one trip's representation."""
+    return _etag('trip', trip_id, version, updated_at.timestamp(), variant), int(updated_at.timestamp())
+
+
+def list_validators(variant):
+    """
+    (ETag, Last-Modified timestamp) of the trip list, from the list change
+    counter. There is no trustworthy Last-Modified for the list (see
+    LIST_STAMP_KEY), so it is None and clients revalidate with the ETag.
+    """
+    return _etag('trips', list_stamp(), variant), None
+
+
+async def alist_validators(variant):
+    """list_validators for the async views."""
+    return _etag('trips', await alist_stamp(), variant), None
+
+
+# --- 2. Responses ---
+
+def has_conditions(request):
+    return 'HTTP_IF_NONE_MATCH' in request.META or 'HTTP_IF_MODIFIED_SINCE' in request.META
+
+
+def not_modified(request, etag, last_modified):
+    """A 304 response when the request's If-None-Match/If-Modified-Since match, else None."""
+    return get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+
+def set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    return response
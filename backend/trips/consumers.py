@@ -1,8 +1,15 @@
 # backend/trips/consumers.py
 import json
+import logging
+from urllib.parse import parse_qs
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
-from asgiref.sync import async_to_sync
-from django.utils import timezone
+from .ingestion import get_ingestor
+from .models import Trip, ACTIVE_STATUSES, MILESTONE_EVENTS
+from .positions import last_known_positions
+from .realtime import FLEET_GROUP, fleet_update_message, trip_group_name
+
+logger = logging.getLogger(__name__)
 
 
 class TripConsumer(AsyncWebsocketConsumer):
@@ -12,7 +19,7 @@ class TripConsumer(AsyncWebsocketConsumer):
         # Extract the trip ID from the URL route
         self.trip_id = self.scope['url_route']['kwargs']['trip_id']
         # Create a unique group name for this trip
-        self.trip_group_name = f'trip_{self.trip_id}'
+        self.trip_group_name = trip_group_name(self.trip_id)
 
         # Join the trip-specific group
         await self.channel_layer.group_add(
@@ -23,6 +30,12 @@ class TripConsumer(AsyncWebsocketConsumer):
         # Accept the connection
         await self.accept()
 
+        # Send the latest known position right away instead of waiting for
+        # the next ping (served from memory/cache, no DB round-trip)
+        snapshot = await last_known_positions.aget(self.trip_id)
+        if snapshot is not None:
+            await self.send(text_data=json.dumps(snapshot))
+
     async def disconnect(self, close_code):
         # Leave the trip-specific group on disconnect
         await self.channel_layer.group_discard(
@@ -38,29 +51,45 @@ class TripConsumer(AsyncWebsocketConsumer):
         
         The expected format is JSON:
         {"lat": 14.5995, "lng": 120.9842, "status": "in_transit"}
+        or, for loading/unloading milestones:
+        {"event": "Loading_Arrival", "document_no": "DR-123"}
+
+        Pings are not rebroadcast one by one: the LocationIngestor coalesces
+        them per trip and sends at most one update per window.
         """
         try:
             text_data_json = json.loads(text_data)
         except json.JSONDecodeError:
-            print("Received invalid JSON data.")
+            logger.warning('Received invalid location data for trip %s', self.trip_id)
             return
 
-        # Prepare the update message payload
-        message = {
-            'type': 'trip_update', # This corresponds to the handler method below
-            'trip_id': self.trip_id,
-            'status': text_data_json.get('status'),
-            'lat': text_data_json.get('lat'),
-            'lng': text_data_json.get('lng'),
-            'timestamp': str(timezone.now()),
-            # A more complete implementation would retrieve/calculate ETA
-            # 'eta_next_stop': text_data_json.get('eta_next_stop') 
-        }
+        if isinstance(text_data_json, dict) and 'event' in text_data_json:
+            if text_data_json['event'] not in MILESTONE_EVENTS:
+                logger.warning('Received unknown trip event for trip %s', self.trip_id)
+                return
+            # Buffered like pings: written to the event log once per window
+            get_ingestor().submit_event(
+                self.trip_id, text_data_json['event'], document_no=text_data_json.get('document_no'),
+            )
+            return
 
-        # Send message to the trip group (broadcast to all listening dispatchers/views)
-        await self.channel_layer.group_send(
-            self.trip_group_name,
-            message
+        try:
+            lat = float(text_data_json['lat'])
+            lng = float(text_data_json['lng'])
+        except (json.JSONDecodeError, TypeError, KeyError, ValueError):
+            logger.warning('Received invalid location data for trip %s', self.trip_id)
+            return
+
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            logger.warning('Received out-of-range coordinates for trip %s', self.trip_id)
+            return
+
+        get_ingestor().submit(
+            self.trip_id,
+            lat,
+            lng,
+            status=text_data_json.get('status'),
+            sender_channel=self.channel_name,
         )
 
     # --- 3. Handling Data from Channel Layer (Broadcast from Django View) ---
@@ -68,11 +97,143 @@ class TripConsumer(AsyncWebsocketConsumer):
     async def trip_update(self, event):
         """
         Custom handler method corresponding to the 'type': 'trip_update' in the message.
-        This is called when a message is sent to the group by the Django view (Step 2.5).
+        This is called when a message is sent to the group by the Django view (Step 2.5)
+        or by the LocationIngestor.
         """
+        event = dict(event)
+        # Don't echo a driver's own ping back to them
+        if event.pop('sender_channel', None) == self.channel_name:
+            return
+
         # Send the JSON payload back to the client over the WebSocket
         await self.send(text_data=json.dumps(event))
 
 
-# You will need to import 'timezone' if you use it in receive(), or remove it for this MVP example
-# from django.utils import timezone
\ No newline at end of file
+class FleetConsumer(AsyncWebsocketConsumer):
+    """
+    Live map for dispatchers: one socket for the whole fleet.
+
+    ws://<host>/ws/fleet/?status=In Transit&bbox=<minLat>,<minLng>,<maxLat>,<maxLng>
+
+    Clients get a snapshot of up to SNAPSHOT_LIMIT active trips (Scheduled,
+    In Transit) on connect, then at most one batched 'fleet_update'
+    per ingestion window with compact delta rows (see trips.realtime.FLEET_FIELDS).
+    A trip that leaves the filter (e.g. is Completed) is sent one last time so
+    the client can drop it from the map.
+
+    Pings often carry no status; those rows are filtered (and sent) with the
+    trip's last status seen on this socket, or its stored status.
+
+    Historical statuses (?status=Completed) only get live deltas: their
+    trips grow without bound and have no live position worth a snapshot.
+    """
+
+    DEFAULT_STATUSES = ('In Transit',)
+    # Largest connect snapshot; newest trips first beyond that
+    SNAPSHOT_LIMIT = 2000
+
+    async def connect(self):
+        params = parse_qs(self.scope.get('query_string', b'').decode())
+        try:
+            self.bbox = self.parse_bbox(params.get('bbox', [None])[0])
+        except ValueError:
+            await self.close(code=4400)
+            return
+
+        statuses = params.get('status', [','.join(self.DEFAULT_STATUSES)])[0]
+        # status=all disables status filtering
+        self.statuses = None if statuses == 'all' else {
+            self.normalize_status(status) for status in statuses.split(',') if status.strip()
+        }
+        self.visible = set()  # trips currently shown on this client's map
+        self.known_statuses = {}  # trip_id -> last status seen, for pings without one
+
+        await self.channel_layer.group_add(FLEET_GROUP, self.channel_name)
+        await self.accept()
+        await self.send_snapshot()
+
+    async def disconnect(self, close_code):
+        await self.channel_layer.group_discard(FLEET_GROUP, self.channel_name)
+
+    @staticmethod
+    def parse_bbox(value):
+        if not value:
+            return None
+        min_lat, min_lng, max_lat, max_lng = (float(part) for part in value.split(','))
+        return min_lat, min_lng, max_lat, max_lng
+
+    @staticmethod
+    def normalize_status(status):
+        # Driver apps send 'in_transit', the API uses 'In Transit'
+        return status.strip().replace('_', ' ').lower() if status else None
+
+    def matches(self, lat, lng, status):
+        if self.statuses is not None and self.normalize_status(status) not in self.statuses:
+            return False
+        if self.bbox is not None:
+            if lat is None or lng is None:
+                return False
+            min_lat, min_lng, max_lat, max_lng = self.bbox
+            return min_lat <= lat <= max_lat and min_lng <= lng <= max_lng
+        return True
+
+    async def fill_statuses(self, deltas):
+        """Deltas with a missing status replaced by the last-known or stored one."""
+        for trip_id, _, _, status, _ in deltas:
+            if status is not None:
+                self.known_statuses[trip_id] = status
+        unknown = {row[0] for row in deltas if row[3] is None and row[0] not in self.known_statuses}
+        if unknown:
+            self.known_statuses.update(await database_sync_to_async(self.stored_statuses)(unknown))
+        return [
+            row if row[3] is not None else [row[0], row[1], row[2], self.known_statuses.get(row[0]), row[4]]
+            for row in deltas
+        ]
+
+    @staticmethod
+    def stored_statuses(trip_ids):
+        trip_ids = [trip_id for trip_id in trip_ids if isinstance(trip_id, int)]
+        return dict(Trip.objects.filter(pk__in=trip_ids).values_list('trip_id', 'status'))
+
+    async def select(self, deltas):
+        """Deltas this client should see, updating the visible set."""
+        selected = []
+        for row in await self.fill_statuses(deltas):
+            trip_id, lat, lng, status, _ = row
+            if self.matches(lat, lng, status):
+                self.visible.add(trip_id)
+                selected.append(row)
+            elif trip_id in self.visible:
+                # Left the filter: send once so the client removes it
+                self.visible.discard(trip_id)
+                selected.append(row)
+        return selected
+
+    async def send_snapshot(self):
+        # Only trips that can still move are listed, whatever the filter
+        statuses = [status for status in ACTIVE_STATUSES if self.statuses is None or status.lower() in self.statuses]
+        stored = await database_sync_to_async(self.statuses_for_snapshot)(statuses, self.SNAPSHOT_LIMIT) if statuses else {}
+        # The database is newer than whatever this socket has not seen yet
+        self.known_statuses.update(stored)
+        trip_ids = list(stored)
+
+        cached = await last_known_positions.cache.aget_many(
+            [last_known_positions.key(trip_id) for trip_id in trip_ids]
+        )
+        messages = [
+            last_known_positions.local.get(str(trip_id)) or cached.get(last_known_positions.key(trip_id))
+            for trip_id in trip_ids
+        ]
+        snapshot = fleet_update_message([message for message in messages if message], snapshot=True)
+        snapshot['deltas'] = await self.select(snapshot['deltas'])
+        await self.send(text_data=json.dumps(snapshot))
+
+    @staticmethod
+    def statuses_for_snapshot(statuses, limit):
+        trips = Trip.objects.filter(status__in=statuses).order_by('-trip_id')[:limit]
+        return dict(trips.values_list('trip_id', 'status'))
+
+    async def fleet_update(self, event):
+        deltas = await self.select(event['deltas'])
+        if deltas:
+            await self.send(text_data=json.dumps(dict(event, deltas=deltas)))
@@ -0,0 +1,174 @@
+# backend/trips/eta.py
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from locations.geo import distance_cache
+from locations.models import Location
+from .models import Trip
+from .positions import current_position
+from .signals import trips_bulk_changed
+
+
+def routing_setting(name, default):
+    return getattr(settings, 'TRIP_ROUTING', {}).get(name, default)
+
+
+# --- 1. Resolving endpoints ---
+
+def resolve_locations(names):
+    """
+    {lowercased name: Location} for free-text endpoint names, in one query.
+    Only Locations with coordinates are returned; on duplicate names hubs
+    win, then the oldest row.
+    """
+    wanted = {name.strip().lower() for name in names if name and name.strip()}
+    if not wanted:
+        return {}
+    locations = (
+        Location.objects.annotate(name_key=Lower('name'))
+        .filter(name_key__in=wanted, latitude__isnull=False, longitude__isnull=False)
+        .order_by('-is_hub', 'location_id')
+    )
+    resolved = {}
+    for location in locations:
+        resolved.setdefault(location.name_key, location)
+    return resolved
+
+
+def road_distances(pairs):
+    """
+    Estimated road distances (km) for (origin, destination) coordinate pairs,
+    None where either side is unknown. Great-circle distances come from the
+    memoized distance matrix; ROAD_FACTOR corrects for roads not being
+    straight lines.
+    """
+    known = [index for index, (origin, destination) in enumerate(pairs) if origin and destination]
+    distances = [None] * len(pairs)
+    factor = routing_setting('ROAD_FACTOR', 1.3)
+    for index, km in zip(known, distance_cache.distances([pairs[index] for index in known])):
+        distances[index] = km * factor
+    return distances
+
+
+def _coordinates(location):
+    return (location.latitude, location.longitude) if location is not None else None
+
+
+def resolve_routes(endpoints):
+    """
+    For (start_location, end_location) name pairs, returns
+    (origin Location, destination Location, distance_km) per pair -- one
+    query for the locations and one batch distance lookup for all pairs.
+    """
+    locations = resolve_locations([name for pair in endpoints for name in pair])
+    resolved = [
+        tuple(locations.get((name or '').strip().lower()) for name in pair)
+        for pair in endpoints
+    ]
+    distances = road_distances([tuple(map(_coordinates, pair)) for pair in resolved])
+    return [
+        (origin, destination, Decimal(str(round(km, 2))) if km is not None else None)
+        for (origin, destination), km in zip(resolved, distances)
+    ]
+
+
+def apply_routes(items):
+    """
+    Fills origin_location, destination_location and distance_km on
+    serializer validated_data dicts, keeping values the client sent.
+    """
+    routes = resolve_routes([(item.get('start_location'), item.get('end_location')) for item in items])
+    for item, (origin, destination, distance_km) in zip(items, routes):
+        item.setdefault('origin_location', origin)
+        item.setdefault('destination_location', destination)
+        if item.get('distance_km') is None:
+            item['distance_km'] = distance_km
+
+
+def fill_distances(trips=None, overwrite=False, batch_size=2000):
+    """
+    Resolves endpoints and stores distance_km for many trips, one batch of
+    batch_size trips at a time (keyset over trip_id, one bulk_update per
+    batch). Trips that already have a distance are skipped unless
+    overwrite is set. Returns the number of trips updated.
+    """
+    trips = Trip.objects.all() if trips is None else trips
+    if not overwrite:
+        trips = trips.filter(distance_km__isnull=True)
+    trips = trips.only(
+        'trip_id', 'start_location', 'end_location', 'origin_location', 'destination_location',
+        *Trip.TRACKED_FIELDS, *Trip.VERSION_FIELDS,
+    )
+
+    updated, last_id = 0, 0
+    while True:
+        batch = list(trips.filter(trip_id__gt=last_id).order_by('trip_id')[:batch_size])
+        if not batch:
+            return updated
+        last_id = batch[-1].trip_id
+
+        changed, changes = [], []
+        routes = resolve_routes([(trip.start_location, trip.end_location) for trip in batch])
+        for trip, (origin, destination, distance_km) in zip(batch, routes):
+            if distance_km is None:
+                continue
+            old_state = trip.previous_state()
+            trip.origin_location, trip.destination_location, trip.distance_km = origin, destination, distance_km
+            trip.touch()
+            changed.append(trip)
+            changes.append((old_state, trip.tracked_state()))
+        with transaction.atomic():
+            Trip.objects.bulk_update(
+                changed, ['origin_location', 'destination_location', 'distance_km', *Trip.VERSION_FIELDS],
+            )
+            # bulk_update skips post_save; distances feed the analytics rollups
+            trips_bulk_changed.send(sender=Trip, changes=changes)
+        updated += len(changed)
+
+
+# --- 2. ETAs ---
+
+def travel_time(distance_km):
+    """Driving time for a distance at AVERAGE_SPEED_KMH."""
+    return timedelta(hours=float(distance_km) / routing_setting('AVERAGE_SPEED_KMH', 50))
+
+
+def trip_eta(trip):
+    """
+    Estimated arrival of a trip.
+
+    In-transit trips use the remaining distance from the last known GPS
+    position; otherwise the ETA is departure (actual or scheduled start)
+    plus the driving time for distance_km. 'eta' is None when neither is
+    available.
+    """
+    destination = _coordinates(trip.destination_location)
+    result = {
+        'trip_id': trip.trip_id,
+        'status': trip.status,
+        'distance_km': trip.distance_km,
+        'remaining_km': None,
+        'eta': None,
+        'basis': None,
+    }
+
+    position = current_position(trip.trip_id) if trip.status == 'In Transit' else None
+    if position and None not in position and destination:
+        remaining_km = road_distances([(position, destination)])[0]
+        result.update(
+            remaining_km=round(remaining_km, 2),
+            eta=timezone.now() + travel_time(remaining_km),
+            basis='live_position',
+        )
+        return result
+
+    departure = trip.actual_start_time or trip.scheduled_start_time
+    if departure is not None and trip.distance_km is not None and trip.status in ('Scheduled', 'In Transit'):
+        result.update(eta=departure + travel_time(trip.distance_km), basis='schedule')
+    return result
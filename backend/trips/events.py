@@ -0,0 +1,151 @@
+# backend/trips/events.py
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Avg, Count, Q
+from django.utils import timezone
+
+from .models import Trip, TripEvent, TripMetrics
+
+# First occurrence of these events is kept on TripMetrics
+MILESTONE_FIELDS = {
+    'Loading_Arrival': 'loading_arrival_at',
+    'Unloading_Arrival': 'unloading_arrival_at',
+    'Unloading_Finish': 'unloading_finished_at',
+}
+STATUS_FIELDS = {
+    'In Transit': 'departed_at',
+    'Completed': 'completed_at',
+}
+
+METRIC_FIELDS = [
+    field.name for field in TripMetrics._meta.concrete_fields if not field.primary_key
+]
+
+
+def on_time_grace():
+    minutes = getattr(settings, 'TRIP_EVENTS', {}).get('ON_TIME_GRACE_MINUTES', 15)
+    return timedelta(minutes=minutes)
+
+
+# --- 1. Building events ---
+
+def status_events(trips, old_statuses, encoder=None, now=None):
+    """
+    Status_Change events, stamped `now`, for the trips whose status differs
+    from old_statuses[trip_id]. Pass the time given to Trip.apply_status()
+    so a first departure or completion matches actual_start_time/actual_end_time.
+    """
+    now = now or timezone.now()
+    return [
+        TripEvent(trip_id=trip.trip_id, event_type='Status_Change', status=trip.status, event_timestamp=now, encoder=encoder)
+        for trip in trips
+        if old_statuses.get(trip.trip_id) != trip.status
+    ]
+
+
+# --- 2. Recording events and metrics ---
+
+def _seconds(start, end):
+    if start is None or end is None or end < start:
+        return None
+    return int((end - start).total_seconds())
+
+
+def apply_event(metrics, event):
+    """Folds one event into a TripMetrics row (in memory)."""
+    if event.event_type == 'Status_Change':
+        field = STATUS_FIELDS.get(event.status)
+    else:
+        field = MILESTONE_FIELDS.get(event.event_type)
+    if field is None:
+        return
+    current = getattr(metrics, field)
+    # Buffered reports may arrive out of order: keep the earliest
+    if current is None or event.event_timestamp < current:
+        setattr(metrics, field, event.event_timestamp)
+
+
+def derive_metrics(metrics, scheduled_start, scheduled_end):
+    """Recomputes the derived columns from the milestones and the schedule."""
+    metrics.loading_dwell_seconds = _seconds(metrics.loading_arrival_at, metrics.departed_at)
+    metrics.unloading_dwell_seconds = _seconds(metrics.unloading_arrival_at, metrics.unloading_finished_at)
+    metrics.departure_delay_seconds = (
+        int((metrics.departed_at - scheduled_start).total_seconds())
+        if metrics.departed_at and scheduled_start else None
+    )
+    finished = [t for t in (metrics.unloading_finished_at, metrics.completed_at) if t]
+    metrics.on_time = (min(finished) <= scheduled_end + on_time_grace()) if finished and scheduled_end else None
+
+
+def record_events(events, trips=None):
+    """
+    Appends events and folds them into the trips' metrics.
+
+    Safe to call from the REST and WebSocket paths at once: missing metrics
+    rows are created with ON CONFLICT DO NOTHING, then every row of the
+    batch is locked (in primary key order) before it is read and updated.
+    A whole batch is a fixed number of queries: the events insert, the
+    metrics insert, the locked read, one read of the schedules (skipped
+    when `trips`, a {trip_id: Trip} mapping, is given) and one update.
+    """
+    if not events:
+        return []
+    trip_ids = {event.trip_id for event in events}
+
+    with transaction.atomic():
+        created = TripEvent.objects.bulk_create(events, batch_size=500)
+
+        if trips is not None:
+            schedules = {
+                trip_id: (trip.scheduled_start_time, trip.scheduled_end_time)
+                for trip_id, trip in trips.items() if trip_id in trip_ids
+            }
+        else:
+            schedules = {
+                trip_id: (start, end)
+                for trip_id, start, end in Trip.objects.filter(pk__in=trip_ids).values_list(
+                    'trip_id', 'scheduled_start_time', 'scheduled_end_time',
+                )
+            }
+
+        TripMetrics.objects.bulk_create(
+            [TripMetrics(trip_id=trip_id) for trip_id in trip_ids], batch_size=500, ignore_conflicts=True,
+        )
+        rows = {
+            metrics.trip_id: metrics
+            for metrics in TripMetrics.objects.select_for_update().filter(trip_id__in=trip_ids).order_by('trip_id')
+        }
+        for event in sorted(events, key=lambda event: event.event_timestamp):
+            apply_event(rows[event.trip_id], event)
+
+        for trip_id, metrics in rows.items():
+            derive_metrics(metrics, *schedules.get(trip_id, (None, None)))
+
+        TripMetrics.objects.bulk_update(rows.values(), METRIC_FIELDS, batch_size=500)
+    return created
+
+
+# --- 3. Reporting ---
+
+def metrics_summary(start=None, end=None):
+    """Fleet averages over trips completed in [start, end), in one aggregate query."""
+    metrics = TripMetrics.objects.filter(completed_at__isnull=False)
+    if start is not None:
+        metrics = metrics.filter(completed_at__gte=start)
+    if end is not None:
+        metrics = metrics.filter(completed_at__lt=end)
+
+    summary = metrics.aggregate(
+        trips_completed=Count('pk'),
+        avg_loading_dwell_seconds=Avg('loading_dwell_seconds'),
+        avg_unloading_dwell_seconds=Avg('unloading_dwell_seconds'),
+        avg_departure_delay_seconds=Avg('departure_delay_seconds'),
+        on_time_trips=Count('pk', filter=Q(on_time=True)),
+        rated=Count('pk', filter=Q(on_time__isnull=False)),
+    )
+    rated = summary.pop('rated')
+    summary['on_time_rate'] = round(summary['on_time_trips'] / rated, 4) if rated else None
+    return summary
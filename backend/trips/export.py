@@ -0,0 +1,133 @@
+# backend/trips/export.py
+
+import csv
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+from rest_framework.renderers import BaseRenderer
+
+from .models import Trip
+
+# Column order of an export (relations flattened to one column each)
+EXPORT_FIELDS = (
+    'trip_id', 'trip_code', 'status', 'truck_plate', 'driver_email',
+    'start_location', 'end_location', 'scheduled_start_time', 'scheduled_end_time',
+    'actual_start_time', 'actual_end_time', 'net_weight', 'distance_km',
+    'estimated_fuel_cost', 'created_at',
+)
+
+# Rows fetched per round trip from the server-side cursor, and rows joined
+# into one chunk of the streamed body
+CHUNK_ROWS = 2000
+ROWS_PER_WRITE = 500
+
+
+# --- 1. Renderers (select the output via ?format=csv|ndjson or Accept) ---
+
+class CSVRenderer(BaseRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Only used for error bodies; exports stream their own content
+        return json.dumps(data, cls=DjangoJSONEncoder).encode()
+
+
+class NDJSONRenderer(CSVRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+
+# --- 2. Rows ---
+
+def export_rows(trips):
+    """
+    Plain dicts for the given trips in schedule order. Reads through
+    .values().iterator(), so on PostgreSQL rows come from a server-side
+    cursor CHUNK_ROWS at a time and no model instances are built.
+    """
+    return (
+        trips.order_by('scheduled_start_time', 'trip_id')
+        .values(
+            *(name for name in EXPORT_FIELDS if name not in ('truck_plate', 'driver_email')),
+            truck_plate=F('truck__license_plate'),
+            driver_email=F('assigned_driver__email'),
+        )
+        .iterator(chunk_size=CHUNK_ROWS)
+    )
+
+
+def filtered_trips(start=None, end=None, statuses=None):
+    """Trips scheduled in [start, end) with one of the given statuses."""
+    trips = Trip.objects.all()
+    if start is not None:
+        trips = trips.filter(scheduled_start_time__gte=start)
+    if end is not None:
+        trips = trips.filter(scheduled_start_time__lt=end)
+    if statuses:
+        trips = trips.filter(status__in=statuses)
+    return trips
+
+
+# --- 3. Streaming encoders ---
+
+class _Echo:
+    """File-like object whose write() hands the line back to the caller."""
+
+    def write(self, value):
+        return value
+
+
+def _chunked(lines):
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= ROWS_PER_WRITE:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+
+
+def stream_csv(rows):
+    writer = csv.writer(_Echo())
+
+    def lines():
+        yield writer.writerow(EXPORT_FIELDS)
+        for row in rows:
+            yield writer.writerow([
+                value.isoformat() if hasattr(value, 'isoformat') else value
+                for value in (row[name] for name in EXPORT_FIELDS)
+            ])
+
+    return _chunked(lines())
+
+
+def stream_ndjson(rows):
+    encoder = DjangoJSONEncoder()
+    return _chunked(
+        encoder.encode({name: row[name] for name in EXPORT_FIELDS}) + '\n'
+        for row in rows
+    )
+
+
+async def aiterate(chunks):
+    """
+    Async iterator over a streamed body, for StreamingHttpResponse under
+    ASGI: given a sync iterator there, Django loads the whole body into
+    memory before sending it. Each chunk is produced on the request's sync
+    thread, which owns the DB connection and its server-side cursor.
+    """
+    next_chunk = sync_to_async(next)
+    done = object()
+    while (chunk := await next_chunk(chunks, done)) is not done:
+        yield chunk
+
+
+STREAMS = {
+    'csv': stream_csv,
+    'ndjson': stream_ndjson,
+}
@@ -0,0 +1,192 @@
+# backend/trips/fuel.py
+
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import ACTIVE_STATUSES, Trip, TripFuel, TruckFuelProfile
+from .signals import trips_bulk_changed
+
+
+def fuel_setting(name, default):
+    return getattr(settings, 'TRIP_FUEL', {}).get(name, default)
+
+
+# --- 1. Fitting consumption profiles ---
+
+class _Sums:
+    """Running sums for the 2-parameter least-squares fit."""
+
+    def __init__(self):
+        self.n = 0
+        self.s11 = self.s12 = self.s22 = self.t1 = self.t2 = 0.0
+
+    def add(self, distance, load, liters):
+        # liters = distance * base + (distance * load) * per_ton
+        x1, x2 = distance, distance * load
+        self.n += 1
+        self.s11 += x1 * x1
+        self.s12 += x1 * x2
+        self.s22 += x2 * x2
+        self.t1 += x1 * liters
+        self.t2 += x2 * liters
+
+    def solve(self):
+        """(base_liters_per_km, liters_per_km_per_ton), both kept non-negative."""
+        det = self.s11 * self.s22 - self.s12 * self.s12
+        if det > 1e-9 * self.s11 * self.s22:
+            base = (self.s22 * self.t1 - self.s12 * self.t2) / det
+            per_ton = (self.s11 * self.t2 - self.s12 * self.t1) / det
+            if base >= 0 and per_ton >= 0:
+                return base, per_ton
+        # Loads too uniform to separate, or a negative coefficient:
+        # fall back to the better of the one-parameter fits
+        if self.s22 and (not self.s11 or self.t2 * self.t2 / self.s22 > self.t1 * self.t1 / self.s11):
+            return 0.0, max(self.t2 / self.s22, 0.0)
+        return max(self.t1 / self.s11, 0.0) if self.s11 else 0.0, 0.0
+
+
+def consumption_samples(since=None):
+    """(truck_id, distance_km, net_weight, liters) of completed trips with fuel records, in one query."""
+    trips = Trip.objects.filter(status='Completed', truck__isnull=False, distance_km__gt=0)
+    if since is not None:
+        trips = trips.filter(actual_end_time__gte=since)
+    return (
+        trips.annotate(liters=Sum('fuels__liters'))
+        .filter(liters__gt=0)
+        .values_list('truck_id', 'distance_km', 'net_weight', 'liters')
+    )
+
+
+def fit_profiles(since=None):
+    """
+    Fits a consumption profile per truck (and one fleet-wide) from trip
+    history in a single pass, then replaces the stored profiles. Trucks with
+    fewer than MIN_SAMPLES trips get no row of their own and use the fleet
+    profile. Returns the number of per-truck profiles.
+    """
+    min_samples = fuel_setting('MIN_SAMPLES', 5)
+    per_truck = defaultdict(_Sums)
+    fleet = _Sums()
+    for truck_id, distance, load, liters in consumption_samples(since).iterator(chunk_size=5000):
+        sample = float(distance), float(load or 0), float(liters)
+        per_truck[truck_id].add(*sample)
+        fleet.add(*sample)
+
+    now = timezone.now()
+    fits = [(truck_id, sums) for truck_id, sums in per_truck.items() if sums.n >= min_samples]
+    if fleet.n:
+        fits.append((None, fleet))
+
+    profiles = []
+    for truck_id, sums in fits:
+        base, per_ton = sums.solve()
+        profiles.append(TruckFuelProfile(
+            truck_id=truck_id, base_liters_per_km=base, liters_per_km_per_ton=per_ton,
+            samples=sums.n, fitted_at=now,
+        ))
+
+    with transaction.atomic():
+        TruckFuelProfile.objects.all().delete()
+        TruckFuelProfile.objects.bulk_create(profiles)
+    return len(profiles) - (1 if fleet.n else 0)
+
+
+def fuel_price_per_liter():
+    """Average paid price over the last PRICE_WINDOW_DAYS of fuel records, else the configured default."""
+    since = timezone.now() - timedelta(days=fuel_setting('PRICE_WINDOW_DAYS', 30))
+    totals = TripFuel.objects.filter(created_at__gte=since, liters__gt=0).aggregate(
+        amount=Sum('total_amount'), liters=Sum('liters'),
+    )
+    if totals['liters']:
+        return totals['amount'] / totals['liters']
+    return Decimal(str(fuel_setting('DEFAULT_PRICE_PER_LITER', 60)))
+
+
+# --- 2. Estimating open trips ---
+
+def load_profiles():
+    """{truck_id: (base, per_ton)} plus the fleet fallback under key None."""
+    profiles = {
+        truck_id: (base, per_ton)
+        for truck_id, base, per_ton in TruckFuelProfile.objects.values_list(
+            'truck_id', 'base_liters_per_km', 'liters_per_km_per_ton',
+        )
+    }
+    profiles.setdefault(None, (
+        fuel_setting('DEFAULT_BASE_LITERS_PER_KM', 0.3),
+        fuel_setting('DEFAULT_LITERS_PER_KM_PER_TON', 0.02),
+    ))
+    return profiles
+
+
+def estimate_costs(rows, profiles, price):
+    """
+    Estimated fuel cost for rows of (truck_id, distance_km, net_weight),
+    computed for the whole list at once with NumPy arrays.
+    """
+    if not rows:
+        return []
+    fleet = profiles[None]
+    truck_ids, distances, loads = zip(*rows)
+    coefficients = np.array([profiles.get(truck_id, fleet) for truck_id in truck_ids], dtype=float)
+    distances = np.array(distances, dtype=float)
+    loads = np.array([load or 0 for load in loads], dtype=float)
+
+    costs = distances * (coefficients[:, 0] + coefficients[:, 1] * loads) * float(price)
+    cents = Decimal('0.01')
+    return [Decimal(cost).quantize(cents) for cost in costs.tolist()]
+
+
+def recompute_estimates(trips=None, batch_size=5000):
+    """
+    Recomputes estimated_fuel_cost for all open (scheduled or in transit)
+    trips that have a distance: profiles and price are read once, each
+    batch of trips is one locked read plus one bulk_update of the rows whose
+    estimate changed. Returns the number of trips updated.
+
+    Each batch runs in its own transaction with the rows locked
+    (select_for_update), so a trip completed meanwhile is either waited for
+    and skipped or written after us, and the rollup deltas always start
+    from the state actually overwritten.
+    """
+    trips = Trip.objects.all() if trips is None else trips
+    trips = trips.filter(status__in=ACTIVE_STATUSES, distance_km__isnull=False)
+    profiles, price = load_profiles(), fuel_price_per_liter()
+
+    updated, last_id = 0, 0
+    fields = tuple(dict.fromkeys(('trip_id', 'truck_id', 'distance_km', 'net_weight') + Trip.TRACKED_FIELDS))
+    while True:
+        with transaction.atomic():
+            rows = list(
+                trips.select_for_update().filter(trip_id__gt=last_id).order_by('trip_id').values(*fields)[:batch_size]
+            )
+            if not rows:
+                return updated
+            last_id = rows[-1]['trip_id']
+
+            costs = estimate_costs(
+                [(row['truck_id'], row['distance_km'], row['net_weight']) for row in rows], profiles, price,
+            )
+            changed, changes = [], []
+            now = timezone.now()
+            for row, cost in zip(rows, costs):
+                if row['estimated_fuel_cost'] == cost:
+                    continue
+                changed.append(Trip(
+                    trip_id=row['trip_id'], estimated_fuel_cost=cost, version=F('version') + 1, updated_at=now,
+                ))
+                old_state = {name: row[name] for name in Trip.TRACKED_FIELDS}
+                changes.append((old_state, dict(old_state, estimated_fuel_cost=cost)))
+
+            if changed:
+                Trip.objects.bulk_update(changed, ['estimated_fuel_cost', *Trip.VERSION_FIELDS], batch_size=1000)
+                # bulk_update skips post_save; keep the fuel rollups in step
+                trips_bulk_changed.send(sender=Trip, changes=changes)
+        updated += len(changed)
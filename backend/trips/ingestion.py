@@ -0,0 +1,211 @@
+# backend/trips/ingestion.py
+
+import asyncio
+import logging
+import time
+
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.utils import timezone
+
+from locations.geo import haversine_km
+from .events import record_events
+from .models import Trip, TripEvent, TripPosition
+from .positions import last_known_positions
+from .realtime import publish_trip_updates, trip_update_message
+
+logger = logging.getLogger(__name__)
+
+
+class LocationIngestor:
+    """
+    Server-side ingestion stage for driver GPS pings.
+
+    TripConsumer.receive() hands every ping to submit(), which does no I/O:
+    - pings that moved less than MIN_DISTANCE_METERS since the last accepted
+      one (and arrive sooner than MIN_INTERVAL_SECONDS after it, with the same
+      status) are dropped as redundant;
+    - accepted pings replace the trip's pending broadcast and are queued for
+      storage.
+
+    Once per WINDOW_SECONDS a single background task flushes the window:
+    at most one 'trip_update' per trip goes to the channel layer, plus one
+    batched 'fleet_update' for the live map, and all queued positions are
+    written with one bulk_create. The last-known-position map is updated in
+    memory on every accepted ping and mirrored to the shared cache once per
+    window.
+
+    Milestone events (submit_event) ride the same window: they are queued
+    without I/O and appended to the event log in one batch per flush.
+    """
+
+    # Forget per-trip dedup state after this long without pings (seconds)
+    STALE_AFTER = 3600
+
+    def __init__(self, window_seconds=1.0, min_distance_meters=25, min_interval_seconds=15, batch_size=500):
+        self.window_seconds = window_seconds
+        self.min_distance_km = min_distance_meters / 1000
+        self.min_interval_seconds = min_interval_seconds
+        self.batch_size = batch_size
+
+        self.pending = {}        # trip_id -> latest accepted 'trip_update' message
+        self.positions = []      # (trip_id, recorded_at, lat, lng) waiting for storage
+        self.events = []         # (trip_id, event_type, timestamp, document_no) waiting for storage
+        self.last_accepted = {}  # trip_id -> (lat, lng, status, monotonic time)
+        self._task = None
+        self._flush_task = None
+
+    @classmethod
+    def from_settings(cls):
+        config = getattr(settings, 'TRIP_LOCATION_INGESTION', {})
+        return cls(
+            window_seconds=config.get('WINDOW_SECONDS', 1.0),
+            min_distance_meters=config.get('MIN_DISTANCE_METERS', 25),
+            min_interval_seconds=config.get('MIN_INTERVAL_SECONDS', 15),
+            batch_size=config.get('BATCH_SIZE', 500),
+        )
+
+    # --- 1. Intake (called from the consumer, no I/O) ---
+
+    def is_redundant(self, trip_id, lat, lng, status, now):
+        last = self.last_accepted.get(trip_id)
+        if last is None:
+            return False
+        last_lat, last_lng, last_status, last_time = last
+        return (
+            status == last_status
+            and now - last_time < self.min_interval_seconds
+            and haversine_km(last_lat, last_lng, lat, lng) < self.min_distance_km
+        )
+
+    def submit(self, trip_id, lat, lng, status=None, sender_channel=None):
+        """Queues a ping. Returns False when it was dropped as redundant."""
+        now = time.monotonic()
+        if self.is_redundant(trip_id, lat, lng, status, now):
+            return False
+
+        self.last_accepted[trip_id] = (lat, lng, status, now)
+        recorded_at = timezone.now()
+
+        message = trip_update_message(trip_id, status, lat, lng, timestamp=recorded_at)
+        last_known_positions.record(trip_id, message)
+        # Lets the sender's own consumer skip the echo
+        self.pending[trip_id] = dict(message, sender_channel=sender_channel)
+        self.positions.append((trip_id, recorded_at, lat, lng))
+
+        self._ensure_running()
+        return True
+
+    def submit_event(self, trip_id, event_type, document_no=None):
+        """Queues a milestone event (e.g. 'Loading_Arrival'), stamped now."""
+        self.events.append((trip_id, event_type, timezone.now(), document_no))
+        self._ensure_running()
+
+    # --- 2. Periodic flush ---
+
+    def _ensure_running(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.window_seconds)
+            if not self.pending and not self.positions and not self.events:
+                # Idle: stop ticking until the next ping restarts the task
+                return
+            # Shielded: a shutdown cancelling the loop must not cut a write short
+            self._flush_task = asyncio.ensure_future(self.flush())
+            try:
+                await asyncio.shield(self._flush_task)
+            except Exception:
+                logger.exception('Location ingestion flush failed')
+
+    async def flush(self):
+        pending, self.pending = self.pending, {}
+        positions, self.positions = self.positions, []
+        events, self.events = self.events, []
+
+        # Storage first: a channel layer or cache outage must not lose the
+        # window's positions and milestone events
+        try:
+            if positions:
+                await database_sync_to_async(self.write_positions)(positions)
+
+            if events:
+                await database_sync_to_async(self.write_events)(events)
+        finally:
+            if pending:
+                try:
+                    await self.publish(pending)
+                except Exception:
+                    logger.exception('Location broadcast failed')
+
+            self._forget_stale_trips()
+
+    async def publish(self, pending):
+        # One message per trip group plus one batched fleet delta
+        await publish_trip_updates(get_channel_layer(), list(pending.values()))
+        # Mirror the window's latest positions to the shared cache
+        await last_known_positions.apublish({
+            trip_id: last_known_positions.local[str(trip_id)] for trip_id in pending
+        })
+
+    async def shutdown(self):
+        """Stops the flush loop and writes whatever is still buffered (worker shutdown)."""
+        task, self._task = self._task, None
+        if task is not None and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        if self._flush_task is not None:
+            try:
+                await self._flush_task
+            except Exception:
+                logger.exception('Location ingestion flush failed')
+            self._flush_task = None
+        if self.pending or self.positions or self.events:
+            await self.flush()
+
+    def write_positions(self, positions):
+        """Stores a window's positions with a single bulk insert."""
+        trip_ids = {int(trip_id) for trip_id, *_ in positions if str(trip_id).isdigit()}
+        # Pings for unknown trips are broadcast but not stored
+        existing = set(Trip.objects.filter(pk__in=trip_ids).values_list('pk', flat=True))
+
+        TripPosition.objects.bulk_create([
+            TripPosition(trip_id=int(trip_id), recorded_at=recorded_at, lat=lat, lng=lng)
+            for trip_id, recorded_at, lat, lng in positions
+            if str(trip_id).isdigit() and int(trip_id) in existing
+        ], batch_size=self.batch_size)
+
+    def write_events(self, events):
+        """Appends a window's milestone events and updates the trips' metrics in one batch."""
+        trip_ids = {int(trip_id) for trip_id, *_ in events if str(trip_id).isdigit()}
+        existing = set(Trip.objects.filter(pk__in=trip_ids).values_list('pk', flat=True))
+
+        record_events([
+            TripEvent(trip_id=int(trip_id), event_type=event_type, event_timestamp=timestamp, document_no=document_no)
+            for trip_id, event_type, timestamp, document_no in events
+            if str(trip_id).isdigit() and int(trip_id) in existing
+        ])
+
+    def _forget_stale_trips(self):
+        cutoff = time.monotonic() - self.STALE_AFTER
+        for trip_id in [t for t, last in self.last_accepted.items() if last[3] < cutoff]:
+            del self.last_accepted[trip_id]
+            # The shared cache keeps the entry; only the local copy is dropped
+            last_known_positions.local.pop(str(trip_id), None)
+
+
+_ingestor = None
+
+
+def get_ingestor():
+    """Returns the process-wide LocationIngestor."""
+    global _ingestor
+    if _ingestor is None:
+        _ingestor = LocationIngestor.from_settings()
+    return _ingestor
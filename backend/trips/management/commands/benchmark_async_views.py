@@ -0,0 +1,113 @@
+# trips/management/commands/benchmark_async_views.py
+
+import asyncio
+import threading
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from trips.models import Trip
+from .benchmark_realtime import delete_seeded_trips, percentile, seed_trips
+
+# (name, sync path, async path); {trip_id} is filled with a seeded trip
+ENDPOINTS = [
+    ('trip list', '/api/trips/?view=detail', '/api/async/trips/?view=detail'),
+    ('trip detail', '/api/trips/{trip_id}/', '/api/async/trips/{trip_id}/'),
+    ('active trips', '/api/trips/active/', '/api/async/trips/active/'),
+    ('dashboard', '/api/analytics/dashboard/', '/api/async/analytics/dashboard/'),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks the sync DRF reads against their /api/async/ versions under '
+        'high concurrency: drives core.asgi.application in-process and reports '
+        'requests per second, latency percentiles and peak thread count per endpoint.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--trips', type=int, default=500, help='Trips to seed before the run (deleted after).')
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per endpoint and mode.')
+        parser.add_argument('--concurrency', type=int, default=200, help='Requests in flight at once.')
+        parser.add_argument('--only', choices=[name for name, _, _ in ENDPOINTS], action='append',
+                            help='Benchmark only these endpoints. Repeatable.')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        # Outside the rollups, so the dashboard numbers timed here never change
+        seed_trips([
+            Trip(
+                trip_code=f'ASYNCBENCH-{i:05d}', start_location='Benchmark', end_location='Benchmark',
+                status='In Transit' if i % 2 else 'Scheduled', scheduled_start_time=now - timedelta(minutes=i),
+            )
+            for i in range(options['trips'])
+        ])
+        trip_id = Trip.objects.filter(trip_code__startswith='ASYNCBENCH-').values_list('trip_id', flat=True).first()
+
+        endpoints = [endpoint for endpoint in ENDPOINTS if not options['only'] or endpoint[0] in options['only']]
+        try:
+            results = asyncio.run(self.run_all(endpoints, trip_id, options))
+        finally:
+            delete_seeded_trips('ASYNCBENCH-')
+        self.report(results, options)
+
+    # --- 1. Load generation ---
+
+    async def run_all(self, endpoints, trip_id, options):
+        from core.asgi import application
+
+        results = []
+        for name, sync_path, async_path in endpoints:
+            for mode, path in (('sync', sync_path), ('async', async_path)):
+                stats = await self.run_one(application, path.format(trip_id=trip_id), options)
+                results.append((name, mode, stats))
+        return results
+
+    async def run_one(self, application, path, options):
+        from channels.testing import HttpCommunicator
+
+        semaphore = asyncio.Semaphore(options['concurrency'])
+        latencies, errors = [], []
+        peak_threads = threading.active_count()
+
+        async def one():
+            nonlocal peak_threads
+            async with semaphore:
+                communicator = HttpCommunicator(application, 'GET', path, headers=[(b'host', b'localhost')])
+                started = time.perf_counter()
+                response = await communicator.get_response(timeout=60)
+                latencies.append(time.perf_counter() - started)
+                # Let the handler finish its own cleanup before the next request
+                await communicator.wait(timeout=60)
+                if response['status'] != 200:
+                    errors.append(response['status'])
+                peak_threads = max(peak_threads, threading.active_count())
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(options['requests'])))
+        elapsed = time.perf_counter() - started
+        return {
+            'rps': len(latencies) / elapsed,
+            'p50': percentile(latencies, 0.50) * 1000,
+            'p95': percentile(latencies, 0.95) * 1000,
+            'p99': percentile(latencies, 0.99) * 1000,
+            'errors': len(errors),
+            'threads': peak_threads,
+        }
+
+    # --- 2. Report ---
+
+    def report(self, results, options):
+        self.stdout.write(
+            f'{options["requests"]} requests per row, {options["concurrency"]} in flight, {options["trips"]} seeded trips'
+        )
+        header = f'{"endpoint":<14}{"mode":<7}{"req/s":>9}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}{"errors":>8}{"threads":>9}'
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for name, mode, stats in results:
+            self.stdout.write(
+                f'{name:<14}{mode:<7}{stats["rps"]:>9.0f}{stats["p50"]:>9.1f}{stats["p95"]:>9.1f}'
+                f'{stats["p99"]:>9.1f}{stats["errors"]:>8}{stats["threads"]:>9}'
+            )
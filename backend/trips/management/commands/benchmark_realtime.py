@@ -0,0 +1,202 @@
+# trips/management/commands/benchmark_realtime.py
+
+import asyncio
+import itertools
+import json
+import random
+import time
+import tracemalloc
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+
+from trips.conditional import bump_list_stamp
+from trips.models import Trip
+
+
+def percentile(values, fraction):
+    if not values:
+        return float('nan')
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+# --- Seeded trips ---
+# Benchmarks seed trips with bulk_create, which sends no post_save, so the
+# analytics rollups never count them. Cleanup must not send post_delete
+# either, or the rollups would subtract trips they never added.
+
+def seed_trips(trips):
+    """Inserts benchmark trips without touching the rollups."""
+    Trip.objects.bulk_create(trips)
+    bump_list_stamp()
+
+
+def delete_seeded_trips(prefix):
+    """
+    Deletes the trips whose trip_code starts with prefix, and their dependent
+    rows, without Trip's delete signals (see seed_trips).
+    """
+    trips = Trip.objects.filter(trip_code__startswith=prefix).values('pk')
+    for related in Trip._meta.related_objects:
+        # Positions, events, metrics... have no rollup signals of their own
+        related.related_model._base_manager.filter(**{f'{related.field.name}__in': trips}).delete()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {connection.ops.quote_name(Trip._meta.db_table)} WHERE trip_code LIKE %s',
+            [f'{prefix}%'],
+        )
+    bump_list_stamp()
+
+
+class Command(BaseCommand):
+    help = (
+        'Load-tests the real-time path: boots core.asgi.application, connects N '
+        'simulated drivers sending GPS pings and M dispatchers listening, and '
+        'reports throughput, fan-out latency and memory per connection.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--drivers', type=int, default=50, help='Simulated driver sockets (one trip each).')
+        parser.add_argument('--dispatchers', type=int, default=100, help='Simulated dispatcher sockets on trip channels.')
+        parser.add_argument('--fleet', type=int, default=5, help='Simulated live-map sockets on ws/fleet/.')
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds to send pings for.')
+        parser.add_argument('--ping-interval', type=float, default=1.0, help='Seconds between pings per driver.')
+        parser.add_argument('--window', type=float, default=None, help='Override the ingestion window (seconds).')
+        parser.add_argument(
+            '--channel-layer', choices=['memory', 'configured'], default='memory',
+            help="'memory' uses InMemoryChannelLayer; 'configured' uses CHANNEL_LAYERS (e.g. a local Redis).",
+        )
+
+    def handle(self, *args, **options):
+        seed_trips([
+            Trip(trip_code=f'LOADTEST-{i:05d}', start_location='Load Test', end_location='Load Test', status='In Transit')
+            for i in range(options['drivers'])
+        ])
+        # bulk_create does not return primary keys on every backend
+        trip_ids = list(
+            Trip.objects.filter(trip_code__startswith='LOADTEST-').order_by('trip_id').values_list('trip_id', flat=True)
+        )
+
+        overrides = {}
+        if options['channel_layer'] == 'memory':
+            overrides['CHANNEL_LAYERS'] = {
+                'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer', 'CONFIG': {'capacity': 10000}},
+            }
+        if options['window'] is not None:
+            overrides['TRIP_LOCATION_INGESTION'] = dict(
+                getattr(settings, 'TRIP_LOCATION_INGESTION', {}), WINDOW_SECONDS=options['window']
+            )
+
+        try:
+            with override_settings(**overrides):
+                stats = asyncio.run(self.run_load(trip_ids, options))
+        finally:
+            # Also removes the positions and events written during the run
+            delete_seeded_trips('LOADTEST-')
+
+        self.report(stats, options)
+
+    # --- 1. Load generation ---
+
+    async def run_load(self, trip_ids, options):
+        from channels.testing import WebsocketCommunicator
+        from core.asgi import application
+
+        tracemalloc.start()
+        baseline = tracemalloc.take_snapshot()
+
+        drivers = [WebsocketCommunicator(application, f'/ws/trips/{trip_id}/') for trip_id in trip_ids]
+        dispatchers = [
+            WebsocketCommunicator(application, f'/ws/trips/{trip_id}/')
+            for trip_id, _ in zip(itertools.cycle(trip_ids), range(options['dispatchers']))
+        ]
+        fleet = [WebsocketCommunicator(application, '/ws/fleet/?status=all') for _ in range(options['fleet'])]
+
+        sockets = drivers + dispatchers + fleet
+        for communicator in sockets:
+            connected, _ = await communicator.connect()
+            if not connected:
+                raise RuntimeError('WebSocket connection was rejected')
+
+        connected_snapshot = tracemalloc.take_snapshot()
+        memory = sum(stat.size_diff for stat in connected_snapshot.compare_to(baseline, 'filename'))
+        tracemalloc.stop()
+
+        stats = {'pings': 0, 'latencies': [], 'fleet_latencies': [], 'received': 0, 'fleet_messages': 0}
+        deadline = time.monotonic() + options['duration']
+
+        await asyncio.gather(
+            *(self.drive(communicator, deadline, options['ping_interval'], stats) for communicator in drivers),
+            *(self.listen(communicator, deadline, stats, 'latencies') for communicator in dispatchers),
+            *(self.listen(communicator, deadline, stats, 'fleet_latencies') for communicator in fleet),
+        )
+
+        for communicator in sockets:
+            await communicator.disconnect()
+
+        stats['memory_per_connection'] = memory / max(len(sockets), 1)
+        stats['connections'] = len(sockets)
+        return stats
+
+    async def drive(self, communicator, deadline, interval, stats):
+        rng = random.Random()
+        lat, lng = 14.5 + rng.random(), 120.9 + rng.random()
+        # Stagger drivers so pings do not all arrive in the same instant
+        await asyncio.sleep(rng.random() * interval)
+        while time.monotonic() < deadline:
+            # Move ~100 m per ping so the ingestor does not drop it as redundant
+            lat += 0.001
+            await communicator.send_to(text_data=json.dumps({'lat': lat, 'lng': lng, 'status': 'In Transit'}))
+            stats['pings'] += 1
+            await asyncio.sleep(interval)
+
+    async def listen(self, communicator, deadline, stats, bucket):
+        # Keep listening one window past the deadline to drain the last flush
+        while time.monotonic() < deadline + 2:
+            # receive_from() cancels the application on timeout, so wait on
+            # the communicator's output queue directly.
+            try:
+                event = await asyncio.wait_for(communicator.output_queue.get(), timeout=0.5)
+            except asyncio.TimeoutError:
+                continue
+            message = json.loads(event['text'])
+            received_at = time.time()
+
+            if message['type'] == 'fleet_update':
+                stats['fleet_messages'] += 1
+                timestamps = [row[-1] for row in message['deltas']]
+            else:
+                stats['received'] += 1
+                timestamps = [message['timestamp']]
+
+            for timestamp in timestamps:
+                stats[bucket].append(received_at - datetime.fromisoformat(timestamp).timestamp())
+
+    # --- 2. Reporting ---
+
+    def report(self, stats, options):
+        duration = options['duration']
+        ms = 1000
+
+        self.stdout.write(self.style.MIGRATE_HEADING('\nReal-time path benchmark'))
+        self.stdout.write(f"layer:                 {options['channel_layer']}")
+        self.stdout.write(f"connections:           {stats['connections']} "
+                          f"({options['drivers']} drivers, {options['dispatchers']} dispatchers, {options['fleet']} fleet)")
+        self.stdout.write(f"pings sent:            {stats['pings']} ({stats['pings'] / duration:.1f}/s)")
+        self.stdout.write(f"trip updates received: {stats['received']} ({stats['received'] / duration:.1f}/s)")
+        self.stdout.write(f"fleet batches:         {stats['fleet_messages']} ({stats['fleet_messages'] / duration:.1f}/s)")
+
+        # Latency = server acceptance of a ping -> delivery to a listener,
+        # so it includes the ingestion window by design.
+        for label, key in (('trip fan-out', 'latencies'), ('fleet fan-out', 'fleet_latencies')):
+            values = stats[key]
+            self.stdout.write(
+                f'{label + " latency:":<23}p50 {percentile(values, 0.50) * ms:.1f} ms, '
+                f'p99 {percentile(values, 0.99) * ms:.1f} ms ({len(values)} samples)'
+            )
+
+        self.stdout.write(f"memory per connection: {stats['memory_per_connection'] / 1024:.1f} KiB")
@@ -0,0 +1,222 @@
+# trips/management/commands/benchmark_server.py
+
+import asyncio
+import base64
+import os
+import struct
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from .benchmark_realtime import percentile
+
+
+# --- 1. Minimal HTTP/1.1 and WebSocket clients (stdlib only) ---
+
+async def read_response(reader):
+    """Reads one response off a keep-alive connection; returns (status, keep_alive)."""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('connection closed')
+    status = int(status_line.split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    return status, headers.get('connection', '').lower() != 'close'
+
+
+async def http_worker(host, port, request, deadline_count, latencies, errors):
+    reader = writer = None
+    while deadline_count():
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            started = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+            status, keep_alive = await read_response(reader)
+            latencies.append(time.perf_counter() - started)
+            if status >= 400:
+                errors.append(status)
+            if not keep_alive:
+                writer.close()
+                writer = None
+        except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError, IndexError):
+            errors.append('connection')
+            if writer is not None:
+                writer.close()
+            writer = None
+    if writer is not None:
+        writer.close()
+
+
+def ws_frame(opcode, payload=b''):
+    """A masked client frame (payloads < 126 bytes)."""
+    mask = os.urandom(4)
+    masked = bytes(byte ^ mask[i % 4] for i, byte in enumerate(payload))
+    return struct.pack('!BB', 0x80 | opcode, 0x80 | len(payload)) + mask + masked
+
+
+async def open_socket(host, port, path, token):
+    reader, writer = await asyncio.open_connection(host, port)
+    key = base64.b64encode(os.urandom(16)).decode()
+    headers = [
+        f'GET {path} HTTP/1.1', f'Host: {host}:{port}', 'Upgrade: websocket', 'Connection: Upgrade',
+        f'Sec-WebSocket-Key: {key}', 'Sec-WebSocket-Version: 13',
+    ]
+    if token:
+        headers.append(f'Authorization: Bearer {token}')
+    writer.write(('\r\n'.join(headers) + '\r\n\r\n').encode())
+    await writer.drain()
+    status_line = await reader.readline()
+    if b' 101 ' not in status_line:
+        writer.close()
+        raise ConnectionError(status_line.decode(errors='replace').strip())
+    while (await reader.readline()) not in (b'\r\n', b''):
+        pass
+    return reader, writer
+
+
+async def drain_socket(reader):
+    # Discards server frames (snapshots, updates, pings) so buffers never fill up
+    while await reader.read(65536):
+        pass
+
+
+# --- 2. Command ---
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks running servers side by side (e.g. runserver vs. the production '
+        'gunicorn + uvicorn profile): HTTP requests per second and latency over '
+        'keep-alive connections, then how many WebSockets can be opened and held.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target', action='append', required=True, metavar='NAME=URL',
+            help='Server to benchmark, e.g. dev=http://localhost:8000 prod=http://localhost:8080. Repeatable.',
+        )
+        parser.add_argument('--path', default='/healthz/', help='HTTP path to request.')
+        parser.add_argument('--requests', type=int, default=5000, help='HTTP requests per target.')
+        parser.add_argument('--concurrency', type=int, default=50, help='Concurrent HTTP connections.')
+        parser.add_argument('--token', default='', help='JWT sent as a Bearer token (for API paths).')
+        parser.add_argument('--sockets', type=int, default=500, help='WebSockets to open per target (0 skips).')
+        parser.add_argument('--ws-path', default='/ws/fleet/', help='WebSocket path to open.')
+        parser.add_argument('--hold', type=float, default=10.0, help='Seconds to hold the sockets open.')
+
+    def handle(self, *args, **options):
+        targets = []
+        for spec in options['target']:
+            name, _, url = spec.partition('=')
+            parts = urlsplit(url)
+            if not url or parts.scheme != 'http' or not parts.hostname:
+                raise CommandError(f"--target must look like NAME=http://host:port, got '{spec}'")
+            targets.append((name, parts.hostname, parts.port or 80))
+
+        results = [asyncio.run(self.benchmark(host, port, options)) for _, host, port in targets]
+        self.report([name for name, _, _ in targets], results, options)
+
+    async def benchmark(self, host, port, options):
+        result = {}
+        result.update(await self.http_phase(host, port, options))
+        if options['sockets']:
+            result.update(await self.socket_phase(host, port, options))
+        return result
+
+    async def http_phase(self, host, port, options):
+        headers = [f'GET {options["path"]} HTTP/1.1', f'Host: {host}:{port}', 'Connection: keep-alive']
+        if options['token']:
+            headers.append(f'Authorization: Bearer {options["token"]}')
+        request = ('\r\n'.join(headers) + '\r\n\r\n').encode()
+
+        remaining = options['requests']
+
+        def take():
+            nonlocal remaining
+            remaining -= 1
+            return remaining >= 0
+
+        latencies, errors = [], []
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            http_worker(host, port, request, take, latencies, errors)
+            for _ in range(options['concurrency'])
+        ))
+        elapsed = time.perf_counter() - started
+        return {
+            'rps': len(latencies) / elapsed if elapsed else 0.0,
+            'p50': percentile(latencies, 0.50) * 1000,
+            'p95': percentile(latencies, 0.95) * 1000,
+            'p99': percentile(latencies, 0.99) * 1000,
+            'http_errors': len(errors),
+        }
+
+    async def socket_phase(self, host, port, options):
+        async def open_one():
+            try:
+                return await asyncio.wait_for(open_socket(host, port, options['ws_path'], options['token']), 30)
+            except (OSError, ConnectionError, asyncio.TimeoutError):
+                return None
+
+        started = time.perf_counter()
+        opened = [socket for socket in await asyncio.gather(*(open_one() for _ in range(options['sockets']))) if socket]
+        connect_seconds = time.perf_counter() - started
+
+        drains = [asyncio.create_task(drain_socket(reader)) for reader, _ in opened]
+        deadline = time.monotonic() + options['hold']
+        while time.monotonic() < deadline:
+            await asyncio.sleep(min(5.0, max(deadline - time.monotonic(), 0)))
+            for _, writer in opened:
+                if not writer.is_closing():
+                    writer.write(ws_frame(0x9, b'bench'))
+        # A socket the server dropped while we were holding has finished draining
+        held = sum(1 for task in drains if not task.done())
+
+        for _, writer in opened:
+            if not writer.is_closing():
+                writer.write(ws_frame(0x8, struct.pack('!H', 1000)))
+                writer.close()
+        for task in drains:
+            task.cancel()
+        await asyncio.gather(*drains, return_exceptions=True)
+        return {'sockets_opened': len(opened), 'sockets_held': held, 'connect_s': connect_seconds}
+
+    def report(self, names, results, options):
+        rows = [
+            ('requests/s', 'rps', '{:.0f}'),
+            ('p50 ms', 'p50', '{:.1f}'),
+            ('p95 ms', 'p95', '{:.1f}'),
+            ('p99 ms', 'p99', '{:.1f}'),
+            ('HTTP errors', 'http_errors', '{}'),
+        ]
+        if options['sockets']:
+            rows += [
+                (f'sockets opened (of {options["sockets"]})', 'sockets_opened', '{}'),
+                (f'sockets held {options["hold"]:g}s', 'sockets_held', '{}'),
+                ('time to open all (s)', 'connect_s', '{:.2f}'),
+            ]
+        label_width = max(len(label) for label, _, _ in rows)
+        widths = [max(12, len(name)) for name in names]
+
+        self.stdout.write(
+            f'{options["requests"]} x GET {options["path"]}, {options["concurrency"]} connections'
+        )
+        self.stdout.write(' ' * label_width + ''.join(f'  {name:>{width}}' for name, width in zip(names, widths)))
+        for label, key, fmt in rows:
+            cells = ''.join(f'  {fmt.format(result[key]):>{width}}' for result, width in zip(results, widths))
+            self.stdout.write(f'{label:<{label_width}}{cells}')
@@ -0,0 +1,137 @@
+# trips/management/commands/benchmark_trip_indexes.py
+
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from accounts.models import FMSUser
+from trips.models import Trip, ACTIVE_STATUSES
+from trucks.models import Truck
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds N trips and reports query plans and timings for the main trip '
+        'query shapes, first without and then with the Trip indexes. '
+        'Everything is rolled back afterwards unless --keep is given.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--trips', type=int, default=20000, help='Number of trips to seed.')
+        parser.add_argument('--repeat', type=int, default=20, help='Executions per query when timing.')
+        parser.add_argument('--keep', action='store_true', help='Commit the seeded rows instead of rolling back.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            driver = self.seed(options['trips'])
+
+            self.stdout.write(self.style.NOTICE('\n--- Without Trip indexes ---'))
+            self.drop_indexes()
+            before = self.measure(driver, options['repeat'])
+
+            self.stdout.write(self.style.NOTICE('\n--- With Trip indexes ---'))
+            self.create_indexes()
+            after = self.measure(driver, options['repeat'])
+
+            self.stdout.write(self.style.NOTICE('\n--- Summary (avg ms per query) ---'))
+            for label in before:
+                self.stdout.write(f'{label:<28} {before[label]:>9.3f} -> {after[label]:>9.3f}')
+
+            if not options['keep']:
+                transaction.set_rollback(True)
+                self.stdout.write(self.style.SUCCESS('\nSeeded rows rolled back.'))
+            else:
+                self.stdout.write(self.style.SUCCESS(
+                    '\nSeeded rows kept. Run rebuild_dashboard_kpis to refresh the rollups.'
+                ))
+
+    # --- 1. Seeding ---
+
+    def seed(self, trip_count):
+        rng = random.Random(42)
+        now = timezone.now()
+
+        trucks = Truck.objects.bulk_create([
+            Truck(license_plate=f'BENCH-{i:04d}', tonner_capacity=rng.choice([4, 6, 10, 20]))
+            for i in range(max(trip_count // 200, 10))
+        ])
+        drivers = FMSUser.objects.bulk_create([
+            FMSUser(email=f'bench-driver-{i}@fms.local', role='driver')
+            for i in range(max(trip_count // 50, 10))
+        ])
+
+        statuses = ['Completed'] * 85 + ['Canceled'] * 5 + ['Scheduled'] * 6 + ['In Transit'] * 4
+        trips = []
+        for i in range(trip_count):
+            status = rng.choice(statuses)
+            start = now - timedelta(days=rng.uniform(-7, 365))
+            trips.append(Trip(
+                trip_code=f'BENCH-{i:07d}',
+                truck=rng.choice(trucks),
+                assigned_driver=rng.choice(drivers),
+                start_location='Bench Origin',
+                end_location='Bench Destination',
+                net_weight=Decimal(rng.randint(500, 9000)),
+                scheduled_start_time=start,
+                actual_start_time=start if status in ('In Transit', 'Completed') else None,
+                actual_end_time=start + timedelta(hours=6) if status == 'Completed' else None,
+                status=status,
+                estimated_fuel_cost=Decimal(rng.randint(1000, 9000)),
+            ))
+        Trip.objects.bulk_create(trips, batch_size=2000)
+
+        self.stdout.write(f'Seeded {trip_count} trips, {len(trucks)} trucks, {len(drivers)} drivers.')
+        return drivers[0]
+
+    # --- 2. Index management (raw DDL so it also works inside the transaction) ---
+
+    def _execute(self, statements):
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(str(statement))
+            if connection.vendor in ('postgresql', 'sqlite'):
+                cursor.execute('ANALYZE')
+
+    def drop_indexes(self):
+        self._execute(
+            f'DROP INDEX {connection.ops.quote_name(index.name)}' for index in Trip._meta.indexes
+        )
+
+    def create_indexes(self):
+        editor = connection.schema_editor()
+        self._execute(index.create_sql(Trip, editor) for index in Trip._meta.indexes)
+
+    # --- 3. Query shapes used by the API ---
+
+    def query_shapes(self, driver):
+        month_ago = timezone.now() - timedelta(days=30)
+        return {
+            # TripSerializer.validate driver conflict check
+            'driver conflict check': Trip.objects.filter(
+                assigned_driver=driver, status__in=ACTIVE_STATUSES
+            ).values('trip_id')[:1],
+            # TripViewSet list ordering, first page
+            'trip list page': Trip.objects.order_by('-scheduled_start_time', '-trip_id')[:50],
+            # Analytics: completed trips in the last 30 days
+            'completed last 30 days': Trip.objects.filter(
+                status='Completed', actual_end_time__gte=month_ago
+            ).values('trip_id', 'actual_end_time'),
+        }
+
+    def measure(self, driver, repeat):
+        timings = {}
+        for label, queryset in self.query_shapes(driver).items():
+            self.stdout.write(self.style.MIGRATE_HEADING(f'\n{label}'))
+            self.stdout.write(queryset.explain())
+
+            started = time.perf_counter()
+            for _ in range(repeat):
+                list(queryset.all())
+            timings[label] = (time.perf_counter() - started) * 1000 / repeat
+            self.stdout.write(f'avg {timings[label]:.3f} ms over {repeat} runs')
+        return timings
@@ -0,0 +1,49 @@
+# trips/management/commands/dispatch_trip_outbox.py
+
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from trips.outbox import dispatch_batch, outbox_setting
+
+
+class Command(BaseCommand):
+    help = (
+        'Publishes queued real-time trip pushes (the trip_outbox table written by '
+        'set_status and bulk-status) to the channel layer in batches, retrying '
+        'with backoff while the channel layer is unavailable. Runs until stopped.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Drain the ready messages once and exit.')
+        parser.add_argument('--batch-size', type=int, default=None, help='Messages claimed per batch.')
+        parser.add_argument('--poll-interval', type=float, default=None,
+                            help='Seconds to sleep when the outbox is empty.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size'] or outbox_setting('BATCH_SIZE', 500)
+        poll_interval = options['poll_interval'] or outbox_setting('POLL_SECONDS', 0.25)
+
+        self.stopping = False
+        if not options['once']:
+            # Finish the batch in flight on docker stop / Ctrl+C
+            signal.signal(signal.SIGTERM, self.stop)
+            signal.signal(signal.SIGINT, self.stop)
+
+        processed = 0
+        while not self.stopping:
+            # Drops connections past CONN_MAX_AGE or broken by a DB restart
+            close_old_connections()
+            claimed = dispatch_batch(batch_size)
+            processed += claimed
+            if claimed < batch_size:
+                if options['once']:
+                    break
+                time.sleep(poll_interval)
+
+        self.stdout.write(f'Processed {processed} outbox message(s).')
+
+    def stop(self, signum, frame):
+        self.stopping = True
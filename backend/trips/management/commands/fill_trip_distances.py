@@ -0,0 +1,24 @@
+# trips/management/commands/fill_trip_distances.py
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from trips.eta import fill_distances
+
+
+class Command(BaseCommand):
+    help = (
+        'Resolves trip start/end names to Locations and fills distance_km in '
+        'batches. Only trips without a distance are touched unless --overwrite is given.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--overwrite', action='store_true', help='Recompute distances that are already set.')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Trips per bulk update.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        updated = fill_distances(overwrite=options['overwrite'], batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'Filled distance_km for {updated} trips in {elapsed:.2f}s.'))
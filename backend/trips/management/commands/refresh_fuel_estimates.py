@@ -0,0 +1,31 @@
+# trips/management/commands/refresh_fuel_estimates.py
+
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from trips.fuel import fit_profiles, recompute_estimates
+
+
+class Command(BaseCommand):
+    help = (
+        'Fits per-truck fuel consumption profiles from completed trips with fuel '
+        'records, then recomputes estimated_fuel_cost for all open trips.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--skip-fit', action='store_true', help='Reuse the stored profiles.')
+        parser.add_argument('--history-days', type=int, default=365, help='Trip history used for fitting (0 = all).')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        if not options['skip_fit']:
+            since = timezone.now() - timedelta(days=options['history_days']) if options['history_days'] else None
+            fitted = fit_profiles(since=since)
+            self.stdout.write(f'Fitted {fitted} truck profiles.')
+
+        updated = recompute_estimates()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'Updated estimated_fuel_cost on {updated} open trips in {elapsed:.2f}s.'))
@@ -0,0 +1,174 @@
+# backend/trips/matching.py
+#
+# Pure-Python assignment solver used by trips.optimizer. It has no Django
+# imports and works on plain dicts/tuples, so components can be solved in
+# worker processes regardless of the multiprocessing start method.
+
+import math
+import time
+
+# Cost of an infeasible pairing; anything matched at this cost is left unassigned
+INFEASIBLE = 1e9
+
+
+def solve_assignment(cost):
+    """
+    Minimum-cost assignment of rows to distinct columns (Hungarian algorithm
+    with potentials, O(rows^2 * columns)). Requires rows <= columns.
+    Returns the chosen column index for every row.
+    """
+    n = len(cost)
+    m = len(cost[0]) if n else 0
+    u, v = [0.0] * (n + 1), [0.0] * (m + 1)
+    match, way = [0] * (m + 1), [0] * (m + 1)
+
+    for row in range(1, n + 1):
+        match[0] = row
+        col0 = 0
+        min_slack = [math.inf] * (m + 1)
+        used = [False] * (m + 1)
+        while True:
+            used[col0] = True
+            row0, delta, col1 = match[col0], math.inf, 0
+            for col in range(1, m + 1):
+                if not used[col]:
+                    slack = cost[row0 - 1][col - 1] - u[row0] - v[col]
+                    if slack < min_slack[col]:
+                        min_slack[col], way[col] = slack, col0
+                    if min_slack[col] < delta:
+                        delta, col1 = min_slack[col], col
+            for col in range(m + 1):
+                if used[col]:
+                    u[match[col]] += delta
+                    v[col] -= delta
+                else:
+                    min_slack[col] -= delta
+            col0 = col1
+            if match[col0] == 0:
+                break
+        # Flip the augmenting path
+        while col0:
+            col1 = way[col0]
+            match[col0] = match[col1]
+            col0 = col1
+
+    result = [None] * n
+    for col in range(1, m + 1):
+        if match[col]:
+            result[match[col] - 1] = col - 1
+    return result
+
+
+def _is_free(windows, start, end):
+    return all(end <= other_start or start >= other_end for other_start, other_end in windows)
+
+
+def _match(batch, resources, cost_of):
+    """
+    Matches every trip of a batch to a distinct resource. `resources` is
+    {id: resource}; `cost_of(trip, resource)` returns a cost or None when the
+    pairing is infeasible. Returns {trip_id: (resource_id, cost)}.
+    """
+    costs = {}
+    for trip in batch:
+        for resource_id, resource in resources.items():
+            cost = cost_of(trip, resource)
+            if cost is not None:
+                costs[trip['trip_id'], resource_id] = cost
+
+    # Only columns usable by at least one trip; pad so rows <= columns
+    columns = sorted({resource_id for _, resource_id in costs})
+    width = max(len(columns), len(batch))
+    matrix = [
+        [costs.get((trip['trip_id'], resource_id), INFEASIBLE) for resource_id in columns]
+        + [INFEASIBLE] * (width - len(columns))
+        for trip in batch
+    ]
+
+    matched = {}
+    for row, col in enumerate(solve_assignment(matrix)):
+        if col < len(columns) and matrix[row][col] < INFEASIBLE:
+            matched[batch[row]['trip_id']] = (columns[col], matrix[row][col])
+    return matched
+
+
+def solve_component(trips, trucks, drivers, deadline):
+    """
+    Assigns one connected group of overlapping trips.
+
+    Trips are swept in start order into batches that all overlap each other
+    (so every trip in a batch needs its own truck and driver); each batch is
+    an exact min-cost matching, first trucks then drivers, and its choices
+    are booked before the next batch is solved.
+    """
+    trucks = {truck['id']: dict(truck, windows=list(truck['windows'])) for truck in trucks}
+    drivers = {driver['id']: dict(driver, windows=list(driver['windows']), load=0) for driver in drivers}
+    results = []
+
+    def truck_cost(trip, truck):
+        if trip['truck'] is not None and truck['id'] != trip['truck']:
+            return None
+        if truck['capacity'] < trip['load'] or not _is_free(truck['windows'], trip['start'], trip['end']):
+            return None
+        # Best fit: smallest spare capacity, relative to the truck's size
+        return (truck['capacity'] - trip['load']) / max(truck['capacity'], 1)
+
+    index = 0
+    while index < len(trips):
+        # Every trip starting before the earliest end in the batch overlaps all of it
+        batch = [trips[index]]
+        batch_end = trips[index]['end']
+        index += 1
+        while index < len(trips) and trips[index]['start'] < batch_end:
+            batch.append(trips[index])
+            batch_end = min(batch_end, trips[index]['end'])
+            index += 1
+
+        if time.time() > deadline:
+            results += [dict(trip_id=trip['trip_id'], reason='Time budget exceeded.') for trip in batch]
+            continue
+
+        truck_matches = _match(batch, trucks, truck_cost)
+
+        def driver_cost(trip, driver):
+            if trip['driver'] is not None and driver['id'] != trip['driver']:
+                return None
+            if trip['trip_id'] not in truck_matches or not _is_free(driver['windows'], trip['start'], trip['end']):
+                return None
+            truck = trucks[truck_matches[trip['trip_id']][0]]
+            # Prefer the truck's regular driver, then spread the work
+            return (0 if truck['default_driver'] == driver['id'] else 1) + 0.01 * driver['load']
+
+        driver_matches = _match(batch, drivers, driver_cost)
+
+        for trip in batch:
+            if trip['trip_id'] not in truck_matches:
+                results.append(dict(trip_id=trip['trip_id'], reason='No truck with enough capacity is free in this window.'))
+                continue
+            if trip['trip_id'] not in driver_matches:
+                results.append(dict(trip_id=trip['trip_id'], reason='No driver is free in this window.'))
+                continue
+
+            truck_id, truck_cost_value = truck_matches[trip['trip_id']]
+            driver_id, driver_cost_value = driver_matches[trip['trip_id']]
+            trucks[truck_id]['windows'].append((trip['start'], trip['end']))
+            drivers[driver_id]['windows'].append((trip['start'], trip['end']))
+            drivers[driver_id]['load'] += 1
+            results.append(dict(
+                trip_id=trip['trip_id'], truck=truck_id, assigned_driver=driver_id,
+                cost=round(truck_cost_value + driver_cost_value, 4),
+            ))
+    return results
+
+
+def split_components(trips):
+    """Groups start-sorted trips into runs whose windows never overlap another run."""
+    components = []
+    component_end = -math.inf
+    for trip in trips:
+        if not components or trip['start'] >= component_end:
+            components.append([])
+            component_end = trip['end']
+        components[-1].append(trip)
+        component_end = max(component_end, trip['end'])
+    return components
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trips', '0004_trip_actual_end_time'),
+        ('trucks', '0005_truck_assigned_driver'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='trip',
+            index=models.Index(fields=['scheduled_start_time', 'trip_id'], name='idx_trips_scheduled_date'),
+        ),
+        migrations.AddIndex(
+            model_name='trip',
+            index=models.Index(fields=['status', 'actual_end_time'], name='idx_trips_status_end'),
+        ),
+        migrations.AddIndex(
+            model_name='trip',
+            index=models.Index(condition=models.Q(('status__in', ('Scheduled', 'In Transit'))), fields=['assigned_driver', 'scheduled_start_time'], name='idx_trips_driver_active'),
+        ),
+    ]
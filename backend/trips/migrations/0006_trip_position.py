@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trips', '0005_trip_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TripPosition',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('recorded_at', models.DateTimeField()),
+                ('lat', models.FloatField()),
+                ('lng', models.FloatField()),
+                ('trip', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='positions', to='trips.trip')),
+            ],
+            options={
+                'verbose_name': 'Trip Position',
+                'verbose_name_plural': 'Trip Positions',
+                'db_table': 'trip_positions',
+                'indexes': [models.Index(fields=['trip', 'recorded_at'], name='idx_trip_positions_time')],
+            },
+        ),
+    ]
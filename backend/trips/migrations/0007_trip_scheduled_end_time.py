@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trips', '0006_trip_position'),
+        ('trucks', '0005_truck_assigned_driver'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trip',
+            name='scheduled_end_time',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='trip',
+            index=models.Index(condition=models.Q(('status__in', ('Scheduled', 'In Transit'))), fields=['truck', 'scheduled_start_time'], name='idx_trips_truck_active'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locations', '0001_initial'),
+        ('trips', '0007_trip_scheduled_end_time'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trip',
+            name='destination_location',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='destination_trips', to='locations.location'),
+        ),
+        migrations.AddField(
+            model_name='trip',
+            name='origin_location',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='origin_trips', to='locations.location'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:08
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trips', '0008_trip_route_locations'),
+        ('trucks', '0006_truck_status_capacity_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TruckFuelProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('base_liters_per_km', models.FloatField()),
+                ('liters_per_km_per_ton', models.FloatField()),
+                ('samples', models.PositiveIntegerField(default=0)),
+                ('fitted_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('truck', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='fuel_profile', to='trucks.truck')),
+            ],
+            options={
+                'db_table': 'truck_fuel_profiles',
+            },
+        ),
+        migrations.CreateModel(
+            name='TripFuel',
+            fields=[
+                ('fuel_id', models.AutoField(primary_key=True, serialize=False)),
+                ('fuel_ref_no', models.CharField(blank=True, max_length=100, null=True)),
+                ('liters', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('total_amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+                ('encoder', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='encoded_fuels', to=settings.AUTH_USER_MODEL)),
+                ('trip', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fuels', to='trips.trip')),
+            ],
+            options={
+                'verbose_name': 'Trip Fuel',
+                'verbose_name_plural': 'Trip Fuels',
+                'db_table': 'trip_fuels',
+                'indexes': [models.Index(fields=['created_at'], name='idx_trip_fuels_created')],
+            },
+        ),
+    ]
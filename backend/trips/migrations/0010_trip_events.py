@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:11
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trips', '0009_trip_fuel'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TripMetrics',
+            fields=[
+                ('trip', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='metrics', serialize=False, to='trips.trip')),
+                ('loading_arrival_at', models.DateTimeField(blank=True, null=True)),
+                ('departed_at', models.DateTimeField(blank=True, null=True)),
+                ('unloading_arrival_at', models.DateTimeField(blank=True, null=True)),
+                ('unloading_finished_at', models.DateTimeField(blank=True, null=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('loading_dwell_seconds', models.IntegerField(blank=True, null=True)),
+                ('unloading_dwell_seconds', models.IntegerField(blank=True, null=True)),
+                ('departure_delay_seconds', models.IntegerField(blank=True, null=True)),
+                ('on_time', models.BooleanField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Trip Metrics',
+                'verbose_name_plural': 'Trip Metrics',
+                'db_table': 'trip_metrics',
+                'indexes': [models.Index(fields=['completed_at'], name='idx_trip_metrics_completed')],
+            },
+        ),
+        migrations.CreateModel(
+            name='TripEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('event_type', models.CharField(choices=[('Loading_Arrival', 'Loading Arrival'), ('Loading_Start', 'Loading Start'), ('Unloading_Arrival', 'Unloading Arrival'), ('Unloading_Finish', 'Unloading Finish'), ('Status_Change', 'Status Change')], max_length=50)),
+                ('event_timestamp', models.DateTimeField(default=django.utils.timezone.now)),
+                ('status', models.CharField(blank=True, max_length=50, null=True)),
+                ('document_no', models.CharField(blank=True, max_length=100, null=True)),
+                ('encoder', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='encoded_events', to=settings.AUTH_USER_MODEL)),
+                ('trip', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='events', to='trips.trip')),
+            ],
+            options={
+                'verbose_name': 'Trip Event',
+                'verbose_name_plural': 'Trip Events',
+                'db_table': 'trip_events',
+                'indexes': [models.Index(fields=['trip', 'event_timestamp'], name='idx_trip_events_time')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:17
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locations', '0001_initial'),
+        ('trips', '0010_trip_events'),
+        ('trucks', '0006_truck_status_capacity_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trip',
+            name='updated_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='trip',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddIndex(
+            model_name='trip',
+            index=models.Index(fields=['updated_at'], name='idx_trips_updated'),
+        ),
+    ]
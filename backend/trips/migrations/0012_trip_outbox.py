@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:26
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trips', '0011_trip_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TripOutboxMessage',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('trip_id', models.IntegerField()),
+                ('status', models.CharField(max_length=50)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, default='')),
+            ],
+            options={
+                'verbose_name': 'Trip Outbox Message',
+                'verbose_name_plural': 'Trip Outbox Messages',
+                'db_table': 'trip_outbox',
+                'indexes': [models.Index(fields=['available_at', 'id'], name='idx_trip_outbox_available')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:37
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trips', '0012_trip_outbox'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='trip',
+            name='idx_trips_updated',
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trips', '0013_drop_trip_updated_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='tripoutboxmessage',
+            index=models.Index(fields=['trip_id', 'id'], name='idx_trip_outbox_trip'),
+        ),
+    ]
@@ -2,6 +2,7 @@
 
 from django.db import models
 from trucks.models import Truck 
+from locations.models import Location
 from django.contrib.auth import get_user_model
 from django.utils import timezone # For the created_at timestamp
 
@@ -14,6 +15,24 @@ STATUS_CHOICES = (
     ('Canceled', 'Canceled'),
 )
 
+# Statuses that hold a driver/truck (used by conflict checks and partial indexes)
+ACTIVE_STATUSES = ('Scheduled', 'In Transit')
+
+# Statuses accepted by the status endpoints (set_status, bulk-status)
+SETTABLE_STATUSES = ('In Transit', 'Completed', 'Canceled', 'Delayed', 'Scheduled')
+
+# Loading/unloading milestones reported by drivers or dispatchers
+MILESTONE_EVENTS = ('Loading_Arrival', 'Loading_Start', 'Unloading_Arrival', 'Unloading_Finish')
+
+EVENT_TYPE_CHOICES = (
+    ('Loading_Arrival', 'Loading Arrival'),
+    ('Loading_Start', 'Loading Start'),
+    ('Unloading_Arrival', 'Unloading Arrival'),
+    ('Unloading_Finish', 'Unloading Finish'),
+    # Written by the status endpoints; the new status is in TripEvent.status
+    ('Status_Change', 'Status Change'),
+)
+
 class Trip(models.Model):
     # --- REQUIRED EXISTING FIELDS (from database schema) ---
     # Assuming this is your existing primary key:
@@ -37,9 +56,16 @@ class Trip(models.Model):
     # Trip details
     start_location = models.CharField(max_length=255)
     end_location = models.CharField(max_length=255)
+
+    # Endpoints resolved to Location rows (by name, see trips/eta.py) for
+    # distance and ETA computation
+    origin_location = models.ForeignKey(Location, on_delete=models.SET_NULL, null=True, blank=True, related_name='origin_trips')
+    destination_location = models.ForeignKey(Location, on_delete=models.SET_NULL, null=True, blank=True, related_name='destination_trips')
     
     # Scheduling/Status
     scheduled_start_time = models.DateTimeField(null=True, blank=True) # Making nullable to avoid migration prompt
+    # Planned end of the booking window (see trips.scheduling); empty means open-ended
+    scheduled_end_time = models.DateTimeField(null=True, blank=True)
     actual_start_time = models.DateTimeField(null=True, blank=True)
     actual_end_time = models.DateTimeField(null=True, blank=True)
     status = models.CharField(max_length=50, default='Scheduled') 
@@ -48,8 +74,253 @@ class Trip(models.Model):
     estimated_fuel_cost = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     distance_km = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
 
+    # Change stamp for conditional GETs (ETag / Last-Modified): bumped by
+    # every save() and by bulk writes through touch()
+    version = models.PositiveIntegerField(default=1)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    # Bulk writers add these to their bulk_update() field lists
+    VERSION_FIELDS = ('version', 'updated_at')
+
+    # Fields whose loaded values are remembered, so signal handlers (e.g. the
+    # analytics rollups) can tell what a save() changed without re-reading the row.
+    TRACKED_FIELDS = (
+        'status', 'scheduled_start_time', 'actual_start_time',
+        'actual_end_time', 'estimated_fuel_cost', 'distance_km', 'net_weight',
+    )
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = {
+            name: value for name, value in zip(field_names, values)
+            if name in cls.TRACKED_FIELDS
+        }
+        return instance
+
+    def tracked_state(self):
+        """Current values of the tracked fields."""
+        return {name: getattr(self, name) for name in self.TRACKED_FIELDS}
+
+    def previous_state(self):
+        """Tracked values as last loaded/saved, or None for an unsaved trip."""
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return None
+        # Deferred fields were never loaded, so they cannot have changed
+        return {name: loaded.get(name, getattr(self, name)) for name in self.TRACKED_FIELDS}
+
+    def apply_status(self, new_status, now=None):
+        """
+        Sets the status and its side effects in memory; the caller saves.
+        Returns the names of the fields that need saving.
+        """
+        now = now or timezone.now()
+        self.status = new_status
+        if new_status == 'In Transit' and not self.actual_start_time:
+            # Record the actual start time only on the first transit update
+            self.actual_start_time = now
+        elif new_status == 'Completed' and not self.actual_end_time:
+            self.actual_end_time = now
+        return ['status', 'actual_start_time', 'actual_end_time']
+
+    def touch(self, now=None):
+        """Bumps the change stamp in memory; the caller saves VERSION_FIELDS."""
+        if not self._state.adding:
+            self.version += 1
+        self.updated_at = now or timezone.now()
+
+    def save(self, *args, **kwargs):
+        self.touch()
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], *self.VERSION_FIELDS}
+        super().save(*args, **kwargs)
+        # post_save handlers have seen the old values; this is the new baseline
+        self._loaded_values = self.tracked_state()
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        # The reloaded values are the new baseline, e.g. for a later delete()
+        refreshed = self.TRACKED_FIELDS if fields is None else [name for name in fields if name in self.TRACKED_FIELDS]
+        self._loaded_values = {**getattr(self, '_loaded_values', {}), **{name: getattr(self, name) for name in refreshed}}
+
     def __str__(self):
         return f"Trip {self.trip_code} to {self.end_location} ({self.status})"
 
     class Meta:
-        db_table = 'trips'
\ No newline at end of file
+        db_table = 'trips'
+        # Matched to the queries the API actually runs (see the
+        # benchmark_trip_indexes command for plans and timings)
+        indexes = [
+            # TripViewSet ordering (-scheduled_start_time) with a unique tiebreaker
+            models.Index(fields=['scheduled_start_time', 'trip_id'], name='idx_trips_scheduled_date'),
+            # Analytics: status filter plus actual_end_time range
+            models.Index(fields=['status', 'actual_end_time'], name='idx_trips_status_end'),
+            # Driver conflict checks only ever look at active trips
+            models.Index(
+                fields=['assigned_driver', 'scheduled_start_time'],
+                name='idx_trips_driver_active',
+                condition=models.Q(status__in=ACTIVE_STATUSES),
+            ),
+            # Same for truck double-booking checks
+            models.Index(
+                fields=['truck', 'scheduled_start_time'],
+                name='idx_trips_truck_active',
+                condition=models.Q(status__in=ACTIVE_STATUSES),
+            ),
+        ]
+
+class TripPosition(models.Model):
+    """
+    Append-only GPS history of a trip. Rows are written in bulk batches by
+    trips.ingestion.LocationIngestor, never one per ping.
+    """
+    id = models.BigAutoField(primary_key=True)
+
+    # The composite index below covers trip lookups, so skip the FK's own index
+    trip = models.ForeignKey(Trip, on_delete=models.CASCADE, related_name='positions', db_index=False)
+    recorded_at = models.DateTimeField()
+
+    # Plain floats: ~1 cm precision is plenty and half the size of NUMERIC(10, 6)
+    lat = models.FloatField()
+    lng = models.FloatField()
+
+    class Meta:
+        db_table = 'trip_positions'
+        verbose_name = 'Trip Position'
+        verbose_name_plural = 'Trip Positions'
+        indexes = [
+            models.Index(fields=['trip', 'recorded_at'], name='idx_trip_positions_time'),
+        ]
+
+    def __str__(self):
+        return f"Trip {self.trip_id} @ {self.recorded_at}: {self.lat}, {self.lng}"
+
+class TripFuel(models.Model):
+    """A fuel purchase recorded against a trip (restores the trip_fuels table)."""
+    fuel_id = models.AutoField(primary_key=True)
+    trip = models.ForeignKey(Trip, on_delete=models.CASCADE, related_name='fuels')
+    fuel_ref_no = models.CharField(max_length=100, null=True, blank=True)
+    liters = models.DecimalField(max_digits=8, decimal_places=2)
+    total_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    # User who recorded the purchase
+    encoder = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='encoded_fuels')
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    def __str__(self):
+        return f"{self.liters} L for trip {self.trip_id}"
+
+    class Meta:
+        db_table = 'trip_fuels'
+        verbose_name = 'Trip Fuel'
+        verbose_name_plural = 'Trip Fuels'
+        indexes = [
+            # Price lookups read the most recent purchases
+            models.Index(fields=['created_at'], name='idx_trip_fuels_created'),
+        ]
+
+class TruckFuelProfile(models.Model):
+    """
+    Fitted fuel consumption of a truck (see trips/fuel.py):
+        liters = distance_km * (base_liters_per_km + liters_per_km_per_ton * net_weight)
+    A row with truck=None holds the fleet-wide fit used for trucks without
+    enough history.
+    """
+    truck = models.OneToOneField(Truck, on_delete=models.CASCADE, null=True, blank=True, related_name='fuel_profile')
+    base_liters_per_km = models.FloatField()
+    liters_per_km_per_ton = models.FloatField()
+    # Completed trips with fuel records the fit was made from
+    samples = models.PositiveIntegerField(default=0)
+    fitted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'truck_fuel_profiles'
+
+class TripEvent(models.Model):
+    """
+    Append-only timeline of a trip: loading/unloading milestones and status
+    changes (restores the trip_events table). Rows are only ever inserted,
+    in batches, by trips.events.record_events().
+    """
+    id = models.BigAutoField(primary_key=True)
+
+    # The composite index below covers trip lookups, so skip the FK's own index
+    trip = models.ForeignKey(Trip, on_delete=models.CASCADE, related_name='events', db_index=False)
+    event_type = models.CharField(max_length=50, choices=EVENT_TYPE_CHOICES)
+    event_timestamp = models.DateTimeField(default=timezone.now)
+    # New status for Status_Change events
+    status = models.CharField(max_length=50, null=True, blank=True)
+    document_no = models.CharField(max_length=100, null=True, blank=True)
+    # User who reported the event (None for WebSocket reports)
+    encoder = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='encoded_events')
+
+    class Meta:
+        db_table = 'trip_events'
+        verbose_name = 'Trip Event'
+        verbose_name_plural = 'Trip Events'
+        indexes = [
+            models.Index(fields=['trip', 'event_timestamp'], name='idx_trip_events_time'),
+        ]
+
+    def __str__(self):
+        return f"Trip {self.trip_id} {self.event_type} @ {self.event_timestamp}"
+
+class TripMetrics(models.Model):
+    """
+    Timing metrics of one trip, maintained incrementally from its events
+    (see trips/events.py) so reports never replay the event log.
+    Milestone columns hold the first occurrence of each milestone.
+    """
+    trip = models.OneToOneField(Trip, on_delete=models.CASCADE, primary_key=True, related_name='metrics')
+
+    loading_arrival_at = models.DateTimeField(null=True, blank=True)
+    departed_at = models.DateTimeField(null=True, blank=True)  # first 'In Transit'
+    unloading_arrival_at = models.DateTimeField(null=True, blank=True)
+    unloading_finished_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    # Derived from the milestones above and the trip's schedule
+    loading_dwell_seconds = models.IntegerField(null=True, blank=True)
+    unloading_dwell_seconds = models.IntegerField(null=True, blank=True)
+    departure_delay_seconds = models.IntegerField(null=True, blank=True)
+    on_time = models.BooleanField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'trip_metrics'
+        verbose_name = 'Trip Metrics'
+        verbose_name_plural = 'Trip Metrics'
+        indexes = [
+            # Fleet summaries filter on completion time
+            models.Index(fields=['completed_at'], name='idx_trip_metrics_completed'),
+        ]
+
+class TripOutboxMessage(models.Model):
+    """
+    Transactional outbox for real-time trip pushes. Views insert a row in
+    the same transaction as the status change, so only committed changes
+    are ever broadcast; trips.outbox.dispatch_batch() publishes rows to the
+    channel layer and deletes them (at-least-once delivery).
+    """
+    id = models.BigAutoField(primary_key=True)
+    # No foreign key: a pending push must not block deleting its trip
+    trip_id = models.IntegerField()
+    status = models.CharField(max_length=50)
+    created_at = models.DateTimeField(default=timezone.now)
+    # Not dispatched before this time (pushed back after failed attempts)
+    available_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+
+    class Meta:
+        db_table = 'trip_outbox'
+        verbose_name = 'Trip Outbox Message'
+        verbose_name_plural = 'Trip Outbox Messages'
+        indexes = [
+            # The dispatcher's scan: oldest ready rows first
+            models.Index(fields=['available_at', 'id'], name='idx_trip_outbox_available'),
+            # A claimed trip's other queued rows (dispatch_batch coalescing)
+            models.Index(fields=['trip_id', 'id'], name='idx_trip_outbox_trip'),
+        ]
+
+    def __str__(self):
+        return f"Trip {self.trip_id} -> {self.status} (attempt {self.attempts})"
@@ -0,0 +1,190 @@
+# backend/trips/optimizer.py
+
+import math
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, time as day_time, timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from trucks.models import Truck, TruckStatus
+from .fuel import estimate_costs, fuel_price_per_liter, load_profiles
+from .models import Trip
+from .matching import solve_component, split_components
+from .scheduling import SchedulingConflict, active_windows, find_batch_conflicts, lock_many
+from .signals import trips_bulk_changed
+
+User = get_user_model()
+
+# --- 1. Solving ---
+
+def solve(problem, time_budget=None, workers=None):
+    """
+    Solves a problem built by load_problem(). Components never compete for
+    the same time slots, so they are solved independently -- in a process
+    pool when workers > 1. Returns one result dict per trip.
+    """
+    config = getattr(settings, 'TRIP_OPTIMIZER', {})
+    time_budget = time_budget if time_budget is not None else config.get('TIME_BUDGET_SECONDS', 5)
+    workers = workers if workers is not None else config.get('WORKERS', 0)
+    deadline = time.time() + time_budget
+
+    components = split_components(sorted(problem['trips'], key=lambda trip: trip['start']))
+    args = [(component, problem['trucks'], problem['drivers'], deadline) for component in components]
+
+    if workers and workers > 1 and len(components) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            solved = list(pool.map(solve_component, *zip(*args)))
+    else:
+        solved = [solve_component(*arg) for arg in args]
+
+    results = [result for component in solved for result in component]
+    return results + problem['rejected']
+
+
+# --- 2. Loading trips and resources ---
+
+def _timestamp(value, default):
+    return value.timestamp() if value is not None else default
+
+
+def optimizable_trips(trip_ids=None, day=None):
+    """Scheduled trips missing a truck or a driver, optionally limited to ids or a day."""
+    trips = Trip.objects.filter(status='Scheduled').filter(Q(truck__isnull=True) | Q(assigned_driver__isnull=True))
+    if trip_ids is not None:
+        trips = trips.filter(pk__in=trip_ids)
+    if day is not None:
+        start = timezone.make_aware(datetime.combine(day, day_time.min))
+        trips = trips.filter(scheduled_start_time__gte=start, scheduled_start_time__lt=start + timedelta(days=1))
+    return trips
+
+
+def load_problem(trips):
+    """
+    Reads everything the solver needs as plain data: the trips, all trucks
+    outside maintenance, all active drivers and their existing bookings.
+    Four queries regardless of fleet size.
+    """
+    rows = list(trips.values(
+        'trip_id', 'net_weight', 'truck_id', 'assigned_driver_id', 'scheduled_start_time', 'scheduled_end_time',
+    ))
+    problem = {'trips': [], 'rejected': []}
+    for row in rows:
+        if row['scheduled_start_time'] is None:
+            problem['rejected'].append(dict(trip_id=row['trip_id'], reason='Trip has no scheduled start time.'))
+            continue
+        problem['trips'].append({
+            'trip_id': row['trip_id'],
+            'load': float(row['net_weight'] or 0),
+            'truck': row['truck_id'],
+            'driver': row['assigned_driver_id'],
+            'start': row['scheduled_start_time'].timestamp(),
+            'end': _timestamp(row['scheduled_end_time'], math.inf),
+        })
+
+    trucks = {
+        truck_id: {'id': truck_id, 'capacity': capacity, 'default_driver': default_driver, 'windows': []}
+        for truck_id, capacity, default_driver in Truck.objects.filter(
+            status__in=[TruckStatus.AVAILABLE, TruckStatus.IN_USE]
+        ).values_list('truck_id', 'tonner_capacity', 'assigned_driver_id')
+    }
+    drivers = {
+        driver_id: {'id': driver_id, 'windows': []}
+        for driver_id in User.objects.filter(role='driver', is_active=True).values_list('id', flat=True)
+    }
+
+    # Existing bookings of other trips (the ones being optimized are excluded)
+    bookings = active_windows().exclude(pk__in=[row['trip_id'] for row in rows]).filter(
+        scheduled_start_time__isnull=False,
+    ).values_list('truck_id', 'assigned_driver_id', 'scheduled_start_time', 'window_end')
+    for truck_id, driver_id, start, end in bookings:
+        window = (start.timestamp(), _timestamp(end, math.inf))
+        if truck_id in trucks:
+            trucks[truck_id]['windows'].append(window)
+        if driver_id in drivers:
+            drivers[driver_id]['windows'].append(window)
+
+    problem['trucks'] = list(trucks.values())
+    problem['drivers'] = list(drivers.values())
+    return problem
+
+
+# --- 3. Committing a plan ---
+
+def commit_plan(assignments):
+    """
+    Applies [{'trip_id', 'truck', 'assigned_driver'}, ...] (e.g. a previewed
+    plan) in one transaction. Trucks, drivers and trips are locked and every
+    item is rechecked, since the fleet may have changed since the preview.
+    Trips whose truck changes get a fresh fuel estimate, as it depends on
+    the truck. Raises SchedulingConflict with {index: errors}; returns the
+    updated trips.
+    """
+    with transaction.atomic():
+        lock_many(
+            driver_ids={item['assigned_driver'] for item in assignments},
+            truck_ids={item['truck'] for item in assignments},
+        )
+        trips = Trip.objects.select_for_update().in_bulk([item['trip_id'] for item in assignments])
+        trucks = Truck.objects.in_bulk({item['truck'] for item in assignments})
+        drivers = User.objects.filter(role='driver', is_active=True).in_bulk(
+            {item['assigned_driver'] for item in assignments}
+        )
+
+        errors, bookings, seen = {}, [], set()
+        for index, item in enumerate(assignments):
+            trip, truck = trips.get(item['trip_id']), trucks.get(item['truck'])
+            driver = drivers.get(item['assigned_driver'])
+            if item['trip_id'] in seen:
+                errors[index] = {'trip_id': ['Trip appears more than once in this batch.']}
+            elif trip is None or trip.status != 'Scheduled':
+                errors[index] = {'trip_id': ['Trip does not exist or is no longer scheduled.']}
+            elif truck is None or truck.status == TruckStatus.MAINTENANCE:
+                errors[index] = {'truck': ['Truck does not exist or is under maintenance.']}
+            elif trip.net_weight is not None and trip.net_weight > truck.tonner_capacity:
+                errors[index] = {'truck': [f'Trip load ({trip.net_weight}) exceeds vehicle capacity ({truck.tonner_capacity}).']}
+            elif driver is None:
+                errors[index] = {'assigned_driver': ['Driver does not exist or is inactive.']}
+            seen.add(item['trip_id'])
+            bookings.append({
+                'scheduled_start_time': trip.scheduled_start_time if trip else None,
+                'scheduled_end_time': trip.scheduled_end_time if trip else None,
+                'truck': truck,
+                'assigned_driver': driver,
+            })
+
+        for index, conflict in find_batch_conflicts(bookings, exclude_trip_ids=list(trips)).items():
+            errors.setdefault(index, conflict)
+        if errors:
+            raise SchedulingConflict(errors)
+
+        updated, moved = [], []
+        now = timezone.now()
+        for item in assignments:
+            trip = trips[item['trip_id']]
+            if trip.truck_id != item['truck'] and trip.distance_km is not None:
+                moved.append(trip)
+            trip.truck, trip.assigned_driver = trucks[item['truck']], drivers[item['assigned_driver']]
+            trip.touch(now)
+            updated.append(trip)
+
+        if moved:
+            costs = estimate_costs(
+                [(trip.truck_id, trip.distance_km, trip.net_weight) for trip in moved],
+                load_profiles(), fuel_price_per_liter(),
+            )
+            for trip, cost in zip(moved, costs):
+                trip.estimated_fuel_cost = cost
+        changes = [(trip.previous_state(), trip.tracked_state()) for trip in updated]
+
+        Trip.objects.bulk_update(
+            updated, ['truck', 'assigned_driver', 'estimated_fuel_cost', *Trip.VERSION_FIELDS], batch_size=500,
+        )
+        # bulk_update skips post_save; the fuel rollups follow the new
+        # estimates and the list ETag changes
+        trips_bulk_changed.send(sender=Trip, changes=changes)
+    return updated
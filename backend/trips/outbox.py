@@ -0,0 +1,140 @@
+# backend/trips/outbox.py
+
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import TripOutboxMessage
+from .positions import current_positions, last_known_positions
+from .realtime import publish_trip_updates, trip_update_message
+
+logger = logging.getLogger(__name__)
+
+
+def outbox_setting(name, default):
+    return getattr(settings, 'TRIP_OUTBOX', {}).get(name, default)
+
+
+# --- 1. Writing (inside the caller's transaction) ---
+
+def enqueue_trip_updates(trips, now=None):
+    """
+    Queues a 'trip_update' push for each trip's current status with one
+    insert. Call it inside the transaction that changed the trips: the rows
+    commit or roll back together with the change, and the request never
+    waits on the channel layer.
+    """
+    now = now or timezone.now()
+    TripOutboxMessage.objects.bulk_create([
+        TripOutboxMessage(trip_id=trip.trip_id, status=trip.status, created_at=now, available_at=now)
+        for trip in trips
+    ])
+
+
+# --- 2. Dispatching (dispatch_trip_outbox command) ---
+
+def retry_delay(attempts):
+    """Exponential backoff after the given number of failed attempts."""
+    base = outbox_setting('RETRY_BASE_SECONDS', 1)
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), outbox_setting('MAX_BACKOFF_SECONDS', 60)))
+
+
+async def _publish(channel_layer, messages, timeout):
+    await asyncio.wait_for(publish_trip_updates(channel_layer, messages), timeout)
+
+
+def dispatch_batch(batch_size=None, channel_layer=None, now=None):
+    """
+    Publishes up to batch_size ready outbox rows and returns how many were
+    claimed.
+
+    Rows are locked with SKIP LOCKED, so several dispatchers can run side
+    by side without sending the same row twice at once. Every other queued
+    row of a claimed trip (e.g. an older one backing off after a failure)
+    is locked too, and only the trip's newest row is published, so an old
+    status is never re-sent after a newer one:
+
+    - a trip with a newer row held by another dispatcher is left to it
+      (our older rows are deleted unsent);
+    - a trip with an older row held by another dispatcher waits for the
+      next pass, once that row is sent or backing off.
+
+    The whole batch goes out as one publish_trip_updates() call (one fleet
+    message). Rows are deleted only once the channel layer accepted the
+    batch; on failure the newest row per trip stays, with a backoff, so a
+    crash or a Redis outage means a repeat, never a loss.
+    """
+    batch_size = batch_size or outbox_setting('BATCH_SIZE', 500)
+    now = now or timezone.now()
+    with transaction.atomic():
+        rows = list(
+            TripOutboxMessage.objects.select_for_update(skip_locked=True)
+            .filter(available_at__lte=now)
+            .order_by('available_at', 'id')[:batch_size]
+        )
+        if not rows:
+            return 0
+        trip_ids = {row.trip_id for row in rows}
+        rows += TripOutboxMessage.objects.select_for_update(skip_locked=True).filter(
+            trip_id__in=trip_ids,
+        ).exclude(pk__in=[row.pk for row in rows])
+
+        # Rows of these trips we could not lock belong to another dispatcher
+        ours = {row.pk for row in rows}
+        held = defaultdict(list)
+        for trip_id, pk in TripOutboxMessage.objects.filter(trip_id__in=trip_ids).values_list('trip_id', 'pk'):
+            if pk not in ours:
+                held[trip_id].append(pk)
+
+        by_trip = defaultdict(list)
+        for row in rows:
+            by_trip[row.trip_id].append(row)
+        latest, done, superseded = {}, [], []
+        for trip_id, trip_rows in by_trip.items():
+            newest = max(trip_rows, key=lambda row: row.pk)
+            if any(pk > newest.pk for pk in held[trip_id]):
+                superseded += trip_rows
+            elif not held[trip_id]:
+                latest[trip_id] = newest
+                done += trip_rows
+        if superseded:
+            TripOutboxMessage.objects.filter(pk__in=[row.pk for row in superseded]).delete()
+        if not latest:
+            return len(rows)
+
+        try:
+            positions = current_positions(list(latest))
+            messages = {
+                trip_id: trip_update_message(
+                    trip_id, row.status, *positions.get(trip_id, (None, None)), timestamp=row.created_at,
+                )
+                for trip_id, row in latest.items()
+            }
+            async_to_sync(_publish)(
+                channel_layer or get_channel_layer(), list(messages.values()),
+                outbox_setting('PUBLISH_TIMEOUT_SECONDS', 5),
+            )
+            last_known_positions.update_many(messages)
+        except Exception as exc:
+            logger.exception('Trip outbox dispatch failed for %d message(s)', len(done))
+            # Only the newest row per trip is retried
+            newest = {row.pk for row in latest.values()}
+            TripOutboxMessage.objects.filter(pk__in=[row.pk for row in done if row.pk not in newest]).delete()
+            attempts = max(row.attempts for row in latest.values()) + 1
+            TripOutboxMessage.objects.filter(pk__in=newest).update(
+                attempts=F('attempts') + 1,
+                available_at=now + retry_delay(attempts),
+                last_error=f'{type(exc).__name__}: {exc}'[:1000],
+            )
+            return len(rows)
+
+        TripOutboxMessage.objects.filter(pk__in=[row.pk for row in done]).delete()
+    return len(rows)
@@ -0,0 +1,153 @@
+# backend/trips/pagination.py
+
+import json
+from base64 import b64decode, b64encode
+
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def encode_position(scheduled_start_time, trip_id):
+    """Packs a (scheduled_start_time, trip_id) keyset position into an opaque cursor."""
+    timestamp = scheduled_start_time.isoformat() if scheduled_start_time else None
+    return b64encode(json.dumps([timestamp, trip_id]).encode('ascii')).decode('ascii')
+
+
+def decode_position(cursor):
+    """Inverse of encode_position. Raises ValueError on a malformed cursor."""
+    try:
+        timestamp, trip_id = json.loads(b64decode(cursor.encode('ascii')).decode('ascii'))
+        scheduled_start_time = parse_datetime(timestamp) if timestamp is not None else None
+        if timestamp is not None and scheduled_start_time is None:
+            raise ValueError(timestamp)
+        return scheduled_start_time, int(trip_id)
+    except (TypeError, ValueError, UnicodeError) as exc:
+        raise ValueError('Invalid cursor') from exc
+
+
+def keyset_parts(queryset, position):
+    """
+    The (scheduled, unscheduled) querysets a page after `position` is read
+    from, in order; scheduled is None once the cursor is past those trips.
+
+    Trips are ordered by (-scheduled_start_time, -trip_id), with trips that
+    have no scheduled time last. Every query is a range read on
+    idx_trips_scheduled_date, so the cost depends on the page size only,
+    not on how deep the cursor is.
+    """
+    scheduled_start_time, trip_id = position or (None, None)
+
+    # 1. Trips with a scheduled time (skipped once the cursor is past them)
+    scheduled = None
+    if position is None or scheduled_start_time is not None:
+        scheduled = queryset.filter(scheduled_start_time__isnull=False)
+        if position is not None:
+            # The <= bound is the index range; the tie-break filters rows
+            # that share the cursor's timestamp.
+            scheduled = scheduled.filter(scheduled_start_time__lte=scheduled_start_time).exclude(
+                scheduled_start_time=scheduled_start_time, trip_id__gte=trip_id
+            )
+        scheduled = scheduled.order_by('-scheduled_start_time', '-trip_id')
+
+    # 2. Unscheduled trips, once the scheduled ones are exhausted
+    unscheduled = queryset.filter(scheduled_start_time__isnull=True)
+    if position is not None and scheduled_start_time is None:
+        unscheduled = unscheduled.filter(trip_id__lt=trip_id)
+    return scheduled, unscheduled.order_by('-trip_id')
+
+
+def keyset_page(queryset, position, page_size):
+    """Returns up to page_size + 1 trips after `position`, newest first (see keyset_parts)."""
+    limit = page_size + 1
+    scheduled, unscheduled = keyset_parts(queryset, position)
+    rows = list(scheduled[:limit]) if scheduled is not None else []
+    if len(rows) < limit:
+        rows += list(unscheduled[:limit - len(rows)])
+    return rows
+
+
+async def akeyset_page(queryset, position, page_size):
+    """keyset_page with the async ORM."""
+    limit = page_size + 1
+    scheduled, unscheduled = keyset_parts(queryset, position)
+    rows = [trip async for trip in scheduled[:limit]] if scheduled is not None else []
+    if len(rows) < limit:
+        rows += [trip async for trip in unscheduled[:limit - len(rows)]]
+    return rows
+
+
+class TripKeysetPagination(BasePagination):
+    """
+    Cursor (keyset) pagination on (scheduled_start_time, trip_id).
+
+    GET /api/trips/?page_size=50
+    GET /api/trips/?cursor=<next cursor from the previous page>
+    """
+    page_size = 50
+    max_page_size = 200
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def get_position(self, request):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        cursor = request.query_params.get(self.cursor_query_param)
+        try:
+            return decode_position(cursor) if cursor else None
+        except ValueError:
+            raise NotFound('Invalid cursor')
+
+    def page_rows(self, rows, page_size):
+        self.next_position = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            last = rows[-1]
+            self.next_position = (last.scheduled_start_time, last.trip_id)
+        return rows
+
+    def paginate_queryset(self, queryset, request, view=None):
+        position = self.get_position(request)
+        page_size = self.get_page_size(request)
+        return self.page_rows(keyset_page(queryset, position, page_size), page_size)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset for the async views (trips/async_views.py)."""
+        position = self.get_position(request)
+        page_size = self.get_page_size(request)
+        return self.page_rows(await akeyset_page(queryset, position, page_size), page_size)
+
+    def get_paginated_data(self, data):
+        return {
+            'next': self.get_next_link(),
+            'results': data,
+        }
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encode_position(*self.next_position)
+        )
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,174 @@
+# backend/trips/positions.py
+
+import math
+
+from django.core.cache import caches
+from django.db.models import OuterRef, Subquery
+
+from .models import Trip, TripPosition
+
+# Upper bound on points returned by a single track request
+TRACK_POINT_LIMIT = 20000
+
+
+def latest_position(trip_id):
+    """Most recent stored (lat, lng) of a trip, or None (idx_trip_positions_time)."""
+    return (
+        TripPosition.objects.filter(trip_id=trip_id)
+        .order_by('-recorded_at')
+        .values_list('lat', 'lng')
+        .first()
+    )
+
+
+def trip_track(trip_id, start=None, end=None, max_points=None):
+    """
+    Returns (points, total) for a trip's positions in [start, end], oldest
+    first, as compact [timestamp, lat, lng] rows.
+
+    When the range holds more than max_points positions, every n-th point is
+    kept (plus the final one) so the shape of the route survives. Rows are
+    streamed from the (trip, recorded_at) index, never loaded all at once.
+    """
+    positions = TripPosition.objects.filter(trip_id=trip_id)
+    if start is not None:
+        positions = positions.filter(recorded_at__gte=start)
+    if end is not None:
+        positions = positions.filter(recorded_at__lte=end)
+
+    max_points = min(max_points or TRACK_POINT_LIMIT, TRACK_POINT_LIMIT)
+    total = positions.count()
+    stride = max(1, math.ceil(total / max_points))
+
+    points = []
+    last = None
+    rows = positions.order_by('recorded_at').values_list('recorded_at', 'lat', 'lng')
+    for index, (recorded_at, lat, lng) in enumerate(rows.iterator(chunk_size=2000)):
+        last = [recorded_at.isoformat(), lat, lng]
+        if index % stride == 0:
+            points.append(last)
+
+    # Always end the track where the truck actually was last
+    if last is not None and points[-1] is not last:
+        if len(points) >= max_points:
+            points[-1] = last
+        else:
+            points.append(last)
+
+    return points, total
+
+
+# --- Last Known Positions ---
+
+class LastKnownPositions:
+    """
+    Latest 'trip_update' payload per trip, kept in process memory and mirrored
+    to the shared 'realtime' cache (Redis in deployments).
+
+    The ingestor records every accepted ping locally and pushes the window's
+    changes to the shared cache in one set_many; readers check the local map
+    first, so a consumer in the same process never waits on Redis or the DB.
+    """
+    TIMEOUT = 12 * 3600
+
+    def __init__(self, alias='realtime'):
+        self.alias = alias
+        self.local = {}
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @staticmethod
+    def key(trip_id):
+        return f'trips:lkp:{trip_id}'
+
+    def record(self, trip_id, message):
+        """Updates the in-process map only (called for every accepted ping)."""
+        self.local[str(trip_id)] = message
+
+    def publish(self, messages):
+        """Mirrors {trip_id: message} to the shared cache in one round-trip."""
+        if messages:
+            self.cache.set_many(
+                {self.key(trip_id): message for trip_id, message in messages.items()},
+                self.TIMEOUT,
+            )
+
+    async def apublish(self, messages):
+        if messages:
+            await self.cache.aset_many(
+                {self.key(trip_id): message for trip_id, message in messages.items()},
+                self.TIMEOUT,
+            )
+
+    def update(self, trip_id, message):
+        """
+        Replaces a trip's entry from outside the ingestor (e.g. set_status).
+        The local map is only touched if this process already tracks the trip.
+        """
+        if str(trip_id) in self.local:
+            self.local[str(trip_id)] = message
+        self.cache.set(self.key(trip_id), message, self.TIMEOUT)
+
+    def update_many(self, messages):
+        """Bulk version of update() for {trip_id: message}."""
+        for trip_id, message in messages.items():
+            if str(trip_id) in self.local:
+                self.local[str(trip_id)] = message
+        self.publish(messages)
+
+    def get(self, trip_id):
+        message = self.local.get(str(trip_id))
+        if message is None:
+            message = self.cache.get(self.key(trip_id))
+        return message
+
+    def get_many(self, trip_ids):
+        """{trip_id: message} for the trips that have an entry, one cache round-trip."""
+        found = {trip_id: self.local[str(trip_id)] for trip_id in trip_ids if str(trip_id) in self.local}
+        missing = {self.key(trip_id): trip_id for trip_id in trip_ids if trip_id not in found}
+        if missing:
+            for key, message in self.cache.get_many(list(missing)).items():
+                found[missing[key]] = message
+        return found
+
+    async def aget(self, trip_id):
+        message = self.local.get(str(trip_id))
+        if message is None:
+            message = await self.cache.aget(self.key(trip_id))
+        return message
+
+
+last_known_positions = LastKnownPositions()
+
+
+def current_position(trip_id):
+    """
+    (lat, lng) of a trip from the last-known-position map, falling back to
+    the stored history when the cache has nothing (e.g. after a restart).
+    """
+    message = last_known_positions.get(trip_id)
+    if message is not None:
+        return message['lat'], message['lng']
+    return latest_position(trip_id)
+
+
+def current_positions(trip_ids):
+    """
+    Batch version of current_position(): {trip_id: (lat, lng)} for every trip
+    with a known position, using one cache read and at most one query.
+    """
+    positions = {
+        trip_id: (message['lat'], message['lng'])
+        for trip_id, message in last_known_positions.get_many(trip_ids).items()
+    }
+    missing = [trip_id for trip_id in trip_ids if trip_id not in positions]
+    if missing:
+        latest = TripPosition.objects.filter(trip_id=OuterRef('pk')).order_by('-recorded_at')
+        rows = Trip.objects.filter(pk__in=missing).annotate(
+            lat=Subquery(latest.values('lat')[:1]),
+            lng=Subquery(latest.values('lng')[:1]),
+        ).filter(lat__isnull=False).values_list('pk', 'lat', 'lng')
+        positions.update({trip_id: (lat, lng) for trip_id, lat, lng in rows})
+    return positions
@@ -0,0 +1,66 @@
+# backend/trips/realtime.py
+
+import asyncio
+
+from django.utils import timezone
+
+# Shared naming and payload helpers for everything that pushes trip updates
+# over the channel layer (REST views, consumers, the location ingestor).
+
+
+def trip_group_name(trip_id):
+    """The channel layer group a trip's subscribers join (see TripConsumer)."""
+    return f'trip_{trip_id}'
+
+
+def trip_update_message(trip_id, status, lat, lng, timestamp=None):
+    """Builds a 'trip_update' event, handled by TripConsumer.trip_update."""
+    return {
+        'type': 'trip_update', # This must match the consumer method name
+        'trip_id': trip_id,
+        'status': status,
+        'lat': lat,
+        'lng': lng,
+        'timestamp': (timestamp or timezone.now()).isoformat(),
+    }
+
+
+# --- Fleet-wide live map channel (see FleetConsumer) ---
+
+FLEET_GROUP = 'fleet'
+
+# Column order of each fleet delta row
+FLEET_FIELDS = ('trip_id', 'lat', 'lng', 'status', 'timestamp')
+
+
+def fleet_delta(message):
+    """Compacts a 'trip_update' message into a fleet delta row."""
+    row = [message[field] for field in FLEET_FIELDS]
+    # Consumers see trip ids from the URL as strings; the fleet map uses ints
+    if isinstance(row[0], str) and row[0].isdigit():
+        row[0] = int(row[0])
+    return row
+
+
+def fleet_update_message(messages, snapshot=False):
+    """Builds one 'fleet_update' event carrying many trips' updates."""
+    return {
+        'type': 'fleet_update', # Handled by FleetConsumer.fleet_update
+        'snapshot': snapshot,
+        'fields': FLEET_FIELDS,
+        'deltas': [fleet_delta(message) for message in messages],
+    }
+
+
+async def publish_trip_updates(channel_layer, messages):
+    """
+    Sends each 'trip_update' to its trip group, plus a single batched
+    'fleet_update' with all of them for the live map.
+    """
+    if not messages:
+        return
+    await asyncio.gather(*(
+        channel_layer.group_send(trip_group_name(message['trip_id']), message)
+        for message in messages
+    ))
+    await channel_layer.group_send(FLEET_GROUP, fleet_update_message(messages))
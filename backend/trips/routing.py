@@ -7,4 +7,6 @@ from . import consumers
 websocket_urlpatterns = [
     # Maps ws://<host>/ws/trips/{trip_id}/ to TripConsumer
     re_path(r'ws/trips/(?P<trip_id>\w+)/$', consumers.TripConsumer.as_asgi()),
+    # Maps ws://<host>/ws/fleet/ to FleetConsumer (live map of all trips)
+    re_path(r'ws/fleet/$', consumers.FleetConsumer.as_asgi()),
 ]
\ No newline at end of file
@@ -0,0 +1,276 @@
+# backend/trips/scheduling.py
+
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ParseError
+
+from trucks.models import Truck, TruckStatus
+from .models import Trip, ACTIVE_STATUSES
+
+User = get_user_model()
+
+
+class SchedulingConflict(Exception):
+    """Raised when a driver or truck is already booked for an overlapping window."""
+
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def parse_time_bounds(query_params, *names, required=False):
+    """
+    Parses ISO timestamps from a request's query string into aware
+    datetimes, e.g. parse_time_bounds(request.query_params, 'start', 'end').
+    Raises ParseError (400) for missing required or malformed values.
+    """
+    bounds = {}
+    for name in names:
+        value = query_params.get(name)
+        if not value:
+            if required:
+                raise ParseError(f'{name} is required.')
+            continue
+        bounds[name] = parse_datetime(value)
+        if bounds[name] is None:
+            raise ParseError(f'Invalid {name} timestamp.')
+        if timezone.is_naive(bounds[name]):
+            bounds[name] = timezone.make_aware(bounds[name])
+    return bounds
+
+
+def active_windows(queryset=None):
+    """
+    Active trips annotated with their booking window.
+
+    A trip occupies its driver and truck from scheduled_start_time until
+    actual_end_time (or scheduled_end_time while it has not finished). A
+    missing end keeps the window open; a missing start is treated as
+    already begun.
+    """
+    queryset = Trip.objects.all() if queryset is None else queryset
+    return queryset.filter(status__in=ACTIVE_STATUSES).annotate(
+        window_end=Coalesce('actual_end_time', 'scheduled_end_time'),
+    )
+
+
+def overlapping(queryset, start, end):
+    """Active trips in `queryset` whose window intersects [start, end). None bounds are open."""
+    trips = active_windows(queryset)
+    if end is not None:
+        trips = trips.filter(Q(scheduled_start_time__lt=end) | Q(scheduled_start_time__isnull=True))
+    if start is not None:
+        trips = trips.filter(Q(window_end__gt=start) | Q(window_end__isnull=True))
+    return trips
+
+
+def find_conflicts(start, end, driver=None, truck=None, exclude_trip_id=None):
+    """
+    Returns {'assigned_driver': msg, 'truck': msg} for every resource that is
+    already booked in [start, end). Both checks run as one query.
+    """
+    resources = Q()
+    if driver is not None:
+        resources |= Q(assigned_driver=driver)
+    if truck is not None:
+        resources |= Q(truck=truck)
+    if not resources:
+        return {}
+
+    trips = overlapping(Trip.objects.filter(resources), start, end)
+    if exclude_trip_id is not None:
+        trips = trips.exclude(pk=exclude_trip_id)
+
+    errors = {}
+    for driver_id, truck_id in trips.values_list('assigned_driver_id', 'truck_id'):
+        if driver is not None and driver_id == driver.pk:
+            errors['assigned_driver'] = 'Assigned driver is already booked on another active trip in this time window.'
+        if truck is not None and truck_id == truck.pk:
+            errors['truck'] = 'Assigned truck is already booked on another active trip in this time window.'
+    return errors
+
+
+def _windows_overlap(start_a, end_a, start_b, end_b):
+    # None bounds are open, as in overlapping()
+    return (end_b is None or start_a is None or start_a < end_b) and (
+        end_a is None or start_b is None or end_a > start_b
+    )
+
+
+def find_batch_conflicts(bookings, exclude_trip_ids=()):
+    """
+    Set-based find_conflicts() for a batch of new trips.
+
+    `bookings` is a list of dicts with scheduled_start_time,
+    scheduled_end_time, assigned_driver and truck. Existing bookings of all
+    the batch's drivers and trucks are read with one query, then every item
+    is checked against them and against the items before it. Returns
+    {index: errors} for the conflicting items. exclude_trip_ids leaves out
+    existing trips that the batch is re-booking.
+    """
+    driver_ids = {item['assigned_driver'].pk for item in bookings if item.get('assigned_driver')}
+    truck_ids = {item['truck'].pk for item in bookings if item.get('truck')}
+    if not bookings or not (driver_ids or truck_ids):
+        return {}
+
+    starts = [item.get('scheduled_start_time') for item in bookings]
+    ends = [item.get('scheduled_end_time') for item in bookings]
+    span_start = None if None in starts else min(starts)
+    span_end = None if None in ends else max(ends)
+
+    booked = {'assigned_driver': defaultdict(list), 'truck': defaultdict(list)}
+    existing = overlapping(
+        Trip.objects.filter(Q(assigned_driver__in=driver_ids) | Q(truck__in=truck_ids)), span_start, span_end
+    ).exclude(pk__in=exclude_trip_ids).values_list('assigned_driver_id', 'truck_id', 'scheduled_start_time', 'window_end')
+    for driver_id, truck_id, start, end in existing:
+        booked['assigned_driver'][driver_id].append((start, end))
+        booked['truck'][truck_id].append((start, end))
+
+    errors = {}
+    for index, item in enumerate(bookings):
+        start, end = item.get('scheduled_start_time'), item.get('scheduled_end_time')
+        for field, resource in (('assigned_driver', 'driver'), ('truck', 'truck')):
+            obj = item.get(field)
+            if obj is None:
+                continue
+            windows = booked[field][obj.pk]
+            if any(_windows_overlap(start, end, other_start, other_end) for other_start, other_end in windows):
+                errors.setdefault(index, {})[field] = (
+                    f'Assigned {resource} is already booked on another active trip in this time window.'
+                )
+            # Later items in the batch must not overlap this one either
+            windows.append((start, end))
+    return errors
+
+
+def lock_resources(driver=None, truck=None):
+    """
+    Takes row locks on the truck and driver for the rest of the transaction.
+
+    Concurrent bookings of the same driver or truck queue up here, so the
+    overlap check that follows sees every trip committed before it. Locks
+    are always taken trucks first, then drivers, in primary key order to
+    avoid deadlocks.
+    """
+    lock_many(
+        driver_ids=[driver.pk] if driver is not None else (),
+        truck_ids=[truck.pk] if truck is not None else (),
+    )
+
+
+def lock_many(driver_ids=(), truck_ids=()):
+    """lock_resources() for a batch of drivers and trucks, one query per table."""
+    if truck_ids:
+        list(Truck.objects.select_for_update().filter(pk__in=truck_ids).order_by('pk').values_list('pk', flat=True))
+    if driver_ids:
+        list(User.objects.select_for_update().filter(pk__in=driver_ids).order_by('pk').values_list('pk', flat=True))
+
+
+def book(save, start, end, driver=None, truck=None, exclude_trip_id=None):
+    """
+    Runs `save()` only if the driver and truck are free in [start, end).
+
+    The check and the write happen in one transaction under the resource
+    locks, so two dispatchers cannot both pass the check for the same slot.
+    Raises SchedulingConflict otherwise.
+    """
+    with transaction.atomic():
+        lock_resources(driver=driver, truck=truck)
+        errors = find_conflicts(start, end, driver=driver, truck=truck, exclude_trip_id=exclude_trip_id)
+        if errors:
+            raise SchedulingConflict(errors)
+        return save()
+
+
+def book_many(save, bookings):
+    """
+    book() for a batch: one lock query per table and one conflict query for
+    the whole batch. SchedulingConflict.errors is {index: errors}.
+    """
+    with transaction.atomic():
+        lock_many(
+            driver_ids={item['assigned_driver'].pk for item in bookings if item.get('assigned_driver')},
+            truck_ids={item['truck'].pk for item in bookings if item.get('truck')},
+        )
+        errors = find_batch_conflicts(bookings)
+        if errors:
+            raise SchedulingConflict(errors)
+        return save()
+
+
+def lock_for_reactivation(trip_ids, new_statuses):
+    """
+    Locks the drivers and trucks of the trips in trip_ids that a status
+    change would move from an inactive status (Completed, Canceled...) back
+    to ACTIVE_STATUSES. new_statuses is {trip_id: status}. Call it before
+    locking the trips themselves: resources first, as book() does.
+    """
+    trip_ids = [trip_id for trip_id in trip_ids if new_statuses[trip_id] in ACTIVE_STATUSES]
+    if not trip_ids:
+        return
+    rows = list(
+        Trip.objects.filter(pk__in=trip_ids).exclude(status__in=ACTIVE_STATUSES)
+        .values_list('assigned_driver_id', 'truck_id')
+    )
+    lock_many(
+        driver_ids={driver_id for driver_id, _ in rows if driver_id},
+        truck_ids={truck_id for _, truck_id in rows if truck_id},
+    )
+
+
+def check_reactivations(trips, new_statuses):
+    """
+    Raises SchedulingConflict({trip_id: errors}) if a trip moving back to
+    an active status would overlap an active booking of its driver or
+    truck, including other trips of the same batch. trips are the locked
+    rows (with truck and assigned_driver loaded) before the change.
+    """
+    reactivated = [
+        trip for trip in trips
+        if new_statuses[trip.trip_id] in ACTIVE_STATUSES and trip.status not in ACTIVE_STATUSES
+    ]
+    if not reactivated:
+        return
+    # Trips of the batch leaving the active statuses free their slots
+    released = [trip.trip_id for trip in trips if new_statuses[trip.trip_id] not in ACTIVE_STATUSES]
+    errors = find_batch_conflicts(
+        [
+            {
+                'scheduled_start_time': trip.scheduled_start_time,
+                # The window active_windows() will give the trip again
+                'scheduled_end_time': trip.actual_end_time or trip.scheduled_end_time,
+                'assigned_driver': trip.assigned_driver,
+                'truck': trip.truck,
+            }
+            for trip in reactivated
+        ],
+        exclude_trip_ids=[trip.trip_id for trip in reactivated] + released,
+    )
+    if errors:
+        raise SchedulingConflict({reactivated[index].trip_id: item for index, item in errors.items()})
+
+
+def free_drivers(start, end):
+    """Drivers with no active trip overlapping [start, end), in one query."""
+    busy = overlapping(Trip.objects.filter(assigned_driver=OuterRef('pk')), start, end)
+    return User.objects.filter(role='driver', is_active=True).exclude(Exists(busy))
+
+
+def free_trucks(start, end, min_capacity=None):
+    """
+    Trucks outside maintenance with no active trip overlapping [start, end),
+    optionally able to carry min_capacity, in one query. The truck filter is
+    a range read on idx_trucks_status_capacity; the NOT EXISTS probes
+    idx_trips_truck_active per candidate instead of scanning trips.
+    """
+    trucks = Truck.objects.filter(status__in=[TruckStatus.AVAILABLE, TruckStatus.IN_USE])
+    if min_capacity is not None:
+        trucks = trucks.filter(tonner_capacity__gte=min_capacity)
+    busy = overlapping(Trip.objects.filter(truck=OuterRef('pk')), start, end)
+    return trucks.exclude(Exists(busy))
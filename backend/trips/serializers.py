@@ -1,21 +1,117 @@
 # trips/serializers.py
 
 from rest_framework import serializers
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.db.models import Q 
-from .models import Trip
+from .models import Trip, TripEvent, TripFuel, TripMetrics, ACTIVE_STATUSES, MILESTONE_EVENTS, SETTABLE_STATUSES
+from .scheduling import SchedulingConflict, book, book_many, find_conflicts
+from .signals import trips_bulk_changed
+from .eta import apply_routes
 # Ensure this import matches your file structure:
 from trucks.models import Truck, TruckStatus 
 from django.contrib.auth import get_user_model
 
 User = get_user_model() 
 
+class PrefetchedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField that resolves ids from objects loaded up front.
+
+    When the serializer context has 'related_objects' ({model: {pk: obj}},
+    see TripListSerializer.related_objects), lookups are dictionary hits
+    instead of one query per field per item.
+    """
+
+    def to_internal_value(self, data):
+        model = self.get_queryset().model
+        loaded = self.context.get('related_objects', {}).get(model)
+        if loaded is None:
+            return super().to_internal_value(data)
+
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            pk = model._meta.pk.to_python(data)
+        except DjangoValidationError:
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if pk not in loaded:
+            self.fail('does_not_exist', pk_value=data)
+        return loaded[pk]
+
+class TripListSerializer(serializers.ListSerializer):
+    """
+    Bulk creation for POST /api/trips/bulk/.
+
+    Items are validated one by one (errors are reported per index) without
+    per-item queries; scheduling conflicts for the whole batch are checked
+    with one query under row locks, and all trips go in with one bulk_create.
+    """
+
+    @staticmethod
+    def related_objects(data):
+        """Loads every truck and driver referenced by a batch, one query per table."""
+        ids = {'truck': set(), 'assigned_driver': set()}
+        for item in data if isinstance(data, list) else ():
+            for name, values in ids.items():
+                value = item.get(name) if isinstance(item, dict) else None
+                if isinstance(value, str) and value.isdigit():
+                    value = int(value)
+                if isinstance(value, int) and not isinstance(value, bool):
+                    values.add(value)
+        return {
+            Truck: Truck.objects.in_bulk(ids['truck']),
+            User: User.objects.in_bulk(ids['assigned_driver']),
+        }
+
+    def create(self, validated_data):
+        # Resolve endpoints and distances for the whole batch at once
+        apply_routes(validated_data)
+
+        def insert():
+            trips = Trip.objects.bulk_create(
+                [Trip(**dict(item, status='Scheduled')) for item in validated_data],
+                batch_size=500,
+            )
+            # bulk_create skips post_save, so tell the rollups directly
+            trips_bulk_changed.send(sender=Trip, changes=[(None, trip.tracked_state()) for trip in trips])
+            return trips
+
+        try:
+            return book_many(insert, validated_data)
+        except SchedulingConflict as exc:
+            raise serializers.ValidationError(exc.errors)
+
 class TripSerializer(serializers.ModelSerializer):
+    serializer_related_field = PrefetchedPrimaryKeyRelatedField
+
     class Meta:
         model = Trip
         fields = '__all__'
-        read_only_fields = ('trip_code', 'created_at', 'status') # 'status' is set to 'Scheduled' on creation
+        read_only_fields = ('trip_code', 'created_at', 'status', 'version', 'updated_at') # 'status' is set to 'Scheduled' on creation
+        list_serializer_class = TripListSerializer
+
+    # Serializer fields read through a relation: name -> (relation, related column).
+    # TripViewSet uses this to build a matching select_related()/only() queryset.
+    related_sources = {}
+
+    def __init__(self, *args, **kwargs):
+        # Sparse fieldsets: TripViewSet passes the ?fields= selection here
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+
+        if fields:
+            for field_name in set(self.fields) - set(fields):
+                self.fields.pop(field_name)
     
+    # Changing any of these on an existing trip re-runs the conflict check
+    SCHEDULING_FIELDS = ('truck', 'assigned_driver', 'scheduled_start_time', 'scheduled_end_time')
+
     def validate(self, data):
+        start = data.get('scheduled_start_time', getattr(self.instance, 'scheduled_start_time', None))
+        end = data.get('scheduled_end_time', getattr(self.instance, 'scheduled_end_time', None))
+        if start and end and end <= start:
+            raise serializers.ValidationError({"scheduled_end_time": "Scheduled end must be after the scheduled start."})
+
         # Only perform these checks on creation (POST) if self.instance is None
         if self.instance is None: 
             
@@ -46,41 +142,136 @@ class TripSerializer(serializers.ModelSerializer):
                     f"Assigned truck {truck.license_plate} is under maintenance and cannot be used."
                 )
 
-            # --- Check 3: Driver Availability Check ---
-            # Statuses indicating an active or scheduled assignment
-            active_statuses = ['Scheduled', 'In Transit'] 
-            
-            # Check for any existing trip that conflicts (is not Completed/Cancelled)
-            conflicting_trip_exists = Trip.objects.filter(
-                assigned_driver=driver,
-                status__in=active_statuses
-            ).exists()
-
-            if conflicting_trip_exists:
-                raise serializers.ValidationError(
-                    "Assigned driver is currently scheduled for or driving another active trip."
-                )
+            # --- Check 3: Driver/Truck Availability Check ---
+            # Any active trip whose window overlaps this one (served by the
+            # partial indexes idx_trips_driver_active / idx_trips_truck_active).
+            # This is an early answer for the client; create() repeats the
+            # check under row locks before inserting. Bulk items are checked
+            # together by TripListSerializer instead.
+            if not isinstance(self.parent, serializers.ListSerializer):
+                conflicts = find_conflicts(start, end, driver=driver, truck=truck)
+                if conflicts:
+                    raise serializers.ValidationError(conflicts)
                 
         return data
+
+    def book(self, save, validated_data, instance=None):
+        """Runs save() inside trips.scheduling.book, mapping conflicts to a 400."""
+        def value(name):
+            return validated_data.get(name, getattr(instance, name, None))
+
+        try:
+            return book(
+                save,
+                value('scheduled_start_time'),
+                value('scheduled_end_time'),
+                driver=value('assigned_driver'),
+                truck=value('truck'),
+                exclude_trip_id=instance.pk if instance else None,
+            )
+        except SchedulingConflict as exc:
+            raise serializers.ValidationError(exc.errors)
     
     def create(self, validated_data):
         # Ensure status is set to 'Scheduled' upon creation
         validated_data['status'] = 'Scheduled'
-        return super().create(validated_data)
+        apply_routes([validated_data])
+        return self.book(lambda: super(TripSerializer, self).create(validated_data), validated_data)
+
+    def update(self, instance, validated_data):
+        if 'start_location' in validated_data or 'end_location' in validated_data:
+            # Endpoints changed: re-resolve them unless the client sent the results
+            route = {
+                'start_location': validated_data.get('start_location', instance.start_location),
+                'end_location': validated_data.get('end_location', instance.end_location),
+            }
+            route.update({
+                name: validated_data[name]
+                for name in ('origin_location', 'destination_location', 'distance_km') if name in validated_data
+            })
+            apply_routes([route])
+            validated_data.update(route)
+        save = lambda: super(TripSerializer, self).update(instance, validated_data)
+        # Finished or canceled trips no longer hold their driver/truck
+        if instance.status in ACTIVE_STATUSES and any(name in validated_data for name in self.SCHEDULING_FIELDS):
+            return self.book(save, validated_data, instance=instance)
+        return save()
 
 class TripDetailSerializer(TripSerializer):
     # Use a detail serializer to display human-readable foreign key data.
     truck_license_plate = serializers.ReadOnlyField(source='truck.license_plate')
     driver_email = serializers.ReadOnlyField(source='assigned_driver.email')
 
+    related_sources = {
+        'truck_license_plate': ('truck', 'truck__license_plate'),
+        'driver_email': ('assigned_driver', 'assigned_driver__email'),
+    }
+
     class Meta(TripSerializer.Meta):
         # Explicitly list all fields for detail view
         fields = [
             'trip_id', 'trip_code', 'net_weight', 'created_at', 
             'truck', 'assigned_driver', 
             'start_location', 'end_location', 
-            'scheduled_start_time', 'actual_start_time', 'status', 
+            'scheduled_start_time', 'scheduled_end_time', 'actual_start_time', 'status', 
             'estimated_fuel_cost', 'distance_km',
+            'origin_location', 'destination_location',
             'truck_license_plate', 'driver_email', 
+            'version', 'updated_at',
         ]
-        read_only_fields = TripSerializer.Meta.read_only_fields + ('status',)
\ No newline at end of file
+        read_only_fields = TripSerializer.Meta.read_only_fields + ('status',)
+
+class TripStatusUpdateSerializer(serializers.Serializer):
+    """One item of PATCH /api/trips/bulk-status/."""
+    trip_id = serializers.IntegerField()
+    status = serializers.ChoiceField(choices=SETTABLE_STATUSES)
+
+
+class TripAssignmentSerializer(serializers.Serializer):
+    """One truck/driver assignment of an optimizer plan."""
+    trip_id = serializers.IntegerField()
+    truck = serializers.IntegerField()
+    assigned_driver = serializers.IntegerField()
+
+
+class TripOptimizeSerializer(serializers.Serializer):
+    """Request body of POST /api/trips/optimize/."""
+    trip_ids = serializers.ListField(child=serializers.IntegerField(), required=False, max_length=5000)
+    date = serializers.DateField(required=False)
+    time_budget = serializers.FloatField(required=False, min_value=0.1, max_value=60)
+    commit = serializers.BooleanField(default=False)
+    # A previewed plan to apply as-is (requires commit)
+    assignments = TripAssignmentSerializer(many=True, required=False)
+
+    def validate(self, data):
+        if 'assignments' in data and not data['commit']:
+            raise serializers.ValidationError({"assignments": "Assignments can only be sent with commit=true."})
+        return data
+
+
+class TripFuelSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = TripFuel
+        fields = ('fuel_id', 'trip', 'fuel_ref_no', 'liters', 'total_amount', 'encoder', 'created_at')
+        read_only_fields = ('fuel_id', 'trip', 'encoder', 'created_at')
+
+    def validate(self, data):
+        if data['liters'] <= 0 or data['total_amount'] < 0:
+            raise serializers.ValidationError("Liters must be positive and the amount non-negative.")
+        return data
+
+
+class TripEventSerializer(serializers.ModelSerializer):
+    """Milestones reported through POST /api/trips/{id}/events/; status changes are written by the status endpoints."""
+    event_type = serializers.ChoiceField(choices=MILESTONE_EVENTS)
+
+    class Meta:
+        model = TripEvent
+        fields = ('id', 'trip', 'event_type', 'event_timestamp', 'status', 'document_no', 'encoder')
+        read_only_fields = ('id', 'trip', 'status', 'encoder')
+
+
+class TripMetricsSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = TripMetrics
+        fields = '__all__'
@@ -0,0 +1,75 @@
+# backend/trips/signals.py
+
+from django.contrib.auth import get_user_model
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from trucks.models import Truck
+from .conditional import trips_changed
+from .models import Trip
+
+User = get_user_model()
+
+# Sent after bulk writes that bypass Model.save()/post_save (bulk_create,
+# bulk_update), so listeners such as the analytics rollups stay in sync.
+# Arguments: changes -- list of (old_state, new_state) Trip.tracked_state()
+# snapshots, old_state None for inserted trips.
+trips_bulk_changed = Signal()
+
+
+# --- 1. Trip list ETag (see trips.conditional) ---
+
+@receiver(post_save, sender=Trip)
+@receiver(post_delete, sender=Trip)
+def trip_written(sender, **kwargs):
+    trips_changed()
+
+
+@receiver(trips_bulk_changed)
+def trips_bulk_written(sender, **kwargs):
+    trips_changed()
+
+
+# --- 2. Related rows rendered with trips ---
+# TripDetailSerializer shows the truck's plate and the driver's email, so
+# changing those (or deleting the row, which SET_NULLs the trips without
+# save()) bumps the affected trips' version/updated_at like a trip write.
+
+# model -> (rendered field, Trip relation)
+RENDERED_RELATIONS = {
+    Truck: ('license_plate', 'truck'),
+    User: ('email', 'assigned_driver'),
+}
+
+
+def touch_trips(**filters):
+    """Bumps the change stamp of every trip matching filters, in one UPDATE."""
+    if Trip.objects.filter(**filters).update(version=F('version') + 1, updated_at=timezone.now()):
+        trips_changed()
+
+
+@receiver(pre_save, sender=Truck)
+@receiver(pre_save, sender=User)
+def note_rendered_change(sender, instance, update_fields=None, **kwargs):
+    field, _ = RENDERED_RELATIONS[sender]
+    instance._trips_render_changed = False
+    # Inserts have no trips yet; e.g. logins only save last_login
+    if instance._state.adding or (update_fields is not None and field not in update_fields):
+        return
+    old = sender.objects.filter(pk=instance.pk).values_list(field, flat=True).first()
+    instance._trips_render_changed = old != getattr(instance, field)
+
+
+@receiver(post_save, sender=Truck)
+@receiver(post_save, sender=User)
+def touch_trips_rendering(sender, instance, **kwargs):
+    if getattr(instance, '_trips_render_changed', False):
+        touch_trips(**{RENDERED_RELATIONS[sender][1]: instance})
+
+
+@receiver(pre_delete, sender=Truck)
+@receiver(pre_delete, sender=User)
+def touch_trips_before_set_null(sender, instance, **kwargs):
+    touch_trips(**{RENDERED_RELATIONS[sender][1]: instance})
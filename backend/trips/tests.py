@@ -1,3 +1,1051 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.models import Group
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import FMSUser
+from analytics.models import DailyTripStat, HourlyTripStat, TripStatusCount
+from locations.models import Location
+from trucks.models import Truck
+from trips.consumers import FleetConsumer
+from trips.management.commands.benchmark_realtime import delete_seeded_trips, seed_trips
+from trips.ingestion import LocationIngestor
+from trips.models import Trip, TripEvent, TripOutboxMessage, TripPosition
+from trips.outbox import dispatch_batch, enqueue_trip_updates
+from trips.positions import current_position, current_positions, last_known_positions
+from trips.realtime import FLEET_GROUP, fleet_update_message, trip_group_name, trip_update_message
+
+
+class TripQueryCountTests(TestCase):
+    """Guards against N+1 queries when trips are rendered with related data."""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def create_trips(self, count):
+        now = timezone.now()
+        start = Trip.objects.count()
+        for i in range(start, start + count):
+            truck = Truck.objects.create(license_plate=f'QC-{i:03d}', tonner_capacity=10)
+            driver = FMSUser.objects.create(email=f'driver{i}@fms.test', role='driver')
+            Trip.objects.create(
+                truck=truck,
+                assigned_driver=driver,
+                start_location='Origin',
+                end_location='Destination',
+                scheduled_start_time=now - timedelta(hours=i),
+            )
+
+    def assert_list_queries(self, url, expected_rows):
+        # One page read for scheduled trips and one for the (empty)
+        # unscheduled tail; the list ETag comes from the cache
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), expected_rows)
+        return response
+
+    def test_detail_list_query_count_is_independent_of_row_count(self):
+        self.create_trips(1)
+        self.assert_list_queries('/api/trips/?view=detail', 1)
+
+        self.create_trips(15)
+        response = self.assert_list_queries('/api/trips/?view=detail', 16)
+        self.assertTrue(all(row['truck_license_plate'] for row in response.data['results']))
+        self.assertTrue(all(row['driver_email'] for row in response.data['results']))
+
+    def test_detail_list_with_sparse_fields(self):
+        self.create_trips(10)
+        response = self.assert_list_queries('/api/trips/?view=detail&fields=trip_id,driver_email', 10)
+        self.assertEqual(set(response.data['results'][0]), {'trip_id', 'driver_email'})
+
+    def test_retrieve_uses_a_single_query(self):
+        self.create_trips(1)
+        trip = Trip.objects.get()
+
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/trips/{trip.trip_id}/')
+        self.assertEqual(response.data['truck_license_plate'], 'QC-000')
+
+
+class TripSchedulingConflictTests(TestCase):
+    """Driver/truck double-booking is rejected for overlapping windows only."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.truck = Truck.objects.create(license_plate='SC-001', tonner_capacity=10)
+        self.driver = FMSUser.objects.create(email='sched@fms.test', role='driver')
+        self.start = timezone.now().replace(microsecond=0) + timedelta(days=1)
+
+    def post_trip(self, start, end, truck=None, driver=None):
+        return self.client.post('/api/trips/', {
+            'truck': (truck or self.truck).pk,
+            'assigned_driver': (driver or self.driver).pk,
+            'net_weight': '5.00',
+            'start_location': 'Origin',
+            'end_location': 'Destination',
+            'scheduled_start_time': start.isoformat(),
+            'scheduled_end_time': end.isoformat() if end else None,
+        }, format='json')
+
+    def test_overlapping_windows_are_rejected_per_driver_and_truck(self):
+        self.assertEqual(self.post_trip(self.start, self.start + timedelta(hours=4)).status_code, 201)
+
+        response = self.post_trip(self.start + timedelta(hours=2), self.start + timedelta(hours=6))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data), {'assigned_driver', 'truck'})
+
+        other_truck = Truck.objects.create(license_plate='SC-002', tonner_capacity=10)
+        response = self.post_trip(self.start + timedelta(hours=2), self.start + timedelta(hours=6), truck=other_truck)
+        self.assertEqual(set(response.data), {'assigned_driver'})
+
+    def test_back_to_back_windows_are_allowed(self):
+        self.assertEqual(self.post_trip(self.start, self.start + timedelta(hours=4)).status_code, 201)
+        response = self.post_trip(self.start + timedelta(hours=4), self.start + timedelta(hours=8))
+        self.assertEqual(response.status_code, 201)
+
+    def test_open_ended_trip_blocks_later_windows(self):
+        self.assertEqual(self.post_trip(self.start, None).status_code, 201)
+        response = self.post_trip(self.start + timedelta(days=3), self.start + timedelta(days=3, hours=1))
+        self.assertEqual(response.status_code, 400)
+
+    def test_free_resources_between_two_times(self):
+        from trips.scheduling import free_drivers, free_trucks
+
+        self.post_trip(self.start, self.start + timedelta(hours=4))
+        idle_driver = FMSUser.objects.create(email='idle@fms.test', role='driver')
+
+        with self.assertNumQueries(1):
+            drivers = list(free_drivers(self.start + timedelta(hours=1), self.start + timedelta(hours=2)))
+        self.assertEqual(drivers, [idle_driver])
+        self.assertIn(self.driver, free_drivers(self.start + timedelta(hours=4), self.start + timedelta(hours=5)))
+        self.assertFalse(free_trucks(self.start, self.start + timedelta(hours=1)).exists())
+
+    def canceled_trip_with_replacement(self):
+        self.post_trip(self.start, self.start + timedelta(hours=4))
+        canceled = Trip.objects.get()
+        canceled.status = 'Canceled'
+        canceled.save()
+        # Its slot was booked again while it was canceled
+        other_truck = Truck.objects.create(license_plate='SC-002', tonner_capacity=10)
+        self.assertEqual(self.post_trip(self.start, self.start + timedelta(hours=4), truck=other_truck).status_code, 201)
+        return canceled, Trip.objects.exclude(pk=canceled.pk).get()
+
+    def test_reactivating_a_trip_rechecks_its_bookings(self):
+        admin = FMSUser.objects.create(email='admin@fms.test')
+        admin.groups.add(Group.objects.create(name='SuperAdmin'))
+        self.client.force_authenticate(admin)
+        canceled, replacement = self.canceled_trip_with_replacement()
+        url = f'/api/trips/{canceled.pk}/status/'
+
+        response = self.client.patch(url, {'status': 'Scheduled'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data), {'assigned_driver'})
+        canceled.refresh_from_db()
+        self.assertEqual(canceled.status, 'Canceled')
+
+        # Without the overlap it goes through
+        replacement.status = 'Completed'
+        replacement.actual_end_time = self.start
+        replacement.save()
+        self.assertEqual(self.client.patch(url, {'status': 'In Transit'}, format='json').status_code, 200)
+
+    def test_bulk_reactivation_rechecks_its_bookings(self):
+        admin = FMSUser.objects.create(email='admin@fms.test')
+        admin.groups.add(Group.objects.create(name='SuperAdmin'))
+        self.client.force_authenticate(admin)
+        canceled, replacement = self.canceled_trip_with_replacement()
+
+        response = self.client.patch('/api/trips/bulk-status/', [
+            {'trip_id': replacement.pk, 'status': 'In Transit'},
+            {'trip_id': canceled.pk, 'status': 'Scheduled'},
+        ], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data), {1})
+        self.assertEqual(set(response.data[1]), {'assigned_driver'})
+
+        # Freeing the slot in the same batch lets the trip back in
+        response = self.client.patch('/api/trips/bulk-status/', [
+            {'trip_id': canceled.pk, 'status': 'Scheduled'},
+            {'trip_id': replacement.pk, 'status': 'Canceled'},
+        ], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Trip.objects.get(pk=canceled.pk).status, 'Scheduled')
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class TripBulkTests(TestCase):
+    """Bulk endpoints validate per item and run a fixed number of queries."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.start = timezone.now().replace(microsecond=0) + timedelta(days=1)
+        self.trucks = [Truck.objects.create(license_plate=f'BK-{i:03d}', tonner_capacity=10) for i in range(12)]
+        self.drivers = [FMSUser.objects.create(email=f'bulk{i}@fms.test', role='driver') for i in range(12)]
+
+    def item(self, i, hours=0, truck=None):
+        start = self.start + timedelta(hours=hours)
+        return {
+            'truck': (truck or self.trucks[i]).pk,
+            'assigned_driver': self.drivers[i].pk,
+            'net_weight': '5.00',
+            'start_location': 'Origin',
+            'end_location': 'Destination',
+            'scheduled_start_time': start.isoformat(),
+            'scheduled_end_time': (start + timedelta(hours=2)).isoformat(),
+        }
+
+    def bulk_create_queries(self, indexes):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/trips/bulk/', [self.item(i) for i in indexes], format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(TripStatusCount.objects.get(status='Scheduled').count, len(indexes))
+        return len(queries)
+
+    def test_bulk_create_query_count_is_independent_of_batch_size(self):
+        # related objects (2), endpoint locations (1), locks (2), conflicts (1),
+        # insert (1) and the rollup upserts, plus savepoints
+        small = self.bulk_create_queries(range(2))
+
+        # Start the second batch from the same (empty) rollups
+        Trip.objects.all().delete()
+        for model in (TripStatusCount, DailyTripStat, HourlyTripStat):
+            model.objects.all().delete()
+
+        large = self.bulk_create_queries(range(2, 12))
+        self.assertEqual((small, large), (19, 19))
+
+    def test_bulk_create_reports_errors_per_item(self):
+        batch = [self.item(0), self.item(1, hours=1, truck=self.trucks[0]), self.item(2)]
+        batch[2]['net_weight'] = '50.00'
+
+        response = self.client.post('/api/trips/bulk/', batch, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data), {2})
+
+        del batch[2]
+        response = self.client.post('/api/trips/bulk/', batch, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data), {1})
+        self.assertEqual(set(response.data[1]), {'truck'})
+        self.assertFalse(Trip.objects.exists())
+
+    def test_bulk_status_updates_trips_and_rollups(self):
+        admin = FMSUser.objects.create(email='admin@fms.test')
+        admin.groups.add(Group.objects.create(name='SuperAdmin'))
+        self.client.force_authenticate(admin)
+        self.client.post('/api/trips/bulk/', [self.item(i) for i in range(3)], format='json')
+        trip_ids = list(Trip.objects.values_list('trip_id', flat=True))
+
+        response = self.client.patch('/api/trips/bulk-status/', [
+            {'trip_id': trip_id, 'status': 'In Transit'} for trip_id in trip_ids
+        ], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Trip.objects.filter(status='In Transit', actual_start_time__isnull=False).count(), 3)
+        self.assertEqual(TripStatusCount.objects.get(status='In Transit').count, 3)
+        self.assertEqual(TripStatusCount.objects.get(status='Scheduled').count, 0)
+
+        response = self.client.patch('/api/trips/bulk-status/', [
+            {'trip_id': trip_ids[0], 'status': 'Completed'},
+            {'trip_id': 999999, 'status': 'Completed'},
+            {'trip_id': trip_ids[1], 'status': 'Lost'},
+        ], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data), {2})
+
+
+class TripOptimizerTests(TestCase):
+    """Assignment solver optimality and the preview/commit flow."""
+
+    def test_solve_assignment_matches_brute_force(self):
+        import random
+        from itertools import permutations
+        from trips.matching import solve_assignment
+
+        rng = random.Random(7)
+        for rows, cols in ((3, 3), (3, 5), (4, 6)):
+            cost = [[rng.randint(0, 20) for _ in range(cols)] for _ in range(rows)]
+            best = min(sum(cost[r][c] for r, c in enumerate(p)) for p in permutations(range(cols), rows))
+            chosen = solve_assignment(cost)
+            self.assertEqual(len(set(chosen)), rows)
+            self.assertEqual(sum(cost[r][c] for r, c in enumerate(chosen)), best)
+
+    def test_preview_then_commit(self):
+        admin = FMSUser.objects.create(email='admin@fms.test')
+        admin.groups.add(Group.objects.create(name='SuperAdmin'))
+        client = APIClient()
+        client.force_authenticate(admin)
+
+        start = timezone.now().replace(microsecond=0) + timedelta(days=1)
+        small = Truck.objects.create(license_plate='OP-SMALL', tonner_capacity=5)
+        large = Truck.objects.create(license_plate='OP-LARGE', tonner_capacity=20)
+        Truck.objects.create(license_plate='OP-SHOP', tonner_capacity=50, status='Maintenance')
+        drivers = [FMSUser.objects.create(email=f'op{i}@fms.test', role='driver') for i in range(2)]
+        trips = [
+            Trip.objects.create(
+                net_weight=weight, start_location='A', end_location='B',
+                scheduled_start_time=start, scheduled_end_time=start + timedelta(hours=2),
+            )
+            for weight in (15, 4, 30)
+        ]
+
+        response = client.post('/api/trips/optimize/', {'trip_ids': [trip.pk for trip in trips]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        plan = {item['trip_id']: item['truck'] for item in response.data['assignments']}
+        self.assertEqual(plan, {trips[0].pk: large.pk, trips[1].pk: small.pk})
+        self.assertEqual([item['trip_id'] for item in response.data['unassigned']], [trips[2].pk])
+        self.assertFalse(Trip.objects.filter(truck__isnull=False).exists())
+
+        response = client.post('/api/trips/optimize/', {
+            'commit': True, 'assignments': response.data['assignments'],
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Trip.objects.get(pk=trips[1].pk).truck, small)
+        self.assertEqual(
+            set(Trip.objects.filter(assigned_driver__isnull=False).values_list('assigned_driver', flat=True)),
+            {driver.pk for driver in drivers},
+        )
+
+        # A plan that double-books a truck is rejected at commit time
+        other = Trip.objects.create(
+            net_weight=1, start_location='A', end_location='B',
+            scheduled_start_time=start, scheduled_end_time=start + timedelta(hours=1),
+        )
+        response = client.post('/api/trips/optimize/', {'commit': True, 'assignments': [
+            {'trip_id': other.pk, 'truck': small.pk, 'assigned_driver': drivers[0].pk},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 409)
+
+    def test_commit_rejects_repeated_trips_and_refreshes_fuel(self):
+        from decimal import Decimal
+        from trips.optimizer import commit_plan
+        from trips.scheduling import SchedulingConflict
+
+        start = timezone.now().replace(microsecond=0) + timedelta(days=1)
+        trucks = [Truck.objects.create(license_plate=f'OP-{i}', tonner_capacity=10) for i in range(2)]
+        drivers = [FMSUser.objects.create(email=f'op{i}@fms.test', role='driver') for i in range(2)]
+        trip = Trip.objects.create(
+            net_weight=5, distance_km=100, start_location='A', end_location='B',
+            scheduled_start_time=start, scheduled_end_time=start + timedelta(hours=2),
+        )
+
+        with self.assertRaises(SchedulingConflict) as caught:
+            commit_plan([
+                {'trip_id': trip.pk, 'truck': trucks[0].pk, 'assigned_driver': drivers[0].pk},
+                {'trip_id': trip.pk, 'truck': trucks[1].pk, 'assigned_driver': drivers[1].pk},
+            ])
+        self.assertEqual(caught.exception.errors, {1: {'trip_id': ['Trip appears more than once in this batch.']}})
+
+        commit_plan([{'trip_id': trip.pk, 'truck': trucks[0].pk, 'assigned_driver': drivers[0].pk}])
+        # Fleet defaults: 100 km * (0.3 + 0.02 * 5 t) L/km at 60/L
+        trip.refresh_from_db()
+        self.assertEqual(trip.truck, trucks[0])
+        self.assertEqual(trip.estimated_fuel_cost, Decimal('2400.00'))
+
+
+class TripDistanceTests(TestCase):
+    """Endpoints resolve to Locations and distances are filled in batches."""
+
+    def setUp(self):
+        Location.objects.create(name='Manila Hub', latitude='14.599500', longitude='120.984200', is_hub=True)
+        Location.objects.create(name='Baguio', latitude='16.402300', longitude='120.596000')
+
+    def test_create_resolves_locations_and_distance(self):
+        response = APIClient().post('/api/trips/bulk/', [{
+            'truck': Truck.objects.create(license_plate='DS-001', tonner_capacity=10).pk,
+            'assigned_driver': FMSUser.objects.create(email='ds@fms.test', role='driver').pk,
+            'net_weight': '1.00',
+            'start_location': 'manila hub',
+            'end_location': 'Baguio',
+        }], format='json')
+        self.assertEqual(response.status_code, 201)
+
+        trip = Trip.objects.get()
+        self.assertEqual(trip.destination_location.name, 'Baguio')
+        # ~205 km great-circle, times the default road factor
+        self.assertAlmostEqual(float(trip.distance_km), 205 * 1.3, delta=10)
+
+    def test_fill_distances_skips_unknown_endpoints(self):
+        from trips.eta import fill_distances
+
+        Trip.objects.create(start_location='Manila Hub', end_location='Baguio')
+        Trip.objects.create(start_location='Manila Hub', end_location='Nowhere')
+        self.assertEqual(fill_distances(batch_size=1), 1)
+        self.assertEqual(Trip.objects.filter(distance_km__isnull=False).count(), 1)
+
+
+class TripFuelEstimateTests(TestCase):
+    """Consumption profiles are fitted from history and applied in batch."""
+
+    def test_fit_and_recompute(self):
+        from decimal import Decimal
+        from trips.fuel import fit_profiles, recompute_estimates
+        from trips.models import TripFuel, TruckFuelProfile
+
+        truck = Truck.objects.create(license_plate='FU-001', tonner_capacity=20)
+        now = timezone.now()
+        # History generated from liters = km * (0.25 + 0.01 * tons) at 50/liter
+        for i, (km, tons) in enumerate([(100, 0), (200, 10), (150, 5), (80, 20), (300, 2), (120, 15)]):
+            trip = Trip.objects.create(
+                truck=truck, start_location='A', end_location='B', status='Completed',
+                distance_km=km, net_weight=tons, actual_end_time=now - timedelta(days=i + 1),
+            )
+            liters = Decimal(str(km * (0.25 + 0.01 * tons)))
+            TripFuel.objects.create(trip=trip, liters=liters, total_amount=liters * 50)
+
+        self.assertEqual(fit_profiles(), 1)
+        profile = TruckFuelProfile.objects.get(truck=truck)
+        self.assertAlmostEqual(profile.base_liters_per_km, 0.25, places=3)
+        self.assertAlmostEqual(profile.liters_per_km_per_ton, 0.01, places=3)
+
+        open_trips = [
+            Trip.objects.create(truck=truck, start_location='A', end_location='B', distance_km=100, net_weight=10),
+            Trip.objects.create(start_location='A', end_location='B', distance_km=100, net_weight=10),
+        ]
+        # Profiles, price, one locked page of trips, one bulk update plus the
+        # rollup upserts, and the empty final page, each page in its own
+        # transaction -- not a query per trip
+        with self.assertNumQueries(11):
+            self.assertEqual(recompute_estimates(), 2)
+
+        own, fleet = (Trip.objects.get(pk=trip.pk).estimated_fuel_cost for trip in open_trips)
+        self.assertEqual(own, Decimal('1750.00'))  # 100 km * 0.35 L/km * 50
+        self.assertEqual(fleet, own)  # the fleet profile was fitted from the same truck
+        self.assertEqual(recompute_estimates(), 0)
+
+    def test_estimate_costs_per_truck_and_fleet(self):
+        from decimal import Decimal
+        from trips.fuel import estimate_costs
+
+        profiles = {1: (0.25, 0.01), None: (0.3, 0.02)}
+        rows = [(1, Decimal('100'), Decimal('10')), (2, Decimal('50'), None), (None, Decimal('0'), Decimal('5'))]
+        self.assertEqual(
+            estimate_costs(rows, profiles, Decimal('50')),
+            [Decimal('1750.00'), Decimal('750.00'), Decimal('0.00')],
+        )
+        self.assertEqual(estimate_costs([], profiles, Decimal('50')), [])
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class TripEventLogTests(TestCase):
+    """Status changes and milestones append events and keep the trip metrics current."""
+
+    def setUp(self):
+        self.client = APIClient()
+        admin = FMSUser.objects.create(email='events@fms.test')
+        admin.groups.add(Group.objects.create(name='SuperAdmin'))
+        self.client.force_authenticate(admin)
+        self.start = timezone.now().replace(microsecond=0) - timedelta(hours=3)
+
+    def test_status_changes_and_milestones_update_metrics(self):
+        trip = Trip.objects.create(
+            start_location='A', end_location='B',
+            scheduled_start_time=self.start, scheduled_end_time=self.start + timedelta(hours=6),
+        )
+        url = f'/api/trips/{trip.pk}/'
+        arrival = self.start - timedelta(minutes=30)
+        response = self.client.post(url + 'events/', {'event_type': 'Loading_Arrival', 'event_timestamp': arrival.isoformat()}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.client.post(url + 'events/', {'event_type': 'Status_Change'}, format='json').status_code, 400)
+
+        self.client.patch(url + 'status/', {'status': 'In Transit'}, format='json')
+        # Milestones from the WebSocket path are written in one batch per window
+        LocationIngestor().write_events([(str(trip.pk), 'Unloading_Arrival', timezone.now(), None), ('999999', 'Loading_Start', timezone.now(), None)])
+        self.client.patch('/api/trips/bulk-status/', [{'trip_id': trip.pk, 'status': 'Completed'}], format='json')
+        # Repeating a status is not a change
+        self.client.patch(url + 'status/', {'status': 'Completed'}, format='json')
+
+        trip.refresh_from_db()
+        self.assertIsNotNone(trip.actual_end_time)
+        events = self.client.get(url + 'events/').data
+        self.assertEqual(
+            [(event['event_type'], event['status']) for event in events],
+            [('Loading_Arrival', None), ('Status_Change', 'In Transit'), ('Unloading_Arrival', None), ('Status_Change', 'Completed')],
+        )
+        self.assertEqual(TripEvent.objects.count(), 4)
+
+        metrics = self.client.get(url + 'metrics/').data
+        self.assertGreaterEqual(metrics['loading_dwell_seconds'], 30 * 60)
+        self.assertGreater(metrics['departure_delay_seconds'], 0)
+        self.assertTrue(metrics['on_time'])
+
+        summary = self.client.get('/api/trips/metrics-summary/').data
+        self.assertEqual(summary['trips_completed'], 1)
+        self.assertEqual(summary['on_time_rate'], 1.0)
+
+    def test_bulk_status_events_use_a_fixed_number_of_queries(self):
+        from trips.events import record_events, status_events
+
+        trips = [Trip.objects.create(start_location='A', end_location='B', scheduled_start_time=self.start) for _ in range(20)]
+        for trip in trips:
+            trip.apply_status('In Transit')
+        # Events insert, metrics insert (ON CONFLICT DO NOTHING), locked read
+        # and update inside one savepoint (schedules are passed in) -- the
+        # same for 20 or 2000 trips
+        with self.assertNumQueries(6):
+            record_events(status_events(trips, {trip.pk: 'Scheduled' for trip in trips}), trips={trip.pk: trip for trip in trips})
+
+    def test_writers_merge_into_existing_metrics(self):
+        from trips.events import record_events
+        from trips.models import TripMetrics
+
+        trip = Trip.objects.create(start_location='A', end_location='B', scheduled_start_time=self.start)
+        arrival = self.start - timedelta(minutes=20)
+        # The WebSocket path created the row first...
+        record_events([TripEvent(trip=trip, event_type='Loading_Arrival', event_timestamp=arrival)])
+        # ...then REST statuses fold into it instead of inserting a second one
+        url = f'/api/trips/{trip.pk}/status/'
+        self.assertEqual(self.client.patch(url, {'status': 'In Transit'}, format='json').status_code, 200)
+        metrics = TripMetrics.objects.get(trip=trip)
+        self.assertEqual(metrics.loading_arrival_at, arrival)
+        self.assertIsNotNone(metrics.departed_at)
+
+    def test_repeated_status_is_stamped_with_the_time_of_the_change(self):
+        trip = Trip.objects.create(start_location='A', end_location='B')
+        url = f'/api/trips/{trip.pk}/status/'
+        for status in ('In Transit', 'Delayed', 'In Transit'):
+            self.client.patch(url, {'status': status}, format='json')
+
+        trip.refresh_from_db()
+        first, _, again = TripEvent.objects.filter(trip=trip).order_by('id')
+        self.assertEqual(first.event_timestamp, trip.actual_start_time)
+        self.assertGreater(again.event_timestamp, trip.actual_start_time)
+
+
+class TripExportTests(TestCase):
+    """The export streams filtered rows as CSV or NDJSON."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = FMSUser.objects.create(email='export@fms.test')
+        self.admin.groups.add(Group.objects.create(name='SuperAdmin'))
+        self.client.force_authenticate(self.admin)
+        self.start = timezone.now().replace(microsecond=0)
+        truck = Truck.objects.create(license_plate='EX-001', tonner_capacity=10)
+        for i, status in enumerate(['Completed', 'Completed', 'Canceled', 'Scheduled']):
+            Trip.objects.create(
+                truck=truck, start_location='A, Inc', end_location='B', status=status,
+                scheduled_start_time=self.start + timedelta(days=i),
+            )
+
+    def content(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_export_with_filters(self):
+        import csv
+        import io
+
+        response = self.client.get('/api/trips/export/', {
+            'status': 'Completed,Scheduled', 'end': (self.start + timedelta(days=3)).isoformat(),
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(io.StringIO(self.content(response))))
+        self.assertEqual([row['status'] for row in rows], ['Completed', 'Completed'])
+        self.assertEqual(rows[0]['truck_plate'], 'EX-001')
+        self.assertEqual(rows[0]['start_location'], 'A, Inc')
+
+        self.assertEqual(self.client.get('/api/trips/export/', {'status': 'Lost'}).status_code, 400)
+
+    def test_ndjson_export(self):
+        import json
+
+        response = self.client.get('/api/trips/export/', {'format': 'ndjson'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in self.content(response).splitlines()]
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[-1]['status'], 'Scheduled')
+
+    async def test_export_streams_under_asgi(self):
+        from rest_framework_simplejwt.tokens import AccessToken
+
+        # One row per chunk, so the body must arrive in pieces
+        with mock.patch('trips.export.ROWS_PER_WRITE', 1):
+            response = await self.async_client.get(
+                '/api/trips/export/', headers={'Authorization': f'Bearer {AccessToken.for_user(self.admin)}'},
+            )
+            self.assertEqual(response.status_code, 200)
+            # An async iterator: Django does not buffer it under ASGI
+            self.assertTrue(response.is_async)
+            chunks = [chunk async for chunk in response.streaming_content]
+        self.assertEqual(len(chunks), 5)
+        self.assertTrue(chunks[0].startswith(b'trip_id,trip_code'))
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class TripConditionalGetTests(TestCase):
+    """Polling clients get 304s from a change-stamp lookup until the trip changes."""
+
+    def setUp(self):
+        self.client = APIClient()
+        admin = FMSUser.objects.create(email='poll@fms.test')
+        admin.groups.add(Group.objects.create(name='SuperAdmin'))
+        self.client.force_authenticate(admin)
+        self.trip = Trip.objects.create(start_location='A', end_location='B')
+        self.url = f'/api/trips/{self.trip.pk}/'
+
+    def test_detail_revalidation(self):
+        response = self.client.get(self.url)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        self.assertEqual(response.data['version'], 1)
+
+        # One primary key lookup, no full fetch or serialization
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+        # Another representation of the same trip has its own ETag
+        self.assertEqual(self.client.get(self.url + '?fields=status', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        self.client.patch(self.url + 'status/', {'status': 'In Transit'}, format='json')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['version'], 2)
+
+    def test_list_revalidation_sees_bulk_writes_and_deletes(self):
+        etag = self.client.get('/api/trips/')['ETag']
+        self.assertEqual(self.client.get('/api/trips/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch('/api/trips/bulk-status/', [{'trip_id': self.trip.pk, 'status': 'Canceled'}], format='json')
+            # Until the write commits, readers keep the old stamp
+            self.assertEqual(self.client.get('/api/trips/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get('/api/trips/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertEqual(Trip.objects.get().version, 2)
+
+        # Deleting an older trip changes the list too
+        with self.captureOnCommitCallbacks(execute=True):
+            Trip.objects.create(start_location='C', end_location='D')
+        etag = self.client.get('/api/trips/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.trip.delete()
+        self.assertEqual(self.client.get('/api/trips/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_rendered_related_rows_change_the_trip(self):
+        truck = Truck.objects.create(license_plate='CG-001', tonner_capacity=10)
+        driver = FMSUser.objects.create(email='cg-driver@fms.test', role='driver')
+        Trip.objects.filter(pk=self.trip.pk).update(truck=truck, assigned_driver=driver)
+        etag = self.client.get(self.url)['ETag']
+        list_etag = self.client.get('/api/trips/')['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            truck.license_plate = 'CG-002'
+            truck.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['truck_license_plate'], 'CG-002')
+        self.assertEqual(self.client.get('/api/trips/', HTTP_IF_NONE_MATCH=list_etag).status_code, 200)
+
+        # Unrelated saves (e.g. a login) leave the trip alone
+        driver.save(update_fields=['last_login'])
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # Deleting the driver SET_NULLs the trip without save()
+        driver.delete()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.data['assigned_driver'])
+        self.assertEqual(response.data['version'], 3)
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class TripAsyncViewTests(TestCase):
+    """The /api/async/ reads return what the sync TripViewSet returns."""
+
+    def setUp(self):
+        now = timezone.now()
+        truck = Truck.objects.create(license_plate='ASYNC-1', tonner_capacity=10)
+        self.driver = FMSUser.objects.create(email='async@fms.test', role='driver')
+        self.trips = [
+            Trip.objects.create(
+                truck=truck, assigned_driver=self.driver, start_location='A', end_location='B',
+                scheduled_start_time=now - timedelta(hours=i),
+            )
+            for i in range(3)
+        ]
+        Trip.objects.filter(pk=self.trips[0].pk).update(status='Completed')
+
+    def test_list_detail_and_active_match_the_sync_views(self):
+        for sync_url, async_url in [
+            ('/api/trips/?page_size=2&view=detail', '/api/async/trips/?page_size=2&view=detail'),
+            ('/api/trips/active/?fields=trip_id,status', '/api/async/trips/active/?fields=trip_id,status'),
+        ]:
+            expected, response = self.client.get(sync_url).json(), self.client.get(async_url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['results'], expected['results'])
+            self.assertEqual(bool(response.json()['next']), bool(expected['next']))
+
+        active = self.client.get('/api/async/trips/active/').json()['results']
+        self.assertEqual({trip['trip_id'] for trip in active}, {trip.pk for trip in self.trips[1:]})
+
+        # The next link continues on the async endpoint
+        page = self.client.get('/api/async/trips/?page_size=2').json()
+        self.assertTrue(page['next'].startswith('http://testserver/api/async/trips/'))
+        rest = self.client.get(page['next']).json()
+        self.assertEqual([trip['trip_id'] for trip in rest['results']], [self.trips[2].pk])
+
+        trip = self.trips[1]
+        response = self.client.get(f'/api/async/trips/{trip.pk}/')
+        self.assertEqual(response.json(), self.client.get(f'/api/trips/{trip.pk}/').json())
+        self.assertEqual(self.client.get('/api/async/trips/999999/').json(), {'detail': 'No Trip matches the given query.'})
+        self.assertEqual(self.client.post('/api/async/trips/').status_code, 405)
+
+    def test_conditional_gets_and_authentication(self):
+        url = f'/api/async/trips/{self.trips[1].pk}/'
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        etag = self.client.get('/api/async/trips/')['ETag']
+        self.assertEqual(self.client.get('/api/async/trips/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        from rest_framework_simplejwt.tokens import AccessToken
+        token = AccessToken.for_user(self.driver)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION=f'Bearer {token}').status_code, 200)
+        response = self.client.get(url, HTTP_AUTHORIZATION='Bearer not-a-token')
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('WWW-Authenticate', response)
+
+
+class FailingChannelLayer:
+    async def group_send(self, group, message):
+        raise ConnectionError('Redis is down')
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class TripOutboxTests(TestCase):
+    """Status pushes are queued with the change and published by the dispatcher."""
+
+    def setUp(self):
+        self.client = APIClient()
+        admin = FMSUser.objects.create(email='outbox@fms.test')
+        admin.groups.add(Group.objects.create(name='SuperAdmin'))
+        self.client.force_authenticate(admin)
+        self.trip = Trip.objects.create(start_location='A', end_location='B')
+
+    def subscribe(self, group):
+        layer = get_channel_layer()
+        channel = async_to_sync(layer.new_channel)()
+        async_to_sync(layer.group_add)(group, channel)
+        return lambda: async_to_sync(layer.receive)(channel)
+
+    def test_status_change_is_pushed_by_the_dispatcher(self):
+        receive = self.subscribe(trip_group_name(self.trip.pk))
+        receive_fleet = self.subscribe(FLEET_GROUP)
+
+        self.client.patch(f'/api/trips/{self.trip.pk}/status/', {'status': 'In Transit'}, format='json')
+        self.client.patch(f'/api/trips/{self.trip.pk}/status/', {'status': 'Delayed'}, format='json')
+        self.assertEqual(TripOutboxMessage.objects.count(), 2)
+
+        # Both rows coalesce into one push of the newest status
+        self.assertEqual(dispatch_batch(), 2)
+        self.assertEqual(receive()['status'], 'Delayed')
+        self.assertEqual(receive_fleet()['deltas'][0][3], 'Delayed')
+        self.assertFalse(TripOutboxMessage.objects.exists())
+        self.assertEqual(last_known_positions.get(self.trip.pk)['status'], 'Delayed')
+
+    def test_rolled_back_changes_are_never_pushed(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            enqueue_trip_updates([self.trip])
+            raise RuntimeError
+        self.assertFalse(TripOutboxMessage.objects.exists())
+
+    def test_failed_batches_are_retried_with_backoff(self):
+        self.client.patch('/api/trips/bulk-status/', [{'trip_id': self.trip.pk, 'status': 'In Transit'}], format='json')
+        now = timezone.now()
+        with self.assertLogs('trips.outbox', 'ERROR'):
+            dispatch_batch(channel_layer=FailingChannelLayer(), now=now)
+        message = TripOutboxMessage.objects.get()
+        self.assertEqual(message.attempts, 1)
+        self.assertIn('Redis is down', message.last_error)
+
+        # Not ready again until the backoff has passed
+        self.assertEqual(dispatch_batch(now=now), 0)
+        receive = self.subscribe(trip_group_name(self.trip.pk))
+        self.assertEqual(dispatch_batch(now=now + timedelta(seconds=2)), 1)
+        self.assertEqual(receive()['status'], 'In Transit')
+        self.assertFalse(TripOutboxMessage.objects.exists())
+
+    def test_retried_row_is_never_sent_after_a_newer_one(self):
+        self.client.patch(f'/api/trips/{self.trip.pk}/status/', {'status': 'In Transit'}, format='json')
+        now = timezone.now()
+        with self.assertLogs('trips.outbox', 'ERROR'):
+            dispatch_batch(channel_layer=FailingChannelLayer(), now=now)
+
+        # A newer change is ready while the failed row is still backing off
+        self.client.patch(f'/api/trips/{self.trip.pk}/status/', {'status': 'Completed'}, format='json')
+        receive = self.subscribe(trip_group_name(self.trip.pk))
+        self.assertEqual(dispatch_batch(), 2)
+        self.assertEqual(receive()['status'], 'Completed')
+        # The old status is gone, not queued for a later retry
+        self.assertFalse(TripOutboxMessage.objects.exists())
+        self.assertEqual(dispatch_batch(now=now + timedelta(minutes=5)), 0)
+
+    def test_failure_keeps_only_the_newest_row_per_trip(self):
+        for status in ('In Transit', 'Delayed'):
+            self.client.patch(f'/api/trips/{self.trip.pk}/status/', {'status': status}, format='json')
+        with self.assertLogs('trips.outbox', 'ERROR'):
+            dispatch_batch(channel_layer=FailingChannelLayer())
+        self.assertEqual(list(TripOutboxMessage.objects.values_list('status', 'attempts')), [('Delayed', 1)])
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class LocationIngestorTests(TestCase):
+    """Redundant pings are dropped, the rest coalesce per trip and are always stored."""
+
+    def setUp(self):
+        self.trip = Trip.objects.create(start_location='A', end_location='B')
+        self.ingestor = LocationIngestor(min_distance_meters=25, min_interval_seconds=15)
+        # Flushes are driven by the tests, not a background task
+        self.ingestor._ensure_running = lambda: None
+
+    def submit(self, lat, lng, status='In Transit', at=0.0):
+        with mock.patch('trips.ingestion.time.monotonic', return_value=1000.0 + at):
+            return self.ingestor.submit(self.trip.pk, lat, lng, status)
+
+    def test_distance_and_interval_thresholds(self):
+        self.assertTrue(self.submit(14.5, 121.0))
+        # ~11 m away, 5 s later, same status: redundant
+        self.assertFalse(self.submit(14.5001, 121.0, at=5))
+        # ~33 m away: accepted
+        self.assertTrue(self.submit(14.5003, 121.0, at=6))
+        # Same place, but the status changed
+        self.assertTrue(self.submit(14.5003, 121.0, status='Delayed', at=7))
+        # Same place and status, but the heartbeat interval has passed
+        self.assertFalse(self.submit(14.5003, 121.0, status='Delayed', at=21))
+        self.assertTrue(self.submit(14.5003, 121.0, status='Delayed', at=22))
+
+    def test_pings_coalesce_per_trip(self):
+        self.submit(14.5, 121.0)
+        self.submit(14.51, 121.0, at=1)
+        self.submit(14.52, 121.0, status='Delayed', at=2)
+
+        # One pending broadcast with the latest ping, every position queued
+        self.assertEqual(list(self.ingestor.pending), [self.trip.pk])
+        self.assertEqual(self.ingestor.pending[self.trip.pk]['lat'], 14.52)
+        self.assertEqual(self.ingestor.pending[self.trip.pk]['status'], 'Delayed')
+        self.assertEqual(len(self.ingestor.positions), 3)
+
+    def test_broadcast_failure_does_not_lose_the_window(self):
+        self.submit(14.5, 121.0)
+        self.ingestor.submit_event(self.trip.pk, 'Loading_Arrival')
+        with mock.patch('trips.ingestion.get_channel_layer', return_value=FailingChannelLayer()), \
+                self.assertLogs('trips.ingestion', 'ERROR'):
+            async_to_sync(self.ingestor.flush)()
+
+        self.assertEqual(TripPosition.objects.filter(trip=self.trip).count(), 1)
+        self.assertEqual(TripEvent.objects.filter(trip=self.trip, event_type='Loading_Arrival').count(), 1)
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class FleetConsumerTests(TestCase):
+    """The live map filters on each trip's status, also for pings that carry none."""
+
+    def setUp(self):
+        caches['realtime'].clear()
+        last_known_positions.local.clear()
+        self.addCleanup(last_known_positions.local.clear)
+        self.moving = Trip.objects.create(start_location='A', end_location='B', status='In Transit')
+        self.waiting = Trip.objects.create(start_location='C', end_location='D')
+        # Pings without a status, as most driver apps send them
+        for trip in (self.moving, self.waiting):
+            last_known_positions.record(trip.pk, trip_update_message(trip.pk, None, 14.5, 121.0))
+
+    async def connect(self, query=''):
+        communicator = WebsocketCommunicator(FleetConsumer.as_asgi(), f'/ws/fleet/{query}')
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def push(self, *messages):
+        await get_channel_layer().group_send(FLEET_GROUP, fleet_update_message(messages))
+
+    async def test_snapshot_uses_the_stored_status(self):
+        communicator = await self.connect()
+        snapshot = await communicator.receive_json_from()
+        self.assertTrue(snapshot['snapshot'])
+        self.assertEqual(snapshot['deltas'], [[self.moving.pk, 14.5, 121.0, 'In Transit', mock.ANY]])
+        await communicator.disconnect()
+
+    async def test_snapshot_is_bounded_to_active_trips(self):
+        done = await Trip.objects.acreate(start_location='E', end_location='F', status='Completed')
+        last_known_positions.record(done.pk, trip_update_message(done.pk, 'Completed', 14.5, 121.0))
+
+        # Historical statuses: live deltas only, no snapshot rows
+        communicator = await self.connect('?status=Completed')
+        self.assertEqual((await communicator.receive_json_from())['deltas'], [])
+        await self.push(trip_update_message(done.pk, None, 14.6, 121.0))
+        self.assertEqual((await communicator.receive_json_from())['deltas'][0][3], 'Completed')
+        await communicator.disconnect()
+
+        # Newest active trips first, up to the limit
+        with mock.patch.object(FleetConsumer, 'SNAPSHOT_LIMIT', 1):
+            communicator = await self.connect('?status=all')
+            snapshot = await communicator.receive_json_from()
+        self.assertEqual([row[0] for row in snapshot['deltas']], [self.waiting.pk])
+        await communicator.disconnect()
+
+    async def test_pings_without_status_follow_the_last_known_status(self):
+        communicator = await self.connect('?status=all')
+        await communicator.receive_json_from()
+
+        # Unseen trip: the stored status fills the gap
+        await self.push(trip_update_message(self.waiting.pk, None, 14.6, 121.0))
+        self.assertEqual((await communicator.receive_json_from())['deltas'][0][3], 'Scheduled')
+        await communicator.disconnect()
+
+        communicator = await self.connect()
+        await communicator.receive_json_from()
+        await self.push(trip_update_message(self.moving.pk, None, 14.6, 121.0))
+        self.assertEqual((await communicator.receive_json_from())['deltas'][0][3], 'In Transit')
+
+        # Leaves the filter once, then its status-less pings stay hidden
+        await self.push(trip_update_message(self.moving.pk, 'Completed', 14.7, 121.0))
+        self.assertEqual((await communicator.receive_json_from())['deltas'][0][3], 'Completed')
+        await self.push(trip_update_message(self.moving.pk, None, 14.8, 121.0))
+        self.assertTrue(await communicator.receive_nothing())
+        await communicator.disconnect()
+
+    async def test_bbox_filter_and_invalid_bbox(self):
+        communicator = await self.connect('?bbox=14,120,15,122')
+        self.assertEqual(len((await communicator.receive_json_from())['deltas']), 1)
+        # Sent once on leaving the box, then no more
+        await self.push(trip_update_message(self.moving.pk, None, 16.0, 121.0))
+        self.assertEqual((await communicator.receive_json_from())['deltas'][0][1], 16.0)
+        await self.push(trip_update_message(self.moving.pk, None, 16.1, 121.0))
+        self.assertTrue(await communicator.receive_nothing())
+        await communicator.disconnect()
+
+        communicator = WebsocketCommunicator(FleetConsumer.as_asgi(), '/ws/fleet/?bbox=nope')
+        connected, code = await communicator.connect()
+        self.assertEqual((connected, code), (False, 4400))
+
+
+class LastKnownPositionTests(TestCase):
+    """Current positions come from the last-known map, the stored track only on a miss."""
+
+    def setUp(self):
+        caches['realtime'].clear()
+        last_known_positions.local.clear()
+        self.addCleanup(last_known_positions.local.clear)
+        self.trips = [Trip.objects.create(start_location='A', end_location='B') for _ in range(3)]
+        now = timezone.now()
+        for trip in self.trips:
+            TripPosition.objects.bulk_create([
+                TripPosition(trip=trip, recorded_at=now - timedelta(minutes=1), lat=14.0, lng=121.0),
+                TripPosition(trip=trip, recorded_at=now, lat=14.5, lng=121.5),
+            ])
+
+    def test_cache_miss_falls_back_to_the_latest_stored_position(self):
+        trip_ids = [trip.pk for trip in self.trips]
+        with self.assertNumQueries(1):
+            positions = current_positions(trip_ids)
+        self.assertEqual(positions, {trip_id: (14.5, 121.5) for trip_id in trip_ids})
+        self.assertEqual(current_position(trip_ids[0]), (14.5, 121.5))
+
+    def test_cache_hits_need_no_query(self):
+        first, second, third = (trip.pk for trip in self.trips)
+        # In this process's map, and in the shared cache only (another worker)
+        last_known_positions.record(first, trip_update_message(first, 'In Transit', 15.0, 120.0))
+        last_known_positions.update(second, trip_update_message(second, 'In Transit', 16.0, 120.0))
+        self.assertNotIn(str(second), last_known_positions.local)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(current_positions([first, second]), {first: (15.0, 120.0), second: (16.0, 120.0)})
+            self.assertEqual(current_position(second), (16.0, 120.0))
+
+        # Mixed: one query for the misses only
+        with self.assertNumQueries(1):
+            positions = current_positions([first, second, third])
+        self.assertEqual(positions[third], (14.5, 121.5))
+
+    def test_trip_without_positions_is_left_out(self):
+        empty = Trip.objects.create(start_location='C', end_location='D')
+        self.assertEqual(current_positions([empty.pk]), {})
+        self.assertIsNone(current_position(empty.pk))
+
+
+class TripKeysetPaginationTests(TestCase):
+    """Cursor pages walk every trip exactly once, ties and unscheduled trips included."""
+
+    def setUp(self):
+        now = timezone.now().replace(microsecond=0)
+        self.tied = [Trip.objects.create(start_location='A', end_location='B', scheduled_start_time=now) for _ in range(4)]
+        self.earlier = Trip.objects.create(start_location='A', end_location='B', scheduled_start_time=now - timedelta(hours=1))
+        self.unscheduled = [Trip.objects.create(start_location='A', end_location='B') for _ in range(3)]
+
+    def walk(self, url):
+        ids, pages = [], 0
+        while url:
+            page = self.client.get(url).json()
+            ids += [trip['trip_id'] for trip in page['results']]
+            url, pages = page['next'], pages + 1
+        return ids, pages
+
+    def test_pages_cover_ties_and_the_unscheduled_tail_in_order(self):
+        expected = (
+            sorted((trip.pk for trip in self.tied), reverse=True)
+            + [self.earlier.pk]
+            + sorted((trip.pk for trip in self.unscheduled), reverse=True)
+        )
+        for page_size in (1, 2, 3, 5, 8):
+            ids, pages = self.walk(f'/api/trips/?page_size={page_size}&fields=trip_id')
+            self.assertEqual(ids, expected)
+            self.assertEqual(pages, -(-len(expected) // page_size))
+
+    def test_cursor_inside_the_unscheduled_tail(self):
+        # Page boundary on the last scheduled trip, then inside the tail
+        page = self.client.get('/api/trips/?page_size=5').json()
+        self.assertEqual(page['results'][-1]['trip_id'], self.earlier.pk)
+        page = self.client.get(page['next'].replace('page_size=5', 'page_size=2')).json()
+        tail = sorted((trip.pk for trip in self.unscheduled), reverse=True)
+        self.assertEqual([trip['trip_id'] for trip in page['results']], tail[:2])
+        page = self.client.get(page['next']).json()
+        self.assertEqual([trip['trip_id'] for trip in page['results']], tail[2:])
+        self.assertIsNone(page['next'])
+
+    def test_malformed_cursor(self):
+        from base64 import b64encode
+
+        for cursor in ('not-a-cursor', b64encode(b'{"a": 1}').decode(), b64encode(b'["yesterday", 1]').decode()):
+            for url in ('/api/trips/', '/api/async/trips/'):
+                response = self.client.get(url, {'cursor': cursor})
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(response.json(), {'detail': 'Invalid cursor'})
+
+    def test_unknown_sparse_field(self):
+        for url in ('/api/trips/', '/api/trips/active/', f'/api/trips/{self.earlier.pk}/', '/api/async/trips/'):
+            response = self.client.get(url, {'fields': 'trip_id,nope,status'})
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json(), {'detail': 'Unknown fields: nope.'})
+
+
+class BenchmarkSeedTests(TestCase):
+    """Benchmark trips come and go without touching the analytics rollups."""
+
+    def test_seed_and_cleanup_leave_the_rollups_alone(self):
+        Trip.objects.create(start_location='A', end_location='B', status='In Transit')
+        counts = dict(TripStatusCount.objects.values_list('status', 'count'))
+
+        seed_trips([
+            Trip(trip_code=f'LOADTEST-{i:05d}', start_location='A', end_location='B', status='In Transit')
+            for i in range(3)
+        ])
+        seeded = Trip.objects.filter(trip_code__startswith='LOADTEST-').first()
+        TripPosition.objects.create(trip=seeded, recorded_at=timezone.now(), lat=14.5, lng=121.0)
+        TripEvent.objects.create(trip=seeded, event_type='Loading_Arrival', event_timestamp=timezone.now())
+
+        delete_seeded_trips('LOADTEST-')
+        self.assertEqual(dict(TripStatusCount.objects.values_list('status', 'count')), counts)
+        self.assertEqual(Trip.objects.count(), 1)
+        self.assertFalse(TripPosition.objects.exists() or TripEvent.objects.exists())
@@ -2,16 +2,30 @@
 
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ParseError
 from rest_framework.response import Response
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
 from django.utils import timezone # Make sure this is imported
+from django.db import transaction
 
-# --- ADD THESE IMPORTS FOR CHANNELS ---
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
-# -------------------------------------
-
-from .models import Trip
-from .serializers import TripSerializer, TripDetailSerializer
+from .models import Trip, TripEvent, TripMetrics, ACTIVE_STATUSES, SETTABLE_STATUSES, STATUS_CHOICES
+from .serializers import (
+    TripSerializer, TripDetailSerializer, TripListSerializer, TripStatusUpdateSerializer, TripOptimizeSerializer,
+    TripFuelSerializer, TripEventSerializer, TripMetricsSerializer,
+)
+from .signals import trips_bulk_changed
+from .pagination import TripKeysetPagination
+from .outbox import enqueue_trip_updates
+from .positions import trip_track
+from .scheduling import (
+    SchedulingConflict, check_reactivations, free_drivers, free_trucks, lock_for_reactivation, parse_time_bounds,
+)
+from .optimizer import commit_plan, load_problem, optimizable_trips, solve
+from .eta import trip_eta
+from .conditional import has_conditions, list_validators, not_modified, request_variant, set_validators, trip_validators
+from .events import metrics_summary, record_events, status_events
+from .export import STREAMS, CSVRenderer, NDJSONRenderer, aiterate, export_rows, filtered_trips
 # from accounts.permissions import ... (your existing imports)
 from accounts.permissions import IsAssignedDriverOrDispatcher, IsSuperAdmin
 
@@ -19,6 +33,121 @@ from accounts.permissions import IsAssignedDriverOrDispatcher, IsSuperAdmin
 class TripViewSet(viewsets.ModelViewSet):
     queryset = Trip.objects.all().order_by('-scheduled_start_time')
     serializer_class = TripSerializer
+    pagination_class = TripKeysetPagination
+
+    # Largest batch accepted by the bulk endpoints
+    BULK_MAX_ITEMS = 1000
+
+    # Actions that honor the ?fields= sparse fieldset parameter
+    SPARSE_FIELDSET_ACTIONS = ('list', 'retrieve', 'active')
+
+    def get_requested_fields(self):
+        """
+        Field names from ?fields=trip_id,status,... (None when not given).
+        Raises ParseError (400) for names the serializer does not have.
+        """
+        if self.action not in self.SPARSE_FIELDSET_ACTIONS:
+            return None
+        fields = self.request.query_params.get('fields')
+        if not fields:
+            return None
+        fields = [name.strip() for name in fields.split(',') if name.strip()]
+        unknown = sorted(set(fields) - set(self.get_serializer_class()().fields))
+        if unknown:
+            raise ParseError(f'Unknown fields: {", ".join(unknown)}.')
+        return fields
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # Reject bad ?fields= before a conditional GET can answer 304
+        self.get_requested_fields()
+
+    def get_serializer_class(self):
+        # Detail shape for single trips, and for lists when ?view=detail is given
+        if self.action in ('retrieve', 'set_status'):
+            return TripDetailSerializer
+        if self.action in ('list', 'active') and self.request.query_params.get('view') == 'detail':
+            return TripDetailSerializer
+        return TripSerializer
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'active':
+            queryset = queryset.filter(status__in=ACTIVE_STATUSES)
+        if self.action == 'eta':
+            return queryset.select_related('destination_location')
+        fields = self.get_requested_fields()
+
+        # Join the relations the chosen serializer reads, so rendering N rows
+        # never issues per-row queries for truck/driver lookups
+        related = {
+            name: source
+            for name, source in self.get_serializer_class().related_sources.items()
+            if not fields or name in fields
+        }
+        if related:
+            queryset = queryset.select_related(*{relation for relation, _ in related.values()})
+
+        if fields or related:
+            # Only load the selected columns, plus the keyset pagination keys
+            model_fields = [field.name for field in Trip._meta.concrete_fields]
+            columns = [name for name in fields if name in model_fields] if fields else model_fields
+            for relation, column in related.values():
+                columns += [relation, column]
+            queryset = queryset.only('trip_id', 'scheduled_start_time', *Trip.VERSION_FIELDS, *columns)
+
+        return queryset
+
+    def get_time_bounds(self, *names, required=False):
+        """Parses ISO timestamps from the query string into aware datetimes."""
+        return parse_time_bounds(self.request.query_params, *names, required=required)
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self.get_requested_fields()
+        if fields:
+            kwargs['fields'] = fields
+        return super().get_serializer(*args, **kwargs)
+
+    # --- Conditional GET (ETag / Last-Modified) ---
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Trip detail for pollers: with If-None-Match/If-Modified-Since, a
+        primary key lookup of the change stamp decides whether to answer 304
+        before the row is fetched or serialized.
+        """
+        variant = request_variant(request)
+        pk = str(kwargs.get(self.lookup_url_kwarg or self.lookup_field, ''))
+        if has_conditions(request) and pk.isdigit():
+            stamp = Trip.objects.filter(pk=pk).values('version', 'updated_at', 'assigned_driver_id').first()
+            if stamp is not None:
+                # Object permissions only look at the assigned driver
+                self.check_object_permissions(request, Trip(trip_id=int(pk), assigned_driver_id=stamp['assigned_driver_id']))
+                validators = trip_validators(pk, stamp['version'], stamp['updated_at'], variant)
+                response = not_modified(request, *validators)
+                if response is not None:
+                    return set_validators(response, *validators)
+
+        instance = self.get_object()
+        response = Response(self.get_serializer(instance).data)
+        return set_validators(response, *trip_validators(pk, instance.version, instance.updated_at, variant))
+
+    def list(self, request, *args, **kwargs):
+        """Trip list with the list change counter (a cache read, see trips.conditional) as validator."""
+        validators = list_validators(request_variant(request))
+        response = not_modified(request, *validators)
+        if response is None:
+            response = super().list(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+        return set_validators(response, *validators)
+
+    @action(detail=False, methods=['get'], url_path='active')
+    def active(self, request):
+        """
+        Scheduled and In Transit trips: the list endpoint (same pagination,
+        ?fields=/?view= and conditional GETs) restricted to ACTIVE_STATUSES.
+        """
+        return self.list(request)
     
     # --- Custom Action for Status Update ---
     @action(detail=True, methods=['patch'], url_path='status', 
@@ -33,39 +162,295 @@ class TripViewSet(viewsets.ModelViewSet):
         if not new_status:
             return Response({'detail': 'Status field is required.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        valid_statuses = ['In Transit', 'Completed', 'Canceled', 'Delayed', 'Scheduled']
-        if new_status not in valid_statuses:
-             return Response({'detail': f'Invalid status. Must be one of: {", ".join(valid_statuses)}'}, status=status.HTTP_400_BAD_REQUEST)
-
-        # 1. Update database record
-        trip.status = new_status
-        if new_status == 'In Transit' and not trip.actual_start_time:
-            # Record the actual start time only on the first transit update
-            trip.actual_start_time = timezone.now()
-            
-        trip.save(update_fields=['status', 'actual_start_time'])
-
-        # 2. --- REAL-TIME PUSH LOGIC (CRITICAL ADDITION) ---
-        channel_layer = get_channel_layer()
-        # The group name must match the one used in the consumer
-        trip_group_name = f'trip_{trip.trip_id}'
-
-        # Create the message payload (lat/lng are placeholders or use the last known location)
-        message = {
-            'type': 'trip_update', # This must match the consumer method name
+        if new_status not in SETTABLE_STATUSES:
+             return Response({'detail': f'Invalid status. Must be one of: {", ".join(SETTABLE_STATUSES)}'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # 1. Update database record and append the change to the event log
+        encoder = request.user if request.user.is_authenticated else None
+        now = timezone.now()
+        try:
+            with transaction.atomic():
+                # A Completed/Canceled trip going back to Scheduled or In
+                # Transit books its driver and truck again
+                lock_for_reactivation([trip.pk], {trip.pk: new_status})
+                # Re-read under a row lock, as bulk_status does: the rollup
+                # deltas and the event are computed from the status seen here
+                trip = self.get_queryset().select_for_update(of=('self',)).get(pk=trip.pk)
+                check_reactivations([trip], {trip.pk: new_status})
+                old_status = trip.status
+                trip.save(update_fields=trip.apply_status(new_status, now))
+                record_events(status_events([trip], {trip.trip_id: old_status}, encoder, now), trips={trip.trip_id: trip})
+                # 2. Real-time push via the outbox: committed (or rolled back)
+                # with the change, published by dispatch_trip_outbox
+                enqueue_trip_updates([trip])
+        except SchedulingConflict as exc:
+            return Response(exc.errors[trip.pk], status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(TripDetailSerializer(trip).data, status=status.HTTP_200_OK)
+
+    # --- Position History ---
+    @action(detail=True, methods=['get'], url_path='track',
+            permission_classes=[IsAssignedDriverOrDispatcher | IsSuperAdmin])
+    def track(self, request, pk=None):
+        """
+        Returns the trip's recorded GPS track for a time range.
+        GET /api/trips/{id}/track/?start=<iso>&end=<iso>&max_points=500
+        """
+        trip = self.get_object()
+        bounds = self.get_time_bounds('start', 'end')
+
+        max_points = request.query_params.get('max_points')
+        if max_points is not None:
+            if not max_points.isdigit() or int(max_points) < 2:
+                return Response({'detail': 'max_points must be an integer of at least 2.'}, status=status.HTTP_400_BAD_REQUEST)
+            max_points = int(max_points)
+
+        points, total = trip_track(trip.trip_id, max_points=max_points, **bounds)
+        return Response({
             'trip_id': trip.trip_id,
-            'timestamp': timezone.now().isoformat(),
-            'status': trip.status,
-            'lat': 14.5995, # Placeholder (replace with actual location data if available)
-            'lng': 120.9842, # Placeholder
-            # You can add 'eta_next_stop' here if you calculate it
-        }
+            'total_points': total,
+            'downsampled': len(points) < total,
+            # Each point is [timestamp, lat, lng]
+            'points': points,
+        })
+
+    # --- Fuel Records ---
+    @action(detail=True, methods=['get', 'post'], url_path='fuels',
+            permission_classes=[IsAssignedDriverOrDispatcher | IsSuperAdmin])
+    def fuels(self, request, pk=None):
+        """
+        Fuel purchases recorded for a trip.
+        GET  /api/trips/{id}/fuels/
+        POST /api/trips/{id}/fuels/ {"liters": "120.50", "total_amount": "7230.00", "fuel_ref_no": "..."}
+        """
+        trip = self.get_object()
+        if request.method == 'GET':
+            return Response(TripFuelSerializer(trip.fuels.order_by('created_at'), many=True).data)
+
+        serializer = TripFuelSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save(trip=trip, encoder=request.user if request.user.is_authenticated else None)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-        # Send the message to the group asynchronously
-        async_to_sync(channel_layer.group_send)(
-            trip_group_name,
-            message
+    # --- Event Log ---
+    @action(detail=True, methods=['get', 'post'], url_path='events',
+            permission_classes=[IsAssignedDriverOrDispatcher | IsSuperAdmin])
+    def events(self, request, pk=None):
+        """
+        The trip's timeline, oldest first (served by idx_trip_events_time).
+        GET  /api/trips/{id}/events/
+        POST /api/trips/{id}/events/ {"event_type": "Loading_Arrival", "event_timestamp": "...", "document_no": "..."}
+        """
+        trip = self.get_object()
+        if request.method == 'GET':
+            events = trip.events.order_by('event_timestamp', 'id')
+            return Response(TripEventSerializer(events, many=True).data)
+
+        serializer = TripEventSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        event = TripEvent(
+            trip_id=trip.trip_id, encoder=request.user if request.user.is_authenticated else None,
+            **serializer.validated_data,
         )
-        # --- END REAL-TIME PUSH LOGIC ---
-        
-        return Response(TripDetailSerializer(trip).data, status=status.HTTP_200_OK)
\ No newline at end of file
+        record_events([event], trips={trip.trip_id: trip})
+        return Response(TripEventSerializer(event).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['get'], url_path='metrics',
+            permission_classes=[IsAssignedDriverOrDispatcher | IsSuperAdmin])
+    def metrics(self, request, pk=None):
+        """
+        Dwell times and on-time status derived from the event log.
+        GET /api/trips/{id}/metrics/
+        """
+        trip = self.get_object()
+        metrics = TripMetrics.objects.filter(trip=trip).first() or TripMetrics(trip=trip)
+        return Response(TripMetricsSerializer(metrics).data)
+
+    @action(detail=False, methods=['get'], url_path='metrics-summary',
+            permission_classes=[IsSuperAdmin])
+    def metrics_summary(self, request):
+        """
+        Fleet dwell and on-time averages for trips completed in a window.
+        GET /api/trips/metrics-summary/?start=<iso>&end=<iso> (both optional)
+        """
+        bounds = self.get_time_bounds('start', 'end')
+        start, end = bounds.get('start'), bounds.get('end')
+        return Response(dict(metrics_summary(start, end), start=start, end=end))
+
+    # --- Arrival Estimate ---
+    @action(detail=True, methods=['get'], url_path='eta',
+            permission_classes=[IsAssignedDriverOrDispatcher | IsSuperAdmin])
+    def eta(self, request, pk=None):
+        """
+        Estimated arrival time, from the live position while in transit.
+        GET /api/trips/{id}/eta/
+        """
+        trip = self.get_object()
+        return Response(trip_eta(trip))
+
+    # --- Scheduler Availability ---
+    @action(detail=False, methods=['get'], url_path='availability',
+            permission_classes=[IsSuperAdmin])
+    def availability(self, request):
+        """
+        Drivers and trucks with no active trip overlapping the window.
+        GET /api/trips/availability/?start=<iso>&end=<iso>
+        """
+        bounds = self.get_time_bounds('start', 'end', required=True)
+        if bounds['end'] <= bounds['start']:
+            raise ParseError('end must be after start.')
+
+        drivers = free_drivers(bounds['start'], bounds['end']).order_by('email').values('id', 'email', 'first_name', 'last_name')
+        trucks = free_trucks(bounds['start'], bounds['end']).order_by('license_plate').values(
+            'truck_id', 'license_plate', 'tonner_capacity', 'status'
+        )
+        return Response({
+            'start': bounds['start'],
+            'end': bounds['end'],
+            'drivers': list(drivers),
+            'trucks': list(trucks),
+        })
+
+    # --- Bulk Endpoints ---
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk_create(self, request):
+        """
+        Creates a batch of trips in one transaction.
+        POST /api/trips/bulk/ with a JSON list of trips; errors are keyed by item index.
+        """
+        context = self.get_serializer_context()
+        context['related_objects'] = TripListSerializer.related_objects(request.data)
+        serializer = TripSerializer(
+            data=request.data, many=True, context=context,
+            allow_empty=False, max_length=self.BULK_MAX_ITEMS,
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['patch'], url_path='bulk-status',
+            permission_classes=[IsSuperAdmin])
+    def bulk_status(self, request):
+        """
+        Updates the status of many trips at once.
+        PATCH /api/trips/bulk-status/ with [{"trip_id": 1, "status": "In Transit"}, ...]
+        """
+        serializer = TripStatusUpdateSerializer(
+            data=request.data, many=True, allow_empty=False, max_length=self.BULK_MAX_ITEMS,
+        )
+        serializer.is_valid(raise_exception=True)
+        updates = serializer.validated_data
+
+        new_statuses = {item['trip_id']: item['status'] for item in updates}
+        with transaction.atomic():
+            # Resources of reactivated trips first, then the trips, as book() does
+            lock_for_reactivation(list(new_statuses), new_statuses)
+            trips = (
+                Trip.objects.select_related('truck', 'assigned_driver')
+                .select_for_update(of=('self',))
+                .in_bulk([item['trip_id'] for item in updates])
+            )
+
+            errors = {}
+            seen = set()
+            for index, item in enumerate(updates):
+                if item['trip_id'] not in trips:
+                    errors[index] = {'trip_id': [f'Trip {item["trip_id"]} does not exist.']}
+                elif item['trip_id'] in seen:
+                    errors[index] = {'trip_id': ['Trip appears more than once in this batch.']}
+                seen.add(item['trip_id'])
+            if errors:
+                return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+            try:
+                check_reactivations(trips.values(), new_statuses)
+            except SchedulingConflict as exc:
+                index_of = {item['trip_id']: index for index, item in enumerate(updates)}
+                return Response(
+                    {index_of[trip_id]: item for trip_id, item in exc.errors.items()},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+            changes, old_statuses = [], {}
+            now = timezone.now()
+            for item in updates:
+                trip = trips[item['trip_id']]
+                old_statuses[trip.trip_id] = trip.status
+                old_state = trip.previous_state()
+                update_fields = trip.apply_status(item['status'], now)
+                trip.touch(now)
+                changes.append((old_state, trip.tracked_state()))
+
+            Trip.objects.bulk_update(trips.values(), [*update_fields, *Trip.VERSION_FIELDS], batch_size=500)
+            # bulk_update skips post_save, so tell the rollups directly
+            trips_bulk_changed.send(sender=Trip, changes=changes)
+            # One batched append to the event log for every trip that changed
+            encoder = request.user if request.user.is_authenticated else None
+            record_events(status_events(trips.values(), old_statuses, encoder, now), trips=trips)
+            # Every trip group plus a single fleet message, pushed by the
+            # outbox dispatcher once this commits
+            enqueue_trip_updates(trips.values(), now)
+
+        return Response(TripDetailSerializer([trips[item['trip_id']] for item in updates], many=True).data)
+
+    # --- Reporting Export ---
+    @action(detail=False, methods=['get'], url_path='export',
+            permission_classes=[IsSuperAdmin], renderer_classes=[CSVRenderer, NDJSONRenderer])
+    def export(self, request):
+        """
+        Streams trips as CSV (default) or NDJSON with constant memory use.
+        GET /api/trips/export/?format=csv|ndjson&start=<iso>&end=<iso>&status=Completed,Canceled
+        start/end bound scheduled_start_time; all filters are optional.
+        """
+        bounds = self.get_time_bounds('start', 'end')
+        statuses = [name.strip() for name in request.query_params.get('status', '').split(',') if name.strip()]
+        known = {choice for choice, _ in STATUS_CHOICES} | set(SETTABLE_STATUSES)
+        unknown = [name for name in statuses if name not in known]
+        if unknown:
+            raise ParseError(f'Unknown status: {", ".join(unknown)}.')
+
+        rows = export_rows(filtered_trips(bounds.get('start'), bounds.get('end'), statuses))
+        renderer = request.accepted_renderer
+        content = STREAMS[renderer.format](rows)
+        if isinstance(request._request, ASGIRequest):
+            content = aiterate(content)
+        response = StreamingHttpResponse(content, content_type=renderer.media_type)
+        filename = f'trips-{timezone.now():%Y%m%d-%H%M%S}.{renderer.format}'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    # --- Assignment Optimizer ---
+    @action(detail=False, methods=['post'], url_path='optimize',
+            permission_classes=[IsSuperAdmin])
+    def optimize(self, request):
+        """
+        Proposes trucks and drivers for unassigned scheduled trips.
+        POST /api/trips/optimize/ {"date": "2025-01-31"} or {"trip_ids": [...]}
+            -> preview: {"assignments": [...], "unassigned": [...]}
+        Add "commit": true to apply the computed plan, or send a previewed
+        plan back as "assignments" with "commit": true to apply it as-is.
+        """
+        serializer = TripOptimizeSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+
+        if 'assignments' in params:
+            assignments, unassigned = params['assignments'], []
+        else:
+            trips = optimizable_trips(trip_ids=params.get('trip_ids'), day=params.get('date'))
+            results = solve(load_problem(trips), time_budget=params.get('time_budget'))
+            assignments = [result for result in results if 'truck' in result]
+            unassigned = [result for result in results if 'truck' not in result]
+
+        if params['commit'] and assignments:
+            try:
+                commit_plan(assignments)
+            except SchedulingConflict as exc:
+                return Response({'assignments': exc.errors}, status=status.HTTP_409_CONFLICT)
+
+        return Response({
+            'committed': params['commit'],
+            'assignments': assignments,
+            'unassigned': unassigned,
+            'total_cost': round(sum(item.get('cost', 0) for item in assignments), 4),
+        })
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class TrucksConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'trucks'
+
+    def ready(self):
+        # Invalidates the cached API responses (core.caching)
+        from . import signals  # noqa: F401
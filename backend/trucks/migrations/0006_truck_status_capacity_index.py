@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trucks', '0005_truck_assigned_driver'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='truck',
+            name='idx_trucks_status',
+        ),
+        migrations.AddIndex(
+            model_name='truck',
+            index=models.Index(fields=['status', 'tonner_capacity'], name='idx_trucks_status_capacity'),
+        ),
+    ]
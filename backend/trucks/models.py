@@ -45,7 +45,9 @@ class Truck(models.Model):
         verbose_name = 'Truck'
         verbose_name_plural = 'Trucks'
         indexes = [
-            models.Index(fields=['status'], name='idx_trucks_status')
+            # Status first, so status-only filters still use it; capacity
+            # second for the available-truck lookup (tonner_capacity >= load)
+            models.Index(fields=['status', 'tonner_capacity'], name='idx_trucks_status_capacity')
         ]
 
     def __str__(self):
@@ -0,0 +1,13 @@
+# trucks/signals.py
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.caching import invalidate_resource
+from .models import Truck
+
+
+@receiver(post_save, sender=Truck)
+@receiver(post_delete, sender=Truck)
+def truck_changed(sender, **kwargs):
+    invalidate_resource('trucks')
@@ -1,3 +1,84 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import Group
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import FMSUser
+from trips.models import Trip
+from trucks.models import Truck, TruckStatus
+
+
+class AvailableTruckTests(TestCase):
+    """Free-truck lookup filters on capacity, status and trip windows."""
+
+    def setUp(self):
+        admin = FMSUser.objects.create(email='admin@fms.test')
+        admin.groups.add(Group.objects.create(name='SuperAdmin'))
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+        self.start = timezone.now().replace(microsecond=0) + timedelta(days=1)
+
+    def get_available(self, load, hours=(0, 2)):
+        start, end = (self.start + timedelta(hours=h) for h in hours)
+        return self.client.get('/api/trucks/available/', {
+            'load': load, 'start': start.isoformat(), 'end': end.isoformat(),
+        })
+
+    def test_ranks_by_best_fit_and_skips_busy_or_maintenance_trucks(self):
+        small = Truck.objects.create(license_plate='AV-SMALL', tonner_capacity=4)
+        medium = Truck.objects.create(license_plate='AV-MED', tonner_capacity=8)
+        Truck.objects.create(license_plate='AV-LARGE', tonner_capacity=12)
+        Truck.objects.create(license_plate='AV-SHOP', tonner_capacity=6, status=TruckStatus.MAINTENANCE)
+        Trip.objects.create(
+            truck=medium, start_location='A', end_location='B',
+            scheduled_start_time=self.start, scheduled_end_time=self.start + timedelta(hours=3),
+        )
+
+        response = self.get_available(5)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['license_plate'] for row in response.data], ['AV-LARGE'])
+
+        response = self.get_available(3, hours=(3, 5))
+        self.assertEqual([row['license_plate'] for row in response.data], ['AV-SMALL', 'AV-MED', 'AV-LARGE'])
+        self.assertEqual(response.data[0]['spare_capacity'], small.tonner_capacity - 3)
+
+    def test_requires_a_window(self):
+        response = self.client.get('/api/trucks/available/', {'load': 5})
+        self.assertEqual(response.status_code, 400)
+
+
+class TruckResponseCacheTests(TestCase):
+    """List/detail responses are cached per version and revalidated with ETags."""
+
+    def setUp(self):
+        from django.core.cache import caches
+        caches['responses'].clear()
+        admin = FMSUser.objects.create(email='cache@fms.test')
+        admin.groups.add(Group.objects.create(name='SuperAdmin'))
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+        self.truck = Truck.objects.create(license_plate='CA-001', tonner_capacity=10)
+
+    def test_etag_revalidation_and_invalidation_on_save(self):
+        response = self.client.get('/api/trucks/')
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        # Served from the cache: no queries, not even for the 304
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/trucks/').data, response.data)
+            self.assertEqual(self.client.get('/api/trucks/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        detail = self.client.get(f'/api/trucks/{self.truck.pk}/')
+        self.assertEqual(detail.data['license_plate'], 'CA-001')
 
-# Create your tests here.
+        # The version is bumped once the write commits
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/trucks/{self.truck.pk}/', {'license_plate': 'CA-002'}, format='json')
+        response = self.client.get('/api/trucks/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data[0]['license_plate'], 'CA-002')
+        self.assertEqual(self.client.get(f'/api/trucks/{self.truck.pk}/').data['license_plate'], 'CA-002')
@@ -1,18 +1,27 @@
 # trucks/views.py
 
+from decimal import Decimal, InvalidOperation
+
 from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ParseError
+from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser # 👈 Added IsAdminUser for clarity
 from accounts.permissions import HasAppModuleAccess 
+from core.caching import CachedResponseMixin
 from .models import Truck
 from .serializers import TruckSerializer
+from trips.scheduling import free_trucks, parse_time_bounds
 
-class TruckViewSet(viewsets.ModelViewSet):
+class TruckViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows Trucks to be viewed, created, updated, or deleted.
     - Requires authentication (IsAuthenticated).
     - Requires specific app module access (e.g., 'trucks.view_truck') 
       for standard users, or IsAdminUser for full access.
+    - List/detail responses are cached with ETags (core.caching).
     """
+    cache_resource = 'trucks'
     
     queryset = Truck.objects.all().order_by('license_plate')
     serializer_class = TruckSerializer
@@ -24,6 +33,36 @@ class TruckViewSet(viewsets.ModelViewSet):
     # 💡 The 'model' attribute is kept since your custom permission relies on it.
     model = Truck
 
+    @action(detail=False, methods=['get'], url_path='available')
+    def available(self, request):
+        """
+        Trucks that can carry a load and are free for a time window, best fit first.
+        GET /api/trucks/available/?load=<net weight>&start=<iso>&end=<iso>&limit=20
+
+        Ranked by smallest sufficient capacity, so big trucks stay free for
+        big loads.
+        """
+        bounds = parse_time_bounds(request.query_params, 'start', 'end', required=True)
+        if bounds['end'] <= bounds['start']:
+            raise ParseError('end must be after start.')
+
+        try:
+            load = Decimal(request.query_params.get('load', '0'))
+            limit = int(request.query_params.get('limit', 20))
+        except (InvalidOperation, ValueError):
+            raise ParseError('load must be a number and limit an integer.')
+        if not load.is_finite() or load < 0 or limit < 1:
+            raise ParseError('load must be non-negative and limit positive.')
+
+        trucks = free_trucks(bounds['start'], bounds['end'], min_capacity=load).order_by(
+            'tonner_capacity', 'license_plate'
+        )[:min(limit, 100)]
+
+        data = TruckSerializer(trucks, many=True).data
+        for row in data:
+            row['spare_capacity'] = row['tonner_capacity'] - load
+        return Response(data)
+
     # You could optionally override get_queryset here if you wanted non-admin users 
     # to only see certain trucks, but for an admin view, the base queryset is fine.
     # def get_queryset(self):